@@ -1,8 +1,16 @@
 import sys
+import os
+import argparse
+import copy
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import awswrangler as wr
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.impute import SimpleImputer
@@ -26,9 +34,890 @@ RAW_OUTPUT_PATH = f"s3://{S3_BUCKET}/{S3_PREFIX}/processed/raw_cleaned.csv"
 PREPROCESSOR_PATH = f"s3://{S3_BUCKET}/{S3_PREFIX}/artifacts/preprocessor.pkl"
 METRICS_PATH = f"s3://{S3_BUCKET}/{S3_PREFIX}/artifacts/pipeline_metrics.json"
 
-class GlueETLPipeline:
+# Execution modes
+EXECUTION_MODE_IN_MEMORY = "in_memory"
+EXECUTION_MODE_CHUNKED = "chunked"
+EXECUTION_MODE_SPARK = "spark"
+DEFAULT_CHUNK_ROWS = 100000
+DEFAULT_SAMPLE_ROWS = 200000  # Values kept per column for streamed medians
+LOCAL_OUTPUT_DIR = "/tmp/etl_output"
+DEFAULT_WRITE_WORKERS = 8  # Enough for every dataset and artifact upload to run at once
+
+# Spark execution (pyspark is only imported in this mode)
+SPARK_APP_NAME = "etl-feature-engineering"
+SPLIT_COLUMN = "_split"
+
+# Output formats (NPZ holds the processed feature matrices only)
+OUTPUT_FORMAT_CSV = "csv"
+OUTPUT_FORMAT_PARQUET = "parquet"
+OUTPUT_FORMAT_NPZ = "npz"
+
+# Preprocessor fitting (chunked mode always fits incrementally)
+FIT_MODE_FULL = "full"
+FIT_MODE_INCREMENTAL = "incremental"
+
+# Split settings (rows are assigned by hash, SPLIT_SEED seeds the sampled medians)
+TARGET_COLUMN = 'charges'
+SPLIT_SEED = 42
+TRAIN_FRACTION = 0.7
+VALID_FRACTION = 0.15
+SPLIT_DUPLICATE, SPLIT_TRAIN, SPLIT_VALID, SPLIT_TEST = 0, 1, 2, 3
+
+# Validation settings (adjust based on your dataset)
+REQUIRED_COLUMNS = ['age', 'bmi', 'children', 'sex', 'smoker', 'region', 'charges']
+NUMERICAL_COLUMNS = ['age', 'bmi', 'children', 'charges']
+NUMERIC_DTYPES = ['int64', 'float64']  # Widening order
+
+def parse_s3_path(s3_path):
+    """Split s3://bucket/key into bucket and key"""
+    path_parts = s3_path.replace("s3://", "").split("/")
+    return path_parts[0], "/".join(path_parts[1:])
+
+def read_chunks(s3_path, chunk_rows):
+    """Iterate over a CSV or Parquet object in DataFrames of at most chunk_rows rows"""
+    if s3_path.endswith(".parquet"):
+        return wr.s3.read_parquet(s3_path, chunked=chunk_rows)
+    return wr.s3.read_csv(s3_path, chunksize=chunk_rows)
+
+def with_format(s3_path, output_format):
+    """Path of an output in the given format: train.csv -> train.parquet"""
+    return os.path.splitext(s3_path)[0] + f".{output_format}"
+
+def processed_path(s3_path, output_format):
+    """Path of the processed features of a split: train.csv -> train_processed.npz"""
+    return os.path.splitext(s3_path)[0] + f"_processed.{output_format}"
+
+def transform_sparse(preprocessor, X):
+    """Transform with a fitted ColumnTransformer into a CSR matrix, without densifying the one-hot blocks"""
+    blocks = [
+        sparse.csr_matrix(transformer.transform(X[columns]))
+        for name, transformer, columns in preprocessor.transformers_
+        if transformer != 'drop' and len(columns)
+    ]
+    return sparse.hstack(blocks, format='csr')
+
+def preprocess_frame(preprocessor, df, sparse_output=False):
+    """Named feature columns of a cleaned frame, keeping its target column"""
+    X = df.drop(columns=[TARGET_COLUMN]) if TARGET_COLUMN in df.columns else df
+    feature_names = preprocessor.get_feature_names_out()
+    if sparse_output:
+        processed = pd.DataFrame.sparse.from_spmatrix(transform_sparse(preprocessor, X), columns=feature_names)
+    else:
+        processed = pd.DataFrame(preprocessor.transform(X), columns=feature_names)
+    if TARGET_COLUMN in df.columns:
+        processed[TARGET_COLUMN] = df[TARGET_COLUMN].values
+    return processed
+
+def write_npz(df, local_path):
+    """Save processed features as a CSR matrix with their names and the target column.
+
+    The matrix arrays are stored the way scipy.sparse.save_npz stores them, so
+    scipy.sparse.load_npz reads the features back directly; read_npz also returns the names and target.
+    """
+    features = df.drop(columns=[TARGET_COLUMN]) if TARGET_COLUMN in df.columns else df
+    if all(isinstance(dtype, pd.SparseDtype) for dtype in features.dtypes):
+        matrix = features.sparse.to_coo().tocsr()
+    else:
+        matrix = sparse.csr_matrix(features.to_numpy(dtype='float64'))
+    arrays = {
+        'format': np.array('csr'),
+        'shape': np.array(matrix.shape),
+        'data': matrix.data,
+        'indices': matrix.indices,
+        'indptr': matrix.indptr,
+        'feature_names': np.array(features.columns, dtype=str)
+    }
+    if TARGET_COLUMN in df.columns:
+        arrays['target'] = df[TARGET_COLUMN].to_numpy()
+    np.savez_compressed(local_path, **arrays)
+
+def read_npz(local_path):
+    """Load a file written by write_npz: CSR features, feature names and target (None if absent)"""
+    with np.load(local_path) as arrays:
+        matrix = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(arrays['shape']))
+        target = arrays['target'] if 'target' in arrays.files else None
+        return matrix, list(arrays['feature_names']), target
+
+class LocalDatasetWriter:
+    """Local CSV or Parquet file that chunks are appended to, uploaded once complete"""
+
+    def __init__(self, local_path, columns):
+        self.local_path = local_path
+        self.columns = columns
+        self.writer = None
+        if local_path.endswith('.csv'):
+            pd.DataFrame(columns=columns).to_csv(local_path, index=False)
+
+    def write(self, df):
+        if self.local_path.endswith('.csv'):
+            df.to_csv(self.local_path, mode='a', header=False, index=False)
+            return
+        # Later chunks are cast to the schema of the first one
+        schema = self.writer.schema if self.writer is not None else None
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.local_path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        elif not self.local_path.endswith('.csv'):
+            pd.DataFrame(columns=self.columns).to_parquet(self.local_path, index=False)
+
+def local_temp_path(suffix):
+    """New local file path, so that concurrent writes never share a temp file"""
+    fd, local_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return local_path
+
+_thread_state = threading.local()
+
+def thread_session():
+    """boto3 session of the calling thread (sessions must not be shared between threads)"""
+    if not hasattr(_thread_state, 'session'):
+        _thread_state.session = boto3.Session()
+    return _thread_state.session
+
+class ArtifactWriter:
+    """Runs S3 writes on a bounded thread pool while the pipeline keeps computing.
+
+    Each write is submitted as soon as its data is ready; join() waits for all of them and
+    reports the failures per output path instead of stopping at the first one. Used as a
+    context manager, an error before join() cancels the writes that have not started yet.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WRITE_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-write")
+        self.futures = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            cancelled = [s3_path for s3_path, future in self.futures.items() if future.cancel()]
+            if cancelled:
+                logger.warning(f"Cancelled {len(cancelled)} pending writes: {cancelled}")
+        # Writes already running are waited for, so none outlives the job
+        self.executor.shutdown(cancel_futures=exc_type is not None)
+        return False
+
+    def submit(self, s3_path, write, *args):
+        self.futures[s3_path] = self.executor.submit(write, *args)
+
+    def join(self):
+        """Wait for every write and return {s3_path: error message} for the failed ones"""
+        failures = {}
+        for s3_path, future in self.futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                failures[s3_path] = str(e)
+        self.executor.shutdown()
+        return failures
+
+    def join_or_raise(self):
+        """Wait for every write and raise if any failed, listing each failed output"""
+        failures = self.join()
+        for s3_path, error in failures.items():
+            logger.error(f"Failed to write {s3_path}: {error}")
+        if failures:
+            raise RuntimeError(f"{len(failures)} of {len(self.futures)} writes failed: {sorted(failures)}")
+        logger.info(f"Completed {len(self.futures)} writes")
+
+def widen_dtype(previous, dtype):
+    """Type of a column read as previous in earlier chunks and as dtype in this one, as a single read would infer it"""
+    if previous in NUMERIC_DTYPES and dtype in NUMERIC_DTYPES:
+        return max(previous, dtype, key=NUMERIC_DTYPES.index)
+    return previous if previous not in NUMERIC_DTYPES else dtype
+
+def row_hashes(df):
+    """64-bit hash of every row"""
+    # Integer columns are hashed as floats so a chunk without missing values matches one with them
+    hashable = df.astype({column: 'float64' for column in df.columns if str(df[column].dtype) == 'int64'})
+    return pd.util.hash_pandas_object(hashable, index=False).to_numpy()
+
+class HashSet:
+    """Set of 64-bit row hashes kept as sorted runs, each at least twice as long as the next newer one.
+
+    Adding a chunk only merges runs of similar length, so over the whole input every hash is merged
+    O(log n) times rather than once per chunk, and a lookup is one binary search per run.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, hashes):
+        """Mask of the hashes already in the set"""
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            found |= run[positions] == hashes
+        return found
+
+    def add(self, hashes):
+        """Add hashes that are not in the set yet"""
+        run = np.unique(hashes)
+        while self.runs and len(self.runs[-1]) <= 2 * len(run):
+            # Both runs are sorted, which the stable sort (timsort) merges in linear time
+            run = np.sort(np.concatenate([self.runs.pop(), run]), kind='stable')
+        if len(run):
+            self.runs.append(run)
+
+def first_occurrences(hashes, seen_hashes):
+    """Mask of the row hashes not seen before, in this chunk or in seen_hashes, which gets the new ones"""
+    keep = ~pd.Series(hashes).duplicated().to_numpy() & ~seen_hashes.contains(hashes)
+    seen_hashes.add(hashes[keep])
+    return keep
+
+def split_codes(hashes):
+    """Split of every row from its 64-bit hash, by the 70/15/15 thresholds.
+
+    The top 53 bits of the hash give a uniform position in [0, 1), so a row lands in the same split
+    in any chunk, partition or rerun, whatever other rows come with it.
+    """
+    position = (hashes >> np.uint64(11)).astype(np.float64) / 2.0 ** 53
+    return np.where(position < TRAIN_FRACTION, SPLIT_TRAIN,
+                    np.where(position < TRAIN_FRACTION + VALID_FRACTION, SPLIT_VALID, SPLIT_TEST)).astype(np.uint8)
+
+class ColumnProfile:
+    """Column statistics shared by cleaning, validation and the pipeline metrics.
+
+    from_frame() computes them in two vectorized passes over the data: one hashing the rows to find
+    duplicates, and one over the numerical columns as a single float block and the categorical
+    columns' value counts. The statistics are of the distinct rows, so the second pass needs the
+    duplicate mask of the first; medians in particular cannot be corrected for duplicates afterwards.
+    Chunked mode adds chunk after chunk instead, hashing and profiling each chunk in the same pass.
+    Later stages read the profile, or a profile derived from it, rather than scanning the data again.
+    """
+
     def __init__(self):
+        self.records = 0
+        self.duplicates = 0
+        self.dtypes = {}
+        self.null_counts = {}
+        self.numeric = {}  # column -> [count, sum, min, max] of non-null values
+        self.medians = {}
+        self.category_counts = {}  # column -> value counts of non-null values
+        self.duplicate_numeric = {}  # column -> [count, sum] of the duplicate rows' non-null values
+        self.scans = 0  # Full passes over the data made to build the profile
+        self.hashes = None
+        self.duplicated = None
+        self.split_hashes = None  # Hashes the rows are split by, taken before imputation
+
+    @classmethod
+    def from_frame(cls, df):
+        """Profile of a frame: duplicates among all rows, column statistics of the distinct rows"""
+        profile = cls()
+        profile.hashes = row_hashes(df)
+        profile.duplicated = pd.Series(profile.hashes).duplicated().to_numpy()
+        profile.records = len(df)
+        profile.duplicates = int(profile.duplicated.sum())
+        profile.scans += 1
+
+        profile.add(df[~profile.duplicated], medians=True)
+        profile.add_duplicates(df[profile.duplicated])
+        profile.scans += 1
+        return profile
+
+    def add(self, df, medians=False):
+        """Add the statistics of distinct rows, with exact medians if this is the only call"""
+        for column in df.columns:
+            dtype = str(df[column].dtype)
+            self.dtypes[column] = widen_dtype(self.dtypes.get(column, dtype), dtype)
+            self.null_counts.setdefault(column, 0)
+        if not len(df):
+            return
+
+        numerical = [column for column in df.columns if str(df[column].dtype) in NUMERIC_DTYPES]
+        values = df[numerical].to_numpy(dtype='float64')
+        missing = np.isnan(values)
+        counts = len(df) - missing.sum(axis=0)
+        sums = np.where(missing, 0.0, values).sum(axis=0)
+        lows = np.where(missing, np.inf, values).min(axis=0)
+        highs = np.where(missing, -np.inf, values).max(axis=0)
+        for i, column in enumerate(numerical):
+            self.null_counts[column] += len(df) - int(counts[i])
+            if not counts[i]:
+                continue
+            count, total, low, high = self.numeric.get(column, [0, 0.0, np.inf, -np.inf])
+            self.numeric[column] = [count + int(counts[i]), total + float(sums[i]),
+                                    min(low, float(lows[i])), max(high, float(highs[i]))]
+            if medians:
+                self.medians[column] = float(np.median(values[~missing[:, i], i]))
+
+        for column in df.columns:
+            if column in numerical:
+                continue
+            counts = df[column].value_counts()
+            self.null_counts[column] += len(df) - int(counts.sum())
+            previous = self.category_counts.get(column)
+            self.category_counts[column] = counts if previous is None else previous.add(counts, fill_value=0)
+
+    def add_duplicates(self, df):
+        """Add rows that repeat distinct rows, which only change the means"""
+        numerical = [column for column in df.columns if self.is_numeric(column)]
+        if not len(df) or not numerical:
+            return
+        values = df[numerical].to_numpy(dtype='float64')
+        missing = np.isnan(values)
+        counts = len(df) - missing.sum(axis=0)
+        sums = np.where(missing, 0.0, values).sum(axis=0)
+        for i, column in enumerate(numerical):
+            count, total = self.duplicate_numeric.get(column, [0, 0.0])
+            self.duplicate_numeric[column] = [count + int(counts[i]), total + float(sums[i])]
+
+    def mean(self, column):
+        """Mean of a numerical column over all rows, duplicates included"""
+        count, total, _, _ = self.numeric[column]
+        duplicate_count, duplicate_total = self.duplicate_numeric.get(column, [0, 0.0])
+        return (total + duplicate_total) / (count + duplicate_count)
+
+    @property
+    def unique_records(self):
+        return self.records - self.duplicates
+
+    def is_numeric(self, column):
+        return self.dtypes[column] in NUMERIC_DTYPES
+
+    def mode(self, column):
+        """Most frequent value of a categorical column, the smallest one on ties like mode()[0]"""
+        counts = self.category_counts.get(column)
+        if counts is None or counts.empty:
+            return None
+        return counts_mode(counts)
+
+    def fill_values(self):
+        """Median of numerical and mode of categorical columns, for the columns with missing values"""
+        fill_values = {}
+        for column, missing_count in self.null_counts.items():
+            if missing_count == 0:
+                continue
+            if self.is_numeric(column):
+                fill_values[column] = self.medians.get(column, np.nan)
+            else:
+                mode = self.mode(column)
+                fill_values[column] = 'Unknown' if mode is None else mode
+        return fill_values
+
+    def cleaned(self, fill_values, duplicates=0):
+        """Profile of the distinct rows once missing values are filled, derived without a scan.
+
+        duplicates counts the rows that only became equal to others once filled.
+        """
+        clean = ColumnProfile()
+        clean.records = self.unique_records
+        clean.duplicates = duplicates
+        clean.dtypes = dict(self.dtypes)
+        clean.scans = self.scans
+        # Filling with the median leaves the median unchanged
+        clean.medians = dict(self.medians)
+        clean.numeric = {column: list(stats) for column, stats in self.numeric.items()}
+        clean.category_counts = dict(self.category_counts)
+
+        for column, missing_count in self.null_counts.items():
+            value = fill_values.get(column)
+            if not missing_count or value is None or pd.isnull(value):
+                clean.null_counts[column] = missing_count
+                continue
+            clean.null_counts[column] = 0
+            if self.is_numeric(column):
+                count, total, low, high = clean.numeric.get(column, [0, 0.0, np.inf, -np.inf])
+                clean.numeric[column] = [count + missing_count, total + missing_count * value,
+                                         min(low, value), max(high, value)]
+            else:
+                filled = pd.Series({value: missing_count})
+                previous = clean.category_counts.get(column)
+                clean.category_counts[column] = filled if previous is None else previous.add(filled, fill_value=0)
+
+        return clean
+
+    def validation_results(self):
+        """validate_data() results of the profiled frame"""
+        validation_results = {
+            'total_records': self.records,
+            'total_columns': len(self.dtypes),
+            'has_duplicates': self.duplicates == 0,
+            'has_missing_values': sum(self.null_counts.values()) == 0,
+            'column_types': dict(self.dtypes)
+        }
+
+        validation_results['missing_required_columns'] = [col for col in REQUIRED_COLUMNS if col not in self.dtypes]
+
+        for col in NUMERICAL_COLUMNS:
+            if col in self.numeric:
+                _, _, low, high = self.numeric[col]
+                validation_results[f'{col}_min'] = low
+                validation_results[f'{col}_max'] = high
+                validation_results[f'{col}_mean'] = self.mean(col)
+
+        return validation_results
+
+    def to_dict(self):
+        """Per-column statistics for the pipeline metrics"""
+        columns = {}
+        for column, dtype in self.dtypes.items():
+            stats = {'dtype': dtype, 'null_count': int(self.null_counts[column])}
+            if self.is_numeric(column):
+                count, _, low, high = self.numeric.get(column, [0, 0.0, None, None])
+                stats.update(count=count, min=low, max=high, mean=self.mean(column) if count else None,
+                             median=self.medians.get(column))
+            else:
+                counts = self.category_counts.get(column, pd.Series(dtype='int64'))
+                stats.update(count=int(counts.sum()), distinct=len(counts), mode=self.mode(column))
+            columns[column] = stats
+
+        return {'records': self.records, 'duplicates': self.duplicates, 'data_scans': self.scans, 'columns': columns}
+
+def counts_mode(counts):
+    """Most frequent value of value counts, the smallest one on ties like mode()[0] and SimpleImputer"""
+    return counts[counts == counts.max()].sort_index().index[0]
+
+def set_scaler_statistics(scaler, mean, var, n_samples):
+    """Install streamed statistics on a fitted StandardScaler, giving constant features unit scale as fit() does"""
+    eps = np.finfo(np.float64).eps
+    scaler.mean_ = mean
+    scaler.var_ = var
+    scaler.n_samples_seen_ = n_samples
+    constant = var <= n_samples * eps * var + (n_samples * mean * eps) ** 2
+    scaler.scale_ = np.where(constant, 1.0, np.sqrt(var))
+
+def weighted_median(values, weights):
+    """Median of values each repeated weights times, averaging the two middle values like np.median"""
+    order = np.argsort(values, kind='stable')
+    values, cumulative = values[order], np.cumsum(weights[order])
+    total = cumulative[-1]
+    lower = values[min(np.searchsorted(cumulative, np.floor((total - 1) / 2), side='right'), len(values) - 1)]
+    upper = values[min(np.searchsorted(cumulative, np.floor(total / 2), side='right'), len(values) - 1)]
+    return float((lower + upper) / 2)
+
+class StreamingMedian:
+    """Median of a column fed chunk by chunk.
+
+    Keeps exact value counts while the column has at most sample_size distinct values, and a
+    uniform sample of sample_size values for the estimate once it has more.
+    """
+
+    def __init__(self, sample_size, rng):
+        self.sample_size = sample_size
+        self.rng = rng
+        self.count = 0
+        self.value_counts = pd.Series(dtype='int64')
+        self.values = np.array([], dtype=np.float64)
+        self.keys = np.array([], dtype=np.float64)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+
+        if self.value_counts is not None:
+            unique, counts = np.unique(values, return_counts=True)
+            self.value_counts = self.value_counts.add(pd.Series(counts, index=unique), fill_value=0)
+            if len(self.value_counts) > self.sample_size:
+                self.value_counts = None
+
+        # Bottom-k sample: the values with the smallest random keys so far
+        self.values = np.concatenate([self.values, values])
+        self.keys = np.concatenate([self.keys, self.rng.random(len(values))])
+        if len(self.keys) > self.sample_size:
+            keep = np.argpartition(self.keys, self.sample_size)[:self.sample_size]
+            self.values, self.keys = self.values[keep], self.keys[keep]
+
+    def median(self, fill_value=np.nan, fill_count=0):
+        """Median of the values, counting fill_count more values equal to fill_value"""
+        if self.value_counts is not None:
+            values, weights = self.value_counts.index.to_numpy(dtype=np.float64), self.value_counts.to_numpy(dtype=np.float64)
+        else:
+            values, weights = self.values, np.full(len(self.values), self.count / len(self.values))
+        if fill_count and pd.notnull(fill_value):
+            values = np.append(values, fill_value)
+            weights = np.append(weights, fill_count)
+        return weighted_median(values, weights) if len(values) else np.nan
+
+class IncrementalPreprocessor:
+    """Fits the create_preprocessor() pipeline chunk by chunk, for training sets that do not fit in memory.
+
+    Numerical features stream into a StandardScaler through partial_fit and into StreamingMedian
+    for the imputer; categorical features keep value counts, which give the encoder's categories,
+    the imputer's most frequent value and the one-hot scaler's variances. fit_preprocessor() then
+    returns the same fitted ColumnTransformer as a full fit, so preprocessor.pkl is unchanged for
+    inference. Missing values may be left in the chunks and filled in afterwards through fill_values.
+    """
+
+    def __init__(self, sample_size=DEFAULT_SAMPLE_ROWS, seed=SPLIT_SEED):
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.dtypes = None
+        self.numerical_features = []
+        self.categorical_features = []
+        self.scaler = StandardScaler(with_mean=False)
+        self.medians = {}
+        self.category_counts = {}
+        self.null_counts = {}
+        self.rows = 0
+
+    def partial_fit(self, df):
+        """Add a chunk of training rows"""
+        if TARGET_COLUMN in df.columns:
+            df = df.drop(columns=[TARGET_COLUMN])
+        self.rows += len(df)
+        if self.dtypes is None:
+            self.dtypes = df.dtypes
+            self.numerical_features = [column for column in df.columns if str(df[column].dtype) in NUMERIC_DTYPES]
+            self.categorical_features = [column for column in df.columns if column not in self.numerical_features]
+            self.medians = {column: StreamingMedian(self.sample_size, self.rng) for column in self.numerical_features}
+            self.null_counts = dict.fromkeys(df.columns, 0)
+        if not len(df):
+            return
+
+        if self.numerical_features:
+            # NaN is ignored by partial_fit and counted as missing here
+            values = df[self.numerical_features].to_numpy(dtype='float64')
+            self.scaler.partial_fit(values)
+            for i, column in enumerate(self.numerical_features):
+                self.medians[column].add(values[:, i])
+                self.null_counts[column] += int(np.isnan(values[:, i]).sum())
+
+        for column in self.categorical_features:
+            counts = df[column].value_counts()
+            self.null_counts[column] += len(df) - int(counts.sum())
+            previous = self.category_counts.get(column)
+            self.category_counts[column] = counts if previous is None else previous.add(counts, fill_value=0)
+
+    def design_frame(self, fill_values=None):
+        """Small frame with every category of every categorical feature, to build the fitted structure"""
+        fill_values = fill_values or {}
+        rows = 1
+        categories = {}
+        for column in self.categorical_features:
+            values = sorted(self.category_counts.get(column, pd.Series(dtype='int64')).index)
+            if not values:
+                values = [fill_values.get(column, 'Unknown')]
+            categories[column] = values
+            rows = max(rows, len(values))
+
+        design = pd.DataFrame({
+            column: [categories[column][i % len(categories[column])] for i in range(rows)]
+            if column in categories else np.zeros(rows)
+            for column in self.dtypes.index
+        })
+        return design.astype(self.dtypes)
+
+    def fit_preprocessor(self, preprocessor, fill_values=None):
+        """Fit a create_preprocessor() pipeline to the streamed statistics.
+
+        The pipeline is fitted on design_frame() for the structure of a full fit (column lists,
+        encoder categories, output layout), then its learned statistics are replaced with the
+        streamed ones. Values still missing in the chunks count as fill_values, or as the
+        pipeline's own imputers would fill them.
+        """
+        if not self.rows:
+            raise ValueError("No training records to fit the preprocessor on")
+        fill_values = fill_values or {}
+        preprocessor.fit(self.design_frame(fill_values))
+
+        if self.numerical_features:
+            num_pipeline = preprocessor.named_transformers_['num_pipeline']
+            scaler = copy.deepcopy(self.scaler)
+            counts = np.broadcast_to(np.asarray(scaler.n_samples_seen_, dtype=np.float64), scaler.mean_.shape).copy()
+            mean, var = scaler.mean_.copy(), scaler.var_.copy()
+            medians = []
+            for i, column in enumerate(self.numerical_features):
+                missing_count = self.null_counts[column]
+                fill_value = fill_values.get(column, np.nan)
+                if pd.isnull(fill_value):
+                    fill_value = self.medians[column].median()
+                medians.append(self.medians[column].median(fill_value, missing_count))
+                if missing_count and pd.notnull(fill_value):
+                    # Combine with missing_count values equal to fill_value (Chan et al.)
+                    total = counts[i] + missing_count
+                    if counts[i]:
+                        delta = fill_value - mean[i]
+                        var[i] = (var[i] * counts[i] + delta ** 2 * counts[i] * missing_count / total) / total
+                        mean[i] += delta * missing_count / total
+                    else:
+                        mean[i], var[i] = fill_value, 0.0
+                    counts[i] = total
+            set_scaler_statistics(scaler, mean, var, counts[0] if np.ptp(counts) == 0 else counts)
+            num_pipeline.named_steps['imputer'].statistics_ = np.array(medians)
+            num_pipeline.steps[-1] = ('scaler', scaler)
+
+        if self.categorical_features:
+            cat_pipeline = preprocessor.named_transformers_['cat_pipeline']
+            encoder_categories = cat_pipeline.named_steps['encoder'].categories_
+            modes, frequencies = [], []
+            for column, categories in zip(self.categorical_features, encoder_categories):
+                counts = self.category_counts.get(column, pd.Series(dtype='int64'))
+                missing_count = self.null_counts[column]
+                fill_value = fill_values.get(column)
+                if pd.isnull(fill_value) and len(counts):
+                    fill_value = counts_mode(counts)
+                if missing_count and pd.notnull(fill_value):
+                    counts = counts.add(pd.Series({fill_value: missing_count}), fill_value=0)
+                modes.append(counts_mode(counts) if len(counts) else categories[0])
+                frequencies.append(np.array([counts.get(category, 0) for category in categories]) / self.rows)
+            cat_pipeline.named_steps['imputer'].statistics_ = np.array(modes, dtype=object)
+            # One-hot columns are 0/1 with mean p, so their variance is p(1 - p)
+            mean = np.concatenate(frequencies).astype(np.float64)
+            set_scaler_statistics(cat_pipeline.named_steps['scaler'], mean, mean * (1 - mean), self.rows)
+
+        return preprocessor
+
+class ChunkStatistics:
+    """Statistics gathered chunk by chunk in the first pass of chunked mode.
+
+    Holds what cleaning, validation and fitting need: a 64-bit hash per distinct row for
+    de-duplication, a split code per input row from the hash of the row or its split_key columns,
+    the column profile of the distinct rows, streamed medians and, when given, an
+    IncrementalPreprocessor fed with the training rows. Apart from the hashes (8 bytes per
+    distinct row) and split codes (1 byte per row), memory does not grow with the input.
+    """
+
+    def __init__(self, sample_rows=DEFAULT_SAMPLE_ROWS, fitter=None, split_key=None):
+        self.sample_rows = sample_rows
+        self.fitter = fitter
+        self.split_key = split_key
+        self.rng = np.random.default_rng(SPLIT_SEED)
+        self.profile = ColumnProfile()
+        self.columns = None
+        self.seen_hashes = HashSet()
+        self.assignments = []  # Split code of every row, one array per chunk
+        self.split_counts = {SPLIT_TRAIN: 0, SPLIT_VALID: 0, SPLIT_TEST: 0}
+        self.medians = {}
+
+    def add(self, chunk):
+        """Record one chunk, in input order"""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+
+        # Keep the first occurrence of every row, across chunks as drop_duplicates() does
+        hashes = row_hashes(chunk)
+        keep = first_occurrences(hashes, self.seen_hashes)
+        unique = chunk[keep]
+        self.profile.records += len(chunk)
+        self.profile.duplicates += len(chunk) - len(unique)
+        self.profile.add(unique)
+        self.profile.add_duplicates(chunk[~keep])
+
+        codes = split_codes(row_hashes(unique[self.split_key]) if self.split_key else hashes[keep])
+        assignment = np.full(len(chunk), SPLIT_DUPLICATE, dtype=np.uint8)
+        assignment[keep] = codes
+        self.assignments.append(assignment)
+        for code in self.split_counts:
+            self.split_counts[code] += int((codes == code).sum())
+
+        for column in self.columns:
+            if str(unique[column].dtype) in NUMERIC_DTYPES:
+                if column not in self.medians:
+                    self.medians[column] = StreamingMedian(self.sample_rows, self.rng)
+                self.medians[column].add(unique[column].to_numpy(dtype='float64'))
+
+        if self.fitter is not None:
+            self.fitter.partial_fit(unique[codes == SPLIT_TRAIN])
+
+    def fill_values(self):
+        """Imputation values, with streamed medians"""
+        for column, median in self.medians.items():
+            self.profile.medians[column] = median.median()
+        return self.profile.fill_values()
+
+    def clean(self, df, fill_values):
+        """Impute missing values and apply the column types of the whole input"""
+        return df.fillna(fill_values).astype(self.profile.dtypes)
+
+def spark_session():
+    """Spark session of the Glue job, or a local one (e.g. pyspark in local mode)"""
+    from pyspark.sql import SparkSession
+    spark = SparkSession.builder.appName(SPARK_APP_NAME).getOrCreate()
+    # No _SUCCESS markers, so an output prefix only holds part files (SQL settings reach the writers' Hadoop conf)
+    spark.conf.set('mapreduce.fileoutputcommitter.marksuccessfuljobs', 'false')
+    return spark
+
+def spark_dtype(data_type):
+    """pandas dtype a Spark column type stands for in profiles"""
+    from pyspark.sql import types as T
+    if isinstance(data_type, T.IntegralType):
+        return 'int64'
+    if isinstance(data_type, T.FractionalType):
+        return 'float64'
+    return 'object'
+
+def read_spark(spark, s3_path):
+    """Load the input as a Spark DataFrame typed the way pandas reads it, with its totals.
+
+    Integer columns become 64-bit, or doubles when they have missing values as pandas reads them.
+    The totals (rows, non-null counts and numerical sums over all rows) come from one aggregation,
+    which scans the input once.
+    """
+    from pyspark.sql import functions as F
+    if s3_path.endswith('.parquet'):
+        df = spark.read.parquet(s3_path)
+    else:
+        df = spark.read.csv(s3_path, header=True, inferSchema=True)
+
+    dtypes = {field.name: spark_dtype(field.dataType) for field in df.schema.fields}
+    numerical = [column for column in df.columns if dtypes[column] in NUMERIC_DTYPES]
+    row = df.agg(
+        F.count(F.lit(1)).alias('records'),
+        *[F.count(F.col(column)).alias(f'count_{i}') for i, column in enumerate(df.columns)],
+        *[F.sum(F.col(column)).alias(f'sum_{i}') for i, column in enumerate(numerical)]
+    ).first()
+    totals = {
+        'records': row['records'],
+        'counts': {column: row[f'count_{i}'] for i, column in enumerate(df.columns)},
+        'sums': {column: float(row[f'sum_{i}'] or 0.0) for i, column in enumerate(numerical)},
+        'scans': 1
+    }
+
+    columns = []
+    for column in df.columns:
+        if dtypes[column] == 'int64':
+            missing = totals['counts'][column] < totals['records']
+            columns.append(F.col(column).cast('double' if missing else 'long').alias(column))
+        elif dtypes[column] == 'float64':
+            columns.append(F.col(column).cast('double').alias(column))
+        else:
+            columns.append(F.col(column))
+    return df.select(columns), totals
+
+def spark_category_counts(df, columns):
+    """Value counts of the non-null values of categorical columns, in one aggregation"""
+    from pyspark.sql import functions as F
+    counts = {column: {} for column in columns}
+    if columns:
+        pairs = df.select(F.explode(F.array(*[
+            F.struct(F.lit(column).alias('column'), F.col(column).cast('string').alias('value'))
+            for column in columns
+        ])).alias('pair')).select('pair.*')
+        for row in pairs.where(F.col('value').isNotNull()).groupBy('column', 'value').count().collect():
+            counts[row['column']][row['value']] = row['count']
+    return {column: pd.Series(values, dtype='int64') for column, values in counts.items()}
+
+def spark_profile(unique, totals):
+    """ColumnProfile of a Spark input from aggregates computed on the workers.
+
+    unique holds the distinct rows and totals the read_spark() totals of all rows, so duplicates,
+    statistics and means come out as ColumnProfile.from_frame() computes them with pandas. Medians
+    are exact (Spark's percentile interpolates like np.median).
+    """
+    from pyspark.sql import functions as F
+    profile = ColumnProfile()
+    profile.dtypes = {field.name: spark_dtype(field.dataType) for field in unique.schema.fields}
+    numerical = [column for column in unique.columns if profile.dtypes[column] in NUMERIC_DTYPES]
+    categorical = [column for column in unique.columns if column not in numerical]
+
+    aggregates = [F.count(F.lit(1)).alias('records')]
+    aggregates += [F.count(F.col(column)).alias(f'count_{i}') for i, column in enumerate(unique.columns)]
+    for i, column in enumerate(numerical):
+        aggregates += [
+            F.sum(F.col(column)).alias(f'sum_{i}'),
+            F.min(F.col(column)).alias(f'min_{i}'),
+            F.max(F.col(column)).alias(f'max_{i}'),
+            F.expr(f'percentile(`{column}`, 0.5)').alias(f'median_{i}')
+        ]
+    row = unique.agg(*aggregates).first()
+    profile.scans = totals['scans'] + 1
+
+    profile.records = totals['records']
+    profile.duplicates = totals['records'] - row['records']
+    for i, column in enumerate(unique.columns):
+        profile.null_counts[column] = row['records'] - row[f'count_{i}']
+    for i, column in enumerate(numerical):
+        count = row[f'count_{unique.columns.index(column)}']
+        total = float(row[f'sum_{i}'] or 0.0)
+        if count:
+            profile.numeric[column] = [count, total, float(row[f'min_{i}']), float(row[f'max_{i}'])]
+            profile.medians[column] = float(row[f'median_{i}'])
+        if profile.duplicates:
+            duplicate_count = totals['counts'][column] - count
+            profile.duplicate_numeric[column] = [duplicate_count, totals['sums'][column] - total]
+    profile.category_counts = spark_category_counts(unique, categorical)
+    if categorical:
+        profile.scans += 1
+    return profile
+
+def split_batches(batches, split_key=None):
+    """mapInPandas function: adds the split_codes() column, from the same row hashes as pandas"""
+    for batch in batches:
+        hashes = row_hashes(batch[split_key] if split_key else batch)
+        batch[SPLIT_COLUMN] = split_codes(hashes).astype(np.int32)
+        yield batch
+
+def preprocess_batches(batches, preprocessor):
+    """mapInPandas function: preprocessed feature columns of every batch, keeping the target column"""
+    for batch in batches:
+        yield preprocess_frame(preprocessor, batch)
+
+def spark_fitter(train, dtypes):
+    """IncrementalPreprocessor holding the statistics of the cleaned training rows, aggregated by Spark"""
+    from pyspark.sql import functions as F
+    features = [column for column in train.columns if column != TARGET_COLUMN]
+    fitter = IncrementalPreprocessor()
+    fitter.dtypes = pd.Series({column: dtypes[column] for column in features})
+    fitter.numerical_features = [column for column in features if dtypes[column] in NUMERIC_DTYPES]
+    fitter.categorical_features = [column for column in features if column not in fitter.numerical_features]
+    fitter.null_counts = dict.fromkeys(features, 0)
+
+    aggregates = [F.count(F.lit(1)).alias('rows')]
+    for i, column in enumerate(fitter.numerical_features):
+        aggregates += [
+            F.avg(F.col(column)).alias(f'mean_{i}'),
+            F.var_pop(F.col(column)).alias(f'var_{i}'),
+            F.expr(f'percentile(`{column}`, 0.5)').alias(f'median_{i}')
+        ]
+    row = train.agg(*aggregates).first()
+    fitter.rows = row['rows']
+
+    if fitter.rows and fitter.numerical_features:
+        count = len(fitter.numerical_features)
+        mean = np.array([row[f'mean_{i}'] for i in range(count)], dtype=np.float64)
+        var = np.array([row[f'var_{i}'] for i in range(count)], dtype=np.float64)
+        fitter.scaler.n_features_in_ = count
+        set_scaler_statistics(fitter.scaler, mean, var, fitter.rows)
+        for i, column in enumerate(fitter.numerical_features):
+            # A single value holding the exact median; the rows are cleaned, so nothing is filled in
+            fitter.medians[column] = StreamingMedian(1, fitter.rng)
+            fitter.medians[column].add([row[f'median_{i}']])
+
+    fitter.category_counts = spark_category_counts(train, fitter.categorical_features)
+    return fitter
+
+def write_spark(df, s3_path):
+    """Write a Spark DataFrame as part files under the s3_path prefix, CSV with a header or Parquet by its extension.
+
+    Every worker writes its own partitions, so the write scales with the job's workers. In Spark mode an
+    output is the prefix (processed/train.csv/part-*.csv) rather than one object; readers take the whole
+    prefix, as the SageMaker S3Prefix channel, wr.s3.read_csv(s3_path) and spark.read do.
+    """
+    writer = df.write.mode('overwrite')
+    if s3_path.endswith('.parquet'):
+        writer.parquet(s3_path)
+    else:
+        writer.option('header', True).csv(s3_path)
+
+class GlueETLPipeline:
+    def __init__(self, execution_mode=EXECUTION_MODE_IN_MEMORY, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 sample_rows=DEFAULT_SAMPLE_ROWS, fit_mode=FIT_MODE_FULL, output_format=OUTPUT_FORMAT_CSV,
+                 processed_format=None, write_workers=DEFAULT_WRITE_WORKERS, split_key=None):
         self.s3_client = boto3.client('s3')
+        self.execution_mode = execution_mode
+        self.chunk_rows = chunk_rows
+        self.sample_rows = sample_rows
+        self.fit_mode = fit_mode
+        self.output_format = output_format
+        self.processed_format = processed_format or output_format
+        self.write_workers = write_workers
+        self.split_key = split_key  # Columns that identify a row for splitting, or None for the whole row
+        if output_format == OUTPUT_FORMAT_NPZ:
+            raise ValueError("NPZ is only available for the processed feature matrices")
+        if execution_mode != EXECUTION_MODE_IN_MEMORY and self.processed_format == OUTPUT_FORMAT_NPZ:
+            raise ValueError(f"{execution_mode} mode writes processed features as CSV or Parquet, not NPZ")
+        self.profiles = {}
 
     def load_data(self):
         """Load data from S3"""
@@ -42,41 +931,50 @@ class GlueETLPipeline:
             logger.error(f"Error loading data: {str(e)}")
             raise
 
+    def get_profile(self, df):
+        """Column profile of a frame, computed on first use and cached for the later stages"""
+        cached = self.profiles.get(id(df))
+        if cached is None or cached[0] is not df:
+            cached = self.profiles[id(df)] = (df, ColumnProfile.from_frame(df))
+        return cached[1]
+
     def clean_data(self, df):
         """Clean and preprocess data"""
         logger.info("Starting data cleaning process")
+        profile = self.get_profile(df)
 
         # Log initial state
         logger.info(f"Initial shape: {df.shape}")
-        logger.info(f"Initial duplicates: {df.duplicated().sum()}")
-        logger.info(f"Missing values per column:\n{df.isnull().sum()}")
-
-        # Drop duplicates
-        initial_count = len(df)
-        df = df.drop_duplicates()
-        duplicates_removed = initial_count - len(df)
-        logger.info(f"Removed {duplicates_removed} duplicate records")
+        logger.info(f"Initial duplicates: {profile.duplicates}")
+        logger.info(f"Missing values per column:\n{pd.Series(profile.null_counts)}")
 
-        # Handle missing values
-        for column in df.columns:
-            missing_count = df[column].isnull().sum()
-            if missing_count > 0:
-                logger.info(f"Column '{column}' has {missing_count} missing values")
+        # Rows are split by their values as read, so imputation never moves a row to another split
+        split_hashes = self.split_hashes(df)[~profile.duplicated]
 
-                if df[column].dtype in ['int64', 'float64']:
-                    # For numerical columns, fill with median
-                    median_val = df[column].median()
-                    df[column].fillna(median_val, inplace=True)
-                    logger.info(f"  Filled with median: {median_val}")
-                else:
-                    # For categorical columns, fill with mode
-                    mode_val = df[column].mode()[0] if not df[column].mode().empty else 'Unknown'
-                    df[column].fillna(mode_val, inplace=True)
-                    logger.info(f"  Filled with mode: {mode_val}")
+        # Drop duplicates
+        df = df[~profile.duplicated]
+        logger.info(f"Removed {profile.duplicates} duplicate records")
+
+        # Handle missing values: median for numerical columns, mode for categorical columns
+        fill_values = profile.fill_values()
+        for column, value in fill_values.items():
+            logger.info(f"Column '{column}' has {profile.null_counts[column]} missing values")
+            logger.info(f"  Filled with {'median' if profile.is_numeric(column) else 'mode'}: {value}")
+
+        # Only rows with a filled value can turn into duplicates of other rows
+        hashes = profile.hashes[~profile.duplicated]
+        if fill_values:
+            filled_rows = df[list(fill_values)].isnull().any(axis=1).to_numpy()
+            df = df.fillna(fill_values)
+            hashes = hashes.copy()
+            hashes[filled_rows] = row_hashes(df[filled_rows])
+        clean_profile = profile.cleaned(fill_values, int(pd.Series(hashes).duplicated().sum()))
+        clean_profile.split_hashes = split_hashes
+        self.profiles[id(df)] = (df, clean_profile)
 
         # Log final state
         logger.info(f"Final shape after cleaning: {df.shape}")
-        logger.info(f"Missing values after cleaning:\n{df.isnull().sum()}")
+        logger.info(f"Missing values after cleaning:\n{pd.Series(clean_profile.null_counts)}")
 
         return df
 
@@ -84,38 +982,28 @@ class GlueETLPipeline:
         """Validate data quality"""
         logger.info("Validating data quality")
 
-        validation_results = {
-            'total_records': len(df),
-            'total_columns': len(df.columns),
-            'has_duplicates': df.duplicated().sum() == 0,
-            'has_missing_values': df.isnull().sum().sum() == 0,
-            'column_types': {col: str(df[col].dtype) for col in df.columns}
-        }
-
-        # Check for required columns (adjust based on your dataset)
-        required_columns = ['age', 'bmi', 'children', 'sex', 'smoker', 'region', 'charges']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        validation_results['missing_required_columns'] = missing_columns
-
-        # Check data ranges for numerical columns
-        numerical_cols = ['age', 'bmi', 'children', 'charges']
-        for col in numerical_cols:
-            if col in df.columns:
-                validation_results[f'{col}_min'] = float(df[col].min())
-                validation_results[f'{col}_max'] = float(df[col].max())
-                validation_results[f'{col}_mean'] = float(df[col].mean())
-
+        validation_results = self.get_profile(df).validation_results()
         logger.info(f"Validation results: {validation_results}")
 
         return validation_results
 
+    def split_hashes(self, df):
+        """Hash of every row's split_key columns, or of the whole row"""
+        if self.split_key:
+            return row_hashes(df[self.split_key])
+        return self.get_profile(df).hashes
+
     def split_data(self, df):
         """Split data into train, validation, and test sets"""
         logger.info("Splitting data into train/validation/test sets")
 
-        # 70% train, 15% validation, 15% test
-        train_df, remaining_df = train_test_split(df, train_size=0.7, random_state=42)
-        valid_df, test_df = train_test_split(remaining_df, test_size=0.5, random_state=42)
+        # 70% train, 15% validation, 15% test by row hash; a cleaned frame keeps the hashes of its rows as read
+        cached = self.profiles.get(id(df))
+        if cached is not None and cached[0] is df and cached[1].split_hashes is not None:
+            codes = split_codes(cached[1].split_hashes)
+        else:
+            codes = split_codes(self.split_hashes(df))
+        train_df, valid_df, test_df = (df[codes == code] for code in (SPLIT_TRAIN, SPLIT_VALID, SPLIT_TEST))
 
         # Log split information
         logger.info(f"Training set: {len(train_df)} records ({len(train_df)/len(df)*100:.1f}%)")
@@ -164,6 +1052,24 @@ class GlueETLPipeline:
 
         return preprocessor
 
+    def fit_preprocessor(self, preprocessor, X_train):
+        """Fit the preprocessor and transform the training data, in one go or chunk by chunk"""
+        if self.fit_mode != FIT_MODE_INCREMENTAL:
+            return preprocessor.fit_transform(X_train)
+
+        fitter = IncrementalPreprocessor(self.sample_rows)
+        for start in range(0, len(X_train), self.chunk_rows):
+            fitter.partial_fit(X_train.iloc[start:start + self.chunk_rows])
+        fitter.fit_preprocessor(preprocessor)
+        return preprocessor.transform(X_train)
+
+    def feature_frame(self, preprocessor, X, X_processed=None):
+        """Named feature columns of X, sparse when the processed features are written as NPZ"""
+        sparse_output = self.processed_format == OUTPUT_FORMAT_NPZ
+        if X_processed is None or sparse_output:
+            return preprocess_frame(preprocessor, X, sparse_output)
+        return pd.DataFrame(X_processed, columns=preprocessor.get_feature_names_out())
+
     def preprocess_data(self, train_df, valid_df, test_df):
         """Apply preprocessing to all datasets"""
         logger.info("Preprocessing data")
@@ -183,16 +1089,13 @@ class GlueETLPipeline:
             y_test = test_df[target_column]
 
             # Fit preprocessor on training data
-            logger.info("Fitting preprocessor on training data")
-            X_train_processed = preprocessor.fit_transform(X_train)
-            X_valid_processed = preprocessor.transform(X_valid)
-            X_test_processed = preprocessor.transform(X_test)
+            logger.info(f"Fitting preprocessor on training data ({self.fit_mode} fit)")
+            X_train_processed = self.fit_preprocessor(preprocessor, X_train)
 
             # Convert processed data back to DataFrames with column names
-            feature_names = preprocessor.get_feature_names_out()
-            X_train_df = pd.DataFrame(X_train_processed, columns=feature_names)
-            X_valid_df = pd.DataFrame(X_valid_processed, columns=feature_names)
-            X_test_df = pd.DataFrame(X_test_processed, columns=feature_names)
+            X_train_df = self.feature_frame(preprocessor, X_train, X_train_processed)
+            X_valid_df = self.feature_frame(preprocessor, X_valid)
+            X_test_df = self.feature_frame(preprocessor, X_test)
 
             # Add target column back
             X_train_df[target_column] = y_train.values
@@ -208,43 +1111,55 @@ class GlueETLPipeline:
         else:
             logger.warning(f"Target column '{target_column}' not found. Processing all columns.")
             # Process all columns if target not specified
-            X_train_processed = preprocessor.fit_transform(train_df)
-            X_valid_processed = preprocessor.transform(valid_df)
-            X_test_processed = preprocessor.transform(test_df)
+            X_train_processed = self.fit_preprocessor(preprocessor, train_df)
 
-            feature_names = preprocessor.get_feature_names_out()
-            X_train_df = pd.DataFrame(X_train_processed, columns=feature_names)
-            X_valid_df = pd.DataFrame(X_valid_processed, columns=feature_names)
-            X_test_df = pd.DataFrame(X_test_processed, columns=feature_names)
+            X_train_df = self.feature_frame(preprocessor, train_df, X_train_processed)
+            X_valid_df = self.feature_frame(preprocessor, valid_df)
+            X_test_df = self.feature_frame(preprocessor, test_df)
 
             return X_train_df, X_valid_df, X_test_df, preprocessor
 
     def save_to_s3(self, obj, s3_path, is_dataframe=False):
         """Save object or DataFrame to S3"""
         try:
-            if is_dataframe:
+            if is_dataframe and s3_path.endswith('.npz'):
+                # Save sparse features locally, then upload
+                local_path = local_temp_path('.npz')
+                write_npz(obj, local_path)
+                self.upload_file(local_path, s3_path)
+                logger.info(f"Saved DataFrame to {s3_path}")
+            elif is_dataframe and s3_path.endswith('.parquet'):
+                # Parquet keeps the column types
+                wr.s3.to_parquet(obj, s3_path, index=False, boto3_session=thread_session())
+                logger.info(f"Saved DataFrame to {s3_path}")
+            elif is_dataframe:
                 # Save DataFrame to CSV in S3
-                wr.s3.to_csv(obj, s3_path, index=False)
+                wr.s3.to_csv(obj, s3_path, index=False, boto3_session=thread_session())
                 logger.info(f"Saved DataFrame to {s3_path}")
             else:
                 # Save Python object to S3
-                local_path = "/tmp/temp_object.pkl"
+                local_path = local_temp_path('.pkl')
                 joblib.dump(obj, local_path)
 
-                # Parse S3 path
-                path_parts = s3_path.replace("s3://", "").split("/")
-                bucket = path_parts[0]
-                key = "/".join(path_parts[1:])
-
                 # Upload to S3
-                self.s3_client.upload_file(local_path, bucket, key)
+                self.upload_file(local_path, s3_path)
                 logger.info(f"Saved object to {s3_path}")
 
         except Exception as e:
             logger.error(f"Error saving to S3: {str(e)}")
             raise
 
-    def save_metrics(self, validation_results, splits_info):
+    def submit_frame(self, writes, df, s3_path):
+        """Queue a DataFrame write on an ArtifactWriter"""
+        writes.submit(s3_path, self.save_to_s3, df, s3_path, True)
+
+    def upload_file(self, local_path, s3_path):
+        """Upload a local file to S3 and remove it"""
+        bucket, key = parse_s3_path(s3_path)
+        self.s3_client.upload_file(local_path, bucket, key)
+        os.remove(local_path)
+
+    def save_metrics(self, validation_results, splits_info, profile=None):
         """Save pipeline metrics to S3"""
         import json
 
@@ -254,6 +1169,9 @@ class GlueETLPipeline:
             'pipeline_status': 'completed',
             'timestamp': pd.Timestamp.now().isoformat()
         }
+        if profile is not None:
+            # Column statistics of the cleaned data, and how many passes over the data produced them
+            metrics['column_profile'] = profile.to_dict()
 
         # Save locally first
         local_metrics_path = "/tmp/pipeline_metrics.json"
@@ -261,69 +1179,290 @@ class GlueETLPipeline:
             json.dump(metrics, f, indent=2)
 
         # Upload to S3
-        path_parts = METRICS_PATH.replace("s3://", "").split("/")
-        bucket = path_parts[0]
-        key = "/".join(path_parts[1:])
+        bucket, key = parse_s3_path(METRICS_PATH)
 
         self.s3_client.upload_file(local_metrics_path, bucket, key)
         logger.info(f"Saved metrics to {METRICS_PATH}")
 
         return metrics
 
-    def run_pipeline(self):
-        """Main pipeline execution"""
-        logger.info("Starting ETL Pipeline")
+    def transform_frame(self, preprocessor, df):
+        """Preprocess a cleaned frame into named feature columns, keeping the target column"""
+        return preprocess_frame(preprocessor, df, self.processed_format == OUTPUT_FORMAT_NPZ)
+
+    def run_chunked_pipeline(self):
+        """Pipeline execution in two passes over chunks of the input, with bounded memory.
+
+        The first pass de-duplicates rows, assigns them to splits and gathers the statistics for
+        imputation, validation and preprocessor fitting. The second pass cleans, splits and
+        transforms every chunk and appends it to local output files, which are uploaded concurrently
+        at the end.
+        The preprocessor is fitted incrementally on the training rows of the first pass. Medians
+        come from a uniform sample of sample_rows values per column, so they are exact whenever
+        a column has no more values than that.
+        """
+        logger.info(f"Starting ETL Pipeline in chunked mode ({self.chunk_rows} rows per chunk)")
+
+        try:
+            # Pass 1: statistics
+            logger.info("=== Pass 1: Profiling Data ===")
+            fitter = IncrementalPreprocessor(self.sample_rows)
+            stats = ChunkStatistics(self.sample_rows, fitter, self.split_key)
+            for chunk in read_chunks(RAW_DATA_PATH, self.chunk_rows):
+                stats.add(chunk)
+            profile = stats.profile
+            profile.scans += 1  # Hashing and statistics share the first pass
+            logger.info(f"Read {profile.records} records in {len(stats.assignments)} chunks, "
+                        f"{profile.duplicates} duplicates")
+            logger.info(f"Missing values per column:\n{pd.Series(profile.null_counts)}")
+
+            fill_values = stats.fill_values()
+            for column, value in fill_values.items():
+                logger.info(f"Column '{column}' has {profile.null_counts[column]} missing values, filled with {value}")
+
+            logger.info(f"Fitting preprocessor incrementally on {fitter.rows} training records")
+            preprocessor = fitter.fit_preprocessor(self.create_preprocessor(fitter.design_frame(fill_values)), fill_values)
+            feature_names = list(preprocessor.get_feature_names_out())
+            if TARGET_COLUMN in stats.columns:
+                feature_names.append(TARGET_COLUMN)
+
+            # Uploads run in the background while the second pass computes
+            with ArtifactWriter(self.write_workers) as writes:
+                writes.submit(PREPROCESSOR_PATH, self.save_to_s3, preprocessor, PREPROCESSOR_PATH)
+
+                # Pass 2: clean, split, transform and write every chunk
+                logger.info("=== Pass 2: Transforming Data ===")
+                os.makedirs(LOCAL_OUTPUT_DIR, exist_ok=True)
+                raw_output_path = with_format(RAW_OUTPUT_PATH, self.output_format)
+                outputs = {raw_output_path: stats.columns}
+                split_paths = {SPLIT_TRAIN: TRAIN_PATH, SPLIT_VALID: VALID_PATH, SPLIT_TEST: TEST_PATH}
+                for path in split_paths.values():
+                    outputs[with_format(path, self.output_format)] = stats.columns
+                    outputs[processed_path(path, self.processed_format)] = feature_names
+                writers = {
+                    path: LocalDatasetWriter(os.path.join(LOCAL_OUTPUT_DIR, path.split("/")[-1]), columns)
+                    for path, columns in outputs.items()
+                }
+
+                stats.seen_hashes = None
+                clean_hashes = HashSet()
+                clean_duplicates = 0
+                for chunk, assignment in zip(read_chunks(RAW_DATA_PATH, self.chunk_rows), stats.assignments):
+                    kept = assignment != SPLIT_DUPLICATE
+                    clean = stats.clean(chunk[kept], fill_values)
+                    first = first_occurrences(row_hashes(clean), clean_hashes)
+                    clean_duplicates += int((~first).sum())
+                    writers[raw_output_path].write(clean)
+                    for code, path in split_paths.items():
+                        split = clean[assignment[kept] == code]
+                        if len(split):
+                            writers[with_format(path, self.output_format)].write(split)
+                            writers[processed_path(path, self.processed_format)].write(
+                                self.transform_frame(preprocessor, split))
+
+                logger.info(f"Duplicates after imputation: {clean_duplicates}")
+                clean_profile = profile.cleaned(fill_values, clean_duplicates)
+                clean_profile.scans += 1  # The second pass found the duplicates after imputation
+                validation_results = clean_profile.validation_results()
+                logger.info(f"Validation results: {validation_results}")
+
+                logger.info("=== Saving Artifacts ===")
+                for path, writer in writers.items():
+                    writer.close()
+                    writes.submit(path, self.upload_file, writer.local_path, path)
+                writes.join_or_raise()
+
+            splits_info = {
+                'train_records': stats.split_counts[SPLIT_TRAIN],
+                'validation_records': stats.split_counts[SPLIT_VALID],
+                'test_records': stats.split_counts[SPLIT_TEST],
+                'split_ratio': '70/15/15'
+            }
+            metrics = self.save_metrics(validation_results, splits_info, clean_profile)
+
+            logger.info("=== Pipeline Execution Summary ===")
+            logger.info(f"• Original data: {profile.records} records")
+            logger.info(f"• Cleaned data: {profile.unique_records} records")
+            logger.info(f"• Training set: {splits_info['train_records']} records")
+            logger.info(f"• Validation set: {splits_info['validation_records']} records")
+            logger.info(f"• Test set: {splits_info['test_records']} records")
+            logger.info(f"• Preprocessor saved to: {PREPROCESSOR_PATH}")
+            logger.info(f"• Metrics saved to: {METRICS_PATH}")
+
+            return metrics
+
+        except Exception as e:
+            logger.error(f"Pipeline failed: {str(e)}")
+            raise
+
+    def run_spark_pipeline(self):
+        """Pipeline execution on Spark, spread over the Glue job's workers.
+
+        The stages match the pandas path: rows are de-duplicated, split by the same row hashes
+        (taken before imputation), filled with the medians and modes of the distinct rows, and
+        transformed by a preprocessor fitted to statistics of the training rows, so the outputs and
+        preprocessor.pkl are equivalent. Only aggregates reach the driver; every output is written
+        by the workers as part files under its path, which is a prefix in this mode (see write_spark()).
+        """
+        from pyspark.sql import functions as F
+        from pyspark.sql import types as T
+
+        logger.info("Starting ETL Pipeline on Spark")
 
         try:
+            spark = spark_session()
+
             # Step 1: Load data
             logger.info("=== Step 1: Loading Data ===")
-            df = self.load_data()
+            df, totals = read_spark(spark, RAW_DATA_PATH)
+            logger.info(f"Loaded {totals['records']} records with {len(df.columns)} columns")
 
-            # Step 2: Clean data
+            # Step 2: Clean data; rows are split by their values as read, so imputation never moves them
             logger.info("=== Step 2: Cleaning Data ===")
-            df_clean = self.clean_data(df)
-
-            # Save cleaned raw data
-            self.save_to_s3(df_clean, RAW_OUTPUT_PATH, is_dataframe=True)
+            split_key = self.split_key
+            rows = df.dropDuplicates().mapInPandas(
+                lambda batches: split_batches(batches, split_key),
+                T.StructType(df.schema.fields + [T.StructField(SPLIT_COLUMN, T.IntegerType())])
+            ).persist()
+            profile = spark_profile(rows.drop(SPLIT_COLUMN), totals)
+            logger.info(f"Removed {profile.duplicates} duplicate records")
+            logger.info(f"Missing values per column:\n{pd.Series(profile.null_counts)}")
+
+            fill_values = profile.fill_values()
+            for column, value in fill_values.items():
+                logger.info(f"Column '{column}' has {profile.null_counts[column]} missing values, filled with {value}")
+            fills = {column: value for column, value in fill_values.items() if pd.notnull(value)}
+            clean = (rows.na.fill(fills) if fills else rows).persist()
+            clean_duplicates = profile.unique_records - clean.drop(SPLIT_COLUMN).distinct().count()
+            logger.info(f"Duplicates after imputation: {clean_duplicates}")
 
             # Step 3: Validate data
             logger.info("=== Step 3: Validating Data ===")
-            validation_results = self.validate_data(df_clean)
+            clean_profile = profile.cleaned(fill_values, clean_duplicates)
+            clean_profile.scans += 1  # Counting the distinct rows after imputation
+            validation_results = clean_profile.validation_results()
+            logger.info(f"Validation results: {validation_results}")
 
             # Step 4: Split data
             logger.info("=== Step 4: Splitting Data ===")
-            train_df, valid_df, test_df = self.split_data(df_clean)
+            split_counts = {SPLIT_TRAIN: 0, SPLIT_VALID: 0, SPLIT_TEST: 0}
+            for row in clean.groupBy(SPLIT_COLUMN).count().collect():
+                split_counts[row[SPLIT_COLUMN]] = row['count']
+            splits = {code: clean.where(F.col(SPLIT_COLUMN) == code).drop(SPLIT_COLUMN) for code in split_counts}
+
+            # Step 5: Preprocess data
+            logger.info("=== Step 5: Preprocessing Data ===")
+            fitter = spark_fitter(splits[SPLIT_TRAIN], clean_profile.dtypes)
+            logger.info(f"Fitting preprocessor on statistics of {fitter.rows} training records")
+            preprocessor = fitter.fit_preprocessor(self.create_preprocessor(fitter.design_frame()))
+            processed_schema = T.StructType(
+                [T.StructField(name, T.DoubleType()) for name in preprocessor.get_feature_names_out()]
+                + [field for field in clean.schema.fields if field.name == TARGET_COLUMN]
+            )
+
+            # Step 6: Save outputs and preprocessor
+            logger.info("=== Step 6: Saving Artifacts ===")
+            with ArtifactWriter(self.write_workers) as writes:
+                writes.submit(PREPROCESSOR_PATH, self.save_to_s3, preprocessor, PREPROCESSOR_PATH)
+                outputs = {with_format(RAW_OUTPUT_PATH, self.output_format): clean.drop(SPLIT_COLUMN)}
+                for code, path in [(SPLIT_TRAIN, TRAIN_PATH), (SPLIT_VALID, VALID_PATH), (SPLIT_TEST, TEST_PATH)]:
+                    outputs[with_format(path, self.output_format)] = splits[code]
+                    outputs[processed_path(path, self.processed_format)] = splits[code].mapInPandas(
+                        lambda batches: preprocess_batches(batches, preprocessor), processed_schema
+                    )
+                for path, frame in outputs.items():
+                    writes.submit(path, write_spark, frame, path)
+                writes.join_or_raise()
+            clean.unpersist()
+            rows.unpersist()
 
             splits_info = {
-                'train_records': len(train_df),
-                'validation_records': len(valid_df),
-                'test_records': len(test_df),
+                'train_records': split_counts[SPLIT_TRAIN],
+                'validation_records': split_counts[SPLIT_VALID],
+                'test_records': split_counts[SPLIT_TEST],
                 'split_ratio': '70/15/15'
             }
 
-            # Save raw splits
-            self.save_to_s3(train_df, TRAIN_PATH, is_dataframe=True)
-            self.save_to_s3(valid_df, VALID_PATH, is_dataframe=True)
-            self.save_to_s3(test_df, TEST_PATH, is_dataframe=True)
+            # Step 7: Save metrics
+            logger.info("=== Step 7: Saving Metrics ===")
+            metrics = self.save_metrics(validation_results, splits_info, clean_profile)
+
+            logger.info("=== Pipeline Execution Summary ===")
+            logger.info(f"• Original data: {profile.records} records")
+            logger.info(f"• Cleaned data: {profile.unique_records} records")
+            logger.info(f"• Training set: {splits_info['train_records']} records")
+            logger.info(f"• Validation set: {splits_info['validation_records']} records")
+            logger.info(f"• Test set: {splits_info['test_records']} records")
+            logger.info(f"• Preprocessor saved to: {PREPROCESSOR_PATH}")
+            logger.info(f"• Metrics saved to: {METRICS_PATH}")
 
-            # Step 5: Preprocess data
-            logger.info("=== Step 5: Preprocessing Data ===")
-            train_processed, valid_processed, test_processed, preprocessor = self.preprocess_data(
-                train_df, valid_df, test_df
-            )
+            return metrics
 
-            # Save processed datasets
-            self.save_to_s3(train_processed, TRAIN_PATH.replace('.csv', '_processed.csv'), is_dataframe=True)
-            self.save_to_s3(valid_processed, VALID_PATH.replace('.csv', '_processed.csv'), is_dataframe=True)
-            self.save_to_s3(test_processed, TEST_PATH.replace('.csv', '_processed.csv'), is_dataframe=True)
+        except Exception as e:
+            logger.error(f"Pipeline failed: {str(e)}")
+            raise
 
-            # Step 6: Save preprocessor
-            logger.info("=== Step 6: Saving Artifacts ===")
-            self.save_to_s3(preprocessor, PREPROCESSOR_PATH)
+    def run_pipeline(self):
+        """Main pipeline execution"""
+        if self.execution_mode == EXECUTION_MODE_CHUNKED:
+            return self.run_chunked_pipeline()
+        if self.execution_mode == EXECUTION_MODE_SPARK:
+            return self.run_spark_pipeline()
+
+        logger.info("Starting ETL Pipeline")
+
+        try:
+            # Step 1: Load data
+            logger.info("=== Step 1: Loading Data ===")
+            df = self.load_data()
+
+            # Step 2: Clean data
+            logger.info("=== Step 2: Cleaning Data ===")
+            df_clean = self.clean_data(df)
+
+            # Save cleaned raw data; writes run in the background while the next steps compute
+            with ArtifactWriter(self.write_workers) as writes:
+                self.submit_frame(writes, df_clean, with_format(RAW_OUTPUT_PATH, self.output_format))
+
+                # Step 3: Validate data
+                logger.info("=== Step 3: Validating Data ===")
+                validation_results = self.validate_data(df_clean)
+
+                # Step 4: Split data
+                logger.info("=== Step 4: Splitting Data ===")
+                train_df, valid_df, test_df = self.split_data(df_clean)
+
+                splits_info = {
+                    'train_records': len(train_df),
+                    'validation_records': len(valid_df),
+                    'test_records': len(test_df),
+                    'split_ratio': '70/15/15'
+                }
+
+                # Save raw splits
+                self.submit_frame(writes, train_df, with_format(TRAIN_PATH, self.output_format))
+                self.submit_frame(writes, valid_df, with_format(VALID_PATH, self.output_format))
+                self.submit_frame(writes, test_df, with_format(TEST_PATH, self.output_format))
+
+                # Step 5: Preprocess data
+                logger.info("=== Step 5: Preprocessing Data ===")
+                train_processed, valid_processed, test_processed, preprocessor = self.preprocess_data(
+                    train_df, valid_df, test_df
+                )
+
+                # Save processed datasets
+                self.submit_frame(writes, train_processed, processed_path(TRAIN_PATH, self.processed_format))
+                self.submit_frame(writes, valid_processed, processed_path(VALID_PATH, self.processed_format))
+                self.submit_frame(writes, test_processed, processed_path(TEST_PATH, self.processed_format))
+
+                # Step 6: Save preprocessor, then wait for every write
+                logger.info("=== Step 6: Saving Artifacts ===")
+                writes.submit(PREPROCESSOR_PATH, self.save_to_s3, preprocessor, PREPROCESSOR_PATH)
+                writes.join_or_raise()
 
             # Step 7: Save metrics
             logger.info("=== Step 7: Saving Metrics ===")
-            metrics = self.save_metrics(validation_results, splits_info)
+            metrics = self.save_metrics(validation_results, splits_info, self.get_profile(df_clean))
 
             # Final summary
             logger.info("=== Pipeline Execution Summary ===")
@@ -341,10 +1480,34 @@ class GlueETLPipeline:
             logger.error(f"Pipeline failed: {str(e)}")
             raise
 
+def get_job_arguments(argv=None):
+    """Optional job parameters, e.g. --execution_mode chunked --chunk_rows 100000"""
+    parser = argparse.ArgumentParser(allow_abbrev=False)
+    parser.add_argument("--execution_mode",
+                        choices=[EXECUTION_MODE_IN_MEMORY, EXECUTION_MODE_CHUNKED, EXECUTION_MODE_SPARK],
+                        default=EXECUTION_MODE_IN_MEMORY)
+    parser.add_argument("--chunk_rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--sample_rows", type=int, default=DEFAULT_SAMPLE_ROWS)
+    parser.add_argument("--fit_mode", choices=[FIT_MODE_FULL, FIT_MODE_INCREMENTAL], default=FIT_MODE_FULL)
+    parser.add_argument("--output_format", choices=[OUTPUT_FORMAT_CSV, OUTPUT_FORMAT_PARQUET],
+                        default=OUTPUT_FORMAT_CSV)
+    parser.add_argument("--processed_format", choices=[OUTPUT_FORMAT_CSV, OUTPUT_FORMAT_PARQUET, OUTPUT_FORMAT_NPZ],
+                        help="Format of the processed feature matrices (default: --output_format)")
+    parser.add_argument("--split_key", help="Comma-separated columns that identify a row for splitting "
+                                              "(default: the whole row)")
+    parser.add_argument("--write_workers", type=int, default=DEFAULT_WRITE_WORKERS,
+                        help="Concurrent S3 writes")
+    # Glue passes its own arguments as well
+    args, _ = parser.parse_known_args(argv)
+    return args
+
 def main():
     """Main entry point for Glue job"""
     # Initialize pipeline
-    pipeline = GlueETLPipeline()
+    args = get_job_arguments()
+    pipeline = GlueETLPipeline(args.execution_mode, args.chunk_rows, args.sample_rows, args.fit_mode,
+                               args.output_format, args.processed_format, args.write_workers,
+                               args.split_key.split(',') if args.split_key else None)
 
     # Run pipeline
     metrics = pipeline.run_pipeline()
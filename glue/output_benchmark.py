@@ -0,0 +1,119 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from etl_feature_engineering import (
+    OUTPUT_FORMAT_CSV,
+    OUTPUT_FORMAT_NPZ,
+    OUTPUT_FORMAT_PARQUET,
+    TARGET_COLUMN,
+    GlueETLPipeline,
+    read_npz,
+    write_npz
+)
+
+# The Lambda benchmark's seeded generator, so both benchmarks measure the same records
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "terraform", "processing"))
+from benchmark import generate_records  # noqa: E402
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Benchmark defaults
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_REPEATS = 3
+DEFAULT_SEED = 42
+
+def write_output(df: pd.DataFrame, path: str, output_format: str):
+    """Write a frame the way the job writes it"""
+    if output_format == OUTPUT_FORMAT_CSV:
+        df.to_csv(path, index=False)
+    elif output_format == OUTPUT_FORMAT_PARQUET:
+        df.to_parquet(path, index=False)
+    else:
+        write_npz(df, path)
+
+def read_output(path: str, output_format: str):
+    """Read an output back the way a training job would"""
+    if output_format == OUTPUT_FORMAT_CSV:
+        return pd.read_csv(path)
+    if output_format == OUTPUT_FORMAT_PARQUET:
+        return pd.read_parquet(path)
+    return read_npz(path)
+
+def measure(df: pd.DataFrame, output_format: str, directory: str, repeats: int) -> Dict:
+    """Best write and read time over repeats, and the file size"""
+    path = os.path.join(directory, f"output.{output_format}")
+    write_times, read_times = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        write_output(df, path, output_format)
+        write_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        read_output(path, output_format)
+        read_times.append(time.perf_counter() - start)
+    size = os.path.getsize(path)
+    os.remove(path)
+    return {"bytes": size, "write_seconds": round(min(write_times), 4), "read_seconds": round(min(read_times), 4)}
+
+def run_benchmark(rows_list: List[int], repeats: int = DEFAULT_REPEATS, seed: int = DEFAULT_SEED) -> Dict:
+    """Compare CSV, Parquet and NPZ outputs of the raw splits and processed features"""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in rows_list:
+            df = generate_records(rows, seed=seed)
+            X = df.drop(columns=[TARGET_COLUMN])
+            dense = GlueETLPipeline(processed_format=OUTPUT_FORMAT_PARQUET)
+            preprocessor = dense.create_preprocessor(df)
+            preprocessor.fit(X)
+
+            processed = dense.feature_frame(preprocessor, X)
+            processed[TARGET_COLUMN] = df[TARGET_COLUMN].values
+            sparse_processed = GlueETLPipeline(processed_format=OUTPUT_FORMAT_NPZ).feature_frame(preprocessor, X)
+            sparse_processed[TARGET_COLUMN] = df[TARGET_COLUMN].values
+
+            outputs = [
+                ("split", OUTPUT_FORMAT_CSV, df),
+                ("split", OUTPUT_FORMAT_PARQUET, df),
+                ("processed", OUTPUT_FORMAT_CSV, processed),
+                ("processed", OUTPUT_FORMAT_PARQUET, processed),
+                ("processed", OUTPUT_FORMAT_NPZ, sparse_processed)
+            ]
+            for output, output_format, frame in outputs:
+                result = {"rows": rows, "output": output, "format": output_format}
+                result.update(measure(frame, output_format, directory, repeats))
+                logger.info(f"{result}")
+                results.append(result)
+
+    return {"generated_at": datetime.utcnow().isoformat() + "Z", "repeats": repeats, "results": results}
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Glue job's output formats against CSV")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default="output_benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.rows, args.repeats, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = {(r["rows"], r["output"]): r for r in report["results"] if r["format"] == OUTPUT_FORMAT_CSV}
+    for result in report["results"]:
+        csv = baseline[(result["rows"], result["output"])]
+        print(f"{result['rows']:>10} {result['output']:>9} {result['format']:>8} "
+              f"{result['bytes'] / 1e6:>9.2f} MB ({result['bytes'] / csv['bytes']:>5.0%} of CSV) "
+              f"write {result['write_seconds']:>7.3f}s read {result['read_seconds']:>7.3f}s")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("awswrangler")
+
+import etl_feature_engineering as etl
+
+def fail(message):
+    raise OSError(message)
+
+def test_failed_writes_are_reported_per_path():
+    written = []
+    writes = etl.ArtifactWriter(max_workers=2)
+    writes.submit("s3://bucket/train.csv", written.append, "train")
+    writes.submit("s3://bucket/validation.csv", fail, "access denied")
+    writes.submit("s3://bucket/test.csv", fail, "slow down")
+
+    with pytest.raises(RuntimeError, match="2 of 3 writes failed") as error:
+        writes.join_or_raise()
+
+    assert "s3://bucket/validation.csv" in str(error.value)
+    assert "s3://bucket/test.csv" in str(error.value)
+    assert written == ["train"]
+
+def test_join_returns_the_error_of_each_failed_path():
+    writes = etl.ArtifactWriter(max_workers=2)
+    writes.submit("s3://bucket/a.csv", fail, "first")
+    writes.submit("s3://bucket/b.csv", lambda: None)
+    writes.submit("s3://bucket/c.csv", fail, "second")
+
+    assert writes.join() == {"s3://bucket/a.csv": "first", "s3://bucket/c.csv": "second"}
+
+def test_error_before_join_cancels_pending_writes():
+    written = []
+    with pytest.raises(ValueError):
+        with etl.ArtifactWriter(max_workers=1) as writes:
+            writes.submit("s3://bucket/running.csv", lambda: (time.sleep(0.2), written.append("running")))
+            writes.submit("s3://bucket/pending.csv", written.append, "pending")
+            raise ValueError("preprocessing failed")
+
+    # The running write finished before the context exited; the queued one never ran
+    assert written == ["running"]
+    assert writes.futures["s3://bucket/pending.csv"].cancelled()
+
+def test_each_thread_has_its_own_session():
+    sessions = {}
+
+    def record(name):
+        sessions[name] = (etl.thread_session(), etl.thread_session())
+
+    threads = [threading.Thread(target=record, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sessions["a"][0] is sessions["a"][1]
+    assert sessions["a"][0] is not sessions["b"][0]
@@ -0,0 +1,78 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("awswrangler")
+
+import etl_feature_engineering as etl
+
+def messy_frame(rows=3000):
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 65, rows).astype("float64"),
+        "sex": rng.choice(["male", "female"], rows).astype(object),
+        "bmi": rng.uniform(15, 45, rows).round(1),
+        "children": rng.integers(0, 6, rows),
+        "smoker": rng.choice(["yes", "no", "no"], rows).astype(object),
+        "region": rng.choice(["northeast", "northwest", "southeast", "southwest"], rows).astype(object),
+        "charges": rng.uniform(1000, 50000, rows).round(2)
+    })
+    for column in ["age", "sex", "bmi", "region"]:
+        df.loc[rng.choice(rows, rows // 15, replace=False), column] = None
+    df = pd.concat([df, df.sample(rows // 10, random_state=1)], ignore_index=True)
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)))
+
+def reference_validation(df):
+    """validate_data() as it computed its results with one pandas scan per statistic"""
+    results = {
+        'total_records': len(df),
+        'total_columns': len(df.columns),
+        'has_duplicates': df.duplicated().sum() == 0,
+        'has_missing_values': df.isnull().sum().sum() == 0,
+        'column_types': df.dtypes.astype(str).to_dict(),
+        'missing_required_columns': [col for col in etl.REQUIRED_COLUMNS if col not in df.columns]
+    }
+    for col in etl.NUMERICAL_COLUMNS:
+        results[f'{col}_min'] = df[col].min()
+        results[f'{col}_max'] = df[col].max()
+        results[f'{col}_mean'] = df[col].mean()
+    return results
+
+def assert_same_results(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        assert actual[name] == (pytest.approx(value, rel=1e-12) if isinstance(value, float) else value), name
+
+def test_profile_matches_pandas():
+    df = messy_frame()
+    profile = etl.ColumnProfile.from_frame(df)
+
+    assert profile.duplicates == df.duplicated().sum()
+    assert profile.null_counts == df.drop_duplicates().isnull().sum().to_dict()
+    assert profile.scans == 2
+
+    distinct = df.drop_duplicates()
+    expected_fills = {
+        column: distinct[column].median() if profile.is_numeric(column) else distinct[column].mode()[0]
+        for column in distinct.columns if distinct[column].isnull().any()
+    }
+    assert profile.fill_values() == expected_fills
+    assert_same_results(profile.validation_results(), reference_validation(df))
+
+def test_cleaned_profile_needs_no_scan():
+    df = messy_frame()
+    pipeline = etl.GlueETLPipeline()
+    clean = pipeline.clean_data(df)
+
+    # Cleaning, validation and the metrics share the profile of the first two scans
+    profile = pipeline.get_profile(clean)
+    assert profile.scans == 2
+    assert_same_results(pipeline.validate_data(clean), reference_validation(clean))
+    assert profile.to_dict()["data_scans"] == 2
+
+    rescanned = etl.ColumnProfile.from_frame(clean)
+    assert profile.duplicates == rescanned.duplicates
+    assert profile.null_counts == rescanned.null_counts
+    assert profile.medians == pytest.approx(rescanned.medians)
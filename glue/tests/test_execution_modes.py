@@ -0,0 +1,129 @@
+import io
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+moto = pytest.importorskip("moto")
+wr = pytest.importorskip("awswrangler")
+
+import boto3
+
+import etl_feature_engineering as etl
+
+ROWS = 20000
+CHUNK_ROWS = 3000
+
+@pytest.fixture
+def s3():
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=etl.S3_BUCKET)
+        yield client
+
+def messy_records(rows):
+    """Insurance records with missing values in every feature, repeated rows and rows that only repeat once filled"""
+    rng = np.random.default_rng(19)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 65, rows),
+        "sex": rng.choice(["male", "female"], rows).astype(object),
+        "bmi": rng.uniform(15, 45, rows).round(1),
+        "children": rng.integers(0, 6, rows),
+        "smoker": rng.choice(["yes", "no", "no", "no"], rows).astype(object),
+        "region": rng.choice(["northeast", "northwest", "southeast", "southwest"], rows).astype(object),
+        "charges": rng.uniform(1000, 50000, rows).round(2)
+    })
+    df.loc[rng.choice(rows, rows // 20, replace=False), "age"] = np.nan
+    for column in ["sex", "bmi", "smoker", "region"]:
+        df.loc[rng.choice(rows, rows // 20, replace=False), column] = None
+    # Half of the repeats sit in later chunks than the rows they repeat
+    repeats = df.sample(rows // 10, random_state=3)
+    return pd.concat([df, repeats], ignore_index=True).sample(frac=1, random_state=4).reset_index(drop=True)
+
+def read_outputs(s3):
+    """Every dataset the job wrote, and its preprocessor"""
+    outputs = {etl.RAW_OUTPUT_PATH: wr.s3.read_csv(etl.RAW_OUTPUT_PATH)}
+    for path in [etl.TRAIN_PATH, etl.VALID_PATH, etl.TEST_PATH]:
+        outputs[path] = wr.s3.read_csv(path)
+        outputs[etl.processed_path(path, etl.OUTPUT_FORMAT_CSV)] = wr.s3.read_csv(
+            etl.processed_path(path, etl.OUTPUT_FORMAT_CSV))
+    bucket, key = etl.parse_s3_path(etl.PREPROCESSOR_PATH)
+    preprocessor = joblib.load(io.BytesIO(s3.get_object(Bucket=bucket, Key=key)["Body"].read()))
+    return outputs, preprocessor
+
+def run(s3, *args, **kwargs):
+    metrics = etl.GlueETLPipeline(*args, **kwargs).run_pipeline()
+    return metrics, *read_outputs(s3)
+
+@pytest.fixture
+def raw(s3):
+    wr.s3.to_csv(messy_records(ROWS), etl.RAW_DATA_PATH, index=False)
+
+def assert_same_preprocessor(actual, expected):
+    assert list(actual.get_feature_names_out()) == list(expected.get_feature_names_out())
+    for name in ["num_pipeline", "cat_pipeline"]:
+        actual_steps = actual.named_transformers_[name].named_steps
+        expected_steps = expected.named_transformers_[name].named_steps
+        np.testing.assert_array_equal(actual_steps["imputer"].statistics_, expected_steps["imputer"].statistics_)
+        np.testing.assert_allclose(actual_steps["scaler"].scale_, expected_steps["scaler"].scale_, rtol=1e-9)
+        if "encoder" in expected_steps:
+            for actual_categories, expected_categories in zip(actual_steps["encoder"].categories_,
+                                                              expected_steps["encoder"].categories_):
+                np.testing.assert_array_equal(actual_categories, expected_categories)
+
+def assert_same_outputs(actual, expected):
+    assert actual.keys() == expected.keys()
+    for path, df in expected.items():
+        pd.testing.assert_frame_equal(actual[path], df, check_exact=False, rtol=1e-9, obj=path)
+
+def assert_same_validation(actual, expected):
+    """Equal results, up to the rounding of means summed in a different order"""
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        assert actual[name] == (pytest.approx(value, rel=1e-12) if isinstance(value, float) else value), name
+
+def test_chunked_mode_matches_in_memory(s3, raw):
+    expected_metrics, expected, expected_preprocessor = run(s3)
+    metrics, outputs, preprocessor = run(s3, etl.EXECUTION_MODE_CHUNKED, chunk_rows=CHUNK_ROWS)
+
+    assert_same_outputs(outputs, expected)
+    assert_same_preprocessor(preprocessor, expected_preprocessor)
+    assert metrics["data_splits"] == expected_metrics["data_splits"]
+    assert_same_validation(metrics["data_validation"], expected_metrics["data_validation"])
+
+def test_incremental_fit_matches_full_fit(s3, raw):
+    _, expected, expected_preprocessor = run(s3)
+    _, outputs, preprocessor = run(s3, fit_mode=etl.FIT_MODE_INCREMENTAL, chunk_rows=CHUNK_ROWS)
+
+    assert_same_outputs(outputs, expected)
+    assert_same_preprocessor(preprocessor, expected_preprocessor)
+
+def test_sampled_medians_stay_close(s3, raw):
+    # bmi has more distinct values than are sampled, so its median is estimated; the rest of the fit stays exact
+    _, _, expected_preprocessor = run(s3)
+    _, _, preprocessor = run(s3, fit_mode=etl.FIT_MODE_INCREMENTAL, chunk_rows=CHUNK_ROWS, sample_rows=200)
+
+    actual_steps = preprocessor.named_transformers_["num_pipeline"].named_steps
+    expected_steps = expected_preprocessor.named_transformers_["num_pipeline"].named_steps
+    np.testing.assert_allclose(actual_steps["imputer"].statistics_, expected_steps["imputer"].statistics_, rtol=0.1)
+    np.testing.assert_allclose(actual_steps["scaler"].mean_, expected_steps["scaler"].mean_, rtol=1e-9)
+
+def test_parquet_and_npz_outputs_match_csv(s3, raw, tmp_path):
+    _, expected, _ = run(s3)
+    etl.GlueETLPipeline(output_format=etl.OUTPUT_FORMAT_PARQUET, processed_format=etl.OUTPUT_FORMAT_NPZ).run_pipeline()
+
+    for path in [etl.RAW_OUTPUT_PATH, etl.TRAIN_PATH, etl.VALID_PATH, etl.TEST_PATH]:
+        # Parquet keeps the column types the job computed with
+        df = wr.s3.read_parquet(etl.with_format(path, etl.OUTPUT_FORMAT_PARQUET))
+        pd.testing.assert_frame_equal(df, expected[path], check_dtype=False)
+        assert pd.api.types.is_integer_dtype(df["children"])
+    for path in [etl.TRAIN_PATH, etl.VALID_PATH, etl.TEST_PATH]:
+        local_path = str(tmp_path / "features.npz")
+        bucket, key = etl.parse_s3_path(etl.processed_path(path, etl.OUTPUT_FORMAT_NPZ))
+        s3.download_file(bucket, key, local_path)
+        matrix, names, y = etl.read_npz(local_path)
+        features = expected[etl.processed_path(path, etl.OUTPUT_FORMAT_CSV)]
+        assert names == list(features.columns[:-1])
+        np.testing.assert_allclose(matrix.toarray(), features[names].to_numpy(), rtol=1e-9)
+        np.testing.assert_allclose(y, features[etl.TARGET_COLUMN].to_numpy())
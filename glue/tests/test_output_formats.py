@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+pytest.importorskip("awswrangler")
+
+import etl_feature_engineering as etl
+
+def feature_frame(rows=500, sparse_features=False, target=True):
+    """Scaled numerical features next to one-hot columns, as preprocess_frame() returns them"""
+    rng = np.random.default_rng(8)
+    features = np.hstack([rng.normal(size=(rows, 3)), np.eye(4)[rng.integers(0, 4, rows)]])
+    names = ["num_pipeline__age", "num_pipeline__bmi", "num_pipeline__children"] + \
+        [f"cat_pipeline__region_{region}" for region in ["northeast", "northwest", "southeast", "southwest"]]
+    if sparse_features:
+        df = pd.DataFrame.sparse.from_spmatrix(sparse.csr_matrix(features), columns=names)
+    else:
+        df = pd.DataFrame(features, columns=names)
+    if target:
+        df[etl.TARGET_COLUMN] = rng.uniform(1000, 50000, rows)
+    return df, features
+
+@pytest.mark.parametrize("sparse_features", [False, True])
+@pytest.mark.parametrize("target", [True, False])
+def test_npz_round_trip(tmp_path, sparse_features, target):
+    df, features = feature_frame(sparse_features=sparse_features, target=target)
+    path = str(tmp_path / "train_processed.npz")
+
+    etl.write_npz(df, path)
+    matrix, names, y = etl.read_npz(path)
+
+    assert sparse.isspmatrix_csr(matrix)
+    np.testing.assert_array_equal(matrix.toarray(), features)
+    assert names == [column for column in df.columns if column != etl.TARGET_COLUMN]
+    if target:
+        np.testing.assert_array_equal(y, df[etl.TARGET_COLUMN].to_numpy())
+    else:
+        assert y is None
+
+    # The features alone load with scipy
+    np.testing.assert_array_equal(sparse.load_npz(path).toarray(), features)
@@ -0,0 +1,128 @@
+import glob
+import io
+import os
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+if os.environ.get("REQUIRE_SPARK"):
+    # CI runs these tests with pyspark and Java installed, and fails rather than skips without them
+    import awswrangler  # noqa: F401
+    import pyspark  # noqa: F401
+else:
+    pytest.importorskip("pyspark")
+    pytest.importorskip("awswrangler")
+
+import etl_feature_engineering as etl
+
+ROWS = 2000
+
+@pytest.fixture(scope="module")
+def spark():
+    from pyspark.sql import SparkSession
+
+    session = (SparkSession.builder.master("local[2]").appName(etl.SPARK_APP_NAME)
+               .config("spark.sql.shuffle.partitions", "2").getOrCreate())
+    # Glue runs the job as __main__; imported here, its functions reach the workers by module name
+    session.sparkContext.addPyFile(etl.__file__)
+    yield session
+    session.stop()
+
+@pytest.fixture
+def raw_path(tmp_path, monkeypatch):
+    """Messy input on local disk, with every job path pointed next to it"""
+    raw = tmp_path / "raw" / "insurance.csv"
+    raw.parent.mkdir()
+    messy_records(ROWS).to_csv(raw, index=False)
+    monkeypatch.setattr(etl, "RAW_DATA_PATH", str(raw))
+    for name, file_name in [("TRAIN_PATH", "train.csv"), ("VALID_PATH", "validation.csv"),
+                            ("TEST_PATH", "test.csv"), ("RAW_OUTPUT_PATH", "raw_cleaned.csv")]:
+        monkeypatch.setattr(etl, name, str(tmp_path / "processed" / file_name))
+    return str(raw)
+
+def messy_records(rows: int) -> pd.DataFrame:
+    """Insurance records with missing values in most columns and repeated rows"""
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame({
+        "age": pd.array(rng.integers(18, 65, rows), dtype="Int64"),
+        "sex": rng.choice(["male", "female"], rows).astype(object),
+        "bmi": rng.uniform(15, 45, rows).round(2),
+        "children": rng.integers(0, 6, rows),
+        "smoker": rng.choice(["yes", "no", "no", "no"], rows).astype(object),
+        "region": rng.choice(["northeast", "northwest", "southeast", "southwest"], rows).astype(object),
+        "charges": rng.uniform(1000, 50000, rows).round(2)
+    })
+    for column in ["age", "sex", "bmi", "smoker", "region"]:
+        df.loc[rng.choice(rows, rows // 20, replace=False), column] = None
+    return pd.concat([df, df.sample(rows // 10, random_state=3)], ignore_index=True)
+
+def read_prefix(path: str) -> pd.DataFrame:
+    """All part files of a Spark output prefix as one frame"""
+    return pd.concat([pd.read_csv(part) for part in sorted(glob.glob(os.path.join(path, "part-*")))],
+                     ignore_index=True)
+
+def sorted_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows in value order, read back from CSV like the written outputs"""
+    df = pd.read_csv(io.StringIO(df.to_csv(index=False)))
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+def run_pandas(raw_path):
+    """Cleaned splits, processed splits and preprocessor of the in-memory path"""
+    pipeline = etl.GlueETLPipeline()
+    clean = pipeline.clean_data(pd.read_csv(raw_path))
+    splits = pipeline.split_data(clean)
+    *processed, preprocessor = pipeline.preprocess_data(*splits)
+    return splits, processed, preprocessor
+
+def run_spark(monkeypatch):
+    """Metrics and preprocessor of the Spark path; the splits are written next to the input"""
+    pipeline = etl.GlueETLPipeline(etl.EXECUTION_MODE_SPARK)
+    saved = {}
+    monkeypatch.setattr(pipeline, "save_to_s3", lambda obj, s3_path, is_dataframe=False: saved.update({s3_path: obj}))
+    pipeline.s3_client = types.SimpleNamespace(upload_file=lambda *args: None)
+    return pipeline.run_pipeline(), saved[etl.PREPROCESSOR_PATH]
+
+def test_fill_values_match_pandas(spark, raw_path):
+    expected = etl.ColumnProfile.from_frame(pd.read_csv(raw_path)).fill_values()
+    df, totals = etl.read_spark(spark, raw_path)
+    actual = etl.spark_profile(df.dropDuplicates(), totals).fill_values()
+
+    assert actual.keys() == expected.keys()
+    for column, value in expected.items():
+        if isinstance(value, str):
+            assert actual[column] == value
+        else:
+            assert actual[column] == pytest.approx(value)
+
+def test_spark_outputs_match_pandas(spark, raw_path, monkeypatch):
+    splits, processed, preprocessor = run_pandas(raw_path)
+    metrics, spark_preprocessor = run_spark(monkeypatch)
+
+    # Every output is a prefix of part files
+    paths = [etl.TRAIN_PATH, etl.VALID_PATH, etl.TEST_PATH]
+    assert [metrics["data_splits"][key] for key in ["train_records", "validation_records", "test_records"]] == \
+        [len(split) for split in splits]
+    for path, split, features in zip(paths, splits, processed):
+        pd.testing.assert_frame_equal(sorted_frame(read_prefix(path)), sorted_frame(split), check_dtype=False)
+        pd.testing.assert_frame_equal(sorted_frame(read_prefix(etl.processed_path(path, etl.OUTPUT_FORMAT_CSV))),
+                                      sorted_frame(features), check_dtype=False)
+    assert len(read_prefix(etl.RAW_OUTPUT_PATH)) == sum(len(split) for split in splits)
+    assert not os.path.exists(os.path.join(etl.TRAIN_PATH, "_SUCCESS"))
+
+    # Preprocessor statistics of the training rows
+    assert list(spark_preprocessor.get_feature_names_out()) == list(preprocessor.get_feature_names_out())
+    expected_num = preprocessor.named_transformers_["num_pipeline"].named_steps
+    actual_num = spark_preprocessor.named_transformers_["num_pipeline"].named_steps
+    np.testing.assert_allclose(actual_num["imputer"].statistics_, expected_num["imputer"].statistics_)
+    np.testing.assert_allclose(actual_num["scaler"].scale_, expected_num["scaler"].scale_)
+    expected_cat = preprocessor.named_transformers_["cat_pipeline"].named_steps
+    actual_cat = spark_preprocessor.named_transformers_["cat_pipeline"].named_steps
+    np.testing.assert_array_equal(actual_cat["imputer"].statistics_, expected_cat["imputer"].statistics_)
+    for actual, expected in zip(actual_cat["encoder"].categories_, expected_cat["encoder"].categories_):
+        np.testing.assert_array_equal(actual, expected)
+    np.testing.assert_allclose(actual_cat["scaler"].scale_, expected_cat["scaler"].scale_)
+
+    X_test = splits[2].drop(columns=[etl.TARGET_COLUMN])
+    np.testing.assert_allclose(spark_preprocessor.transform(X_test), preprocessor.transform(X_test))
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("awswrangler")
+
+import etl_feature_engineering as etl
+
+def records(rows, seed, first_id=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(first_id, first_id + rows),
+        "age": rng.integers(18, 65, rows),
+        "sex": rng.choice(["male", "female"], rows),
+        "bmi": rng.uniform(15, 45, rows).round(2),
+        "charges": rng.uniform(1000, 50000, rows).round(2)
+    })
+
+def assignments(pipeline, df):
+    """id -> split of every row, from split_data()"""
+    splits = pipeline.split_data(df)
+    return {row_id: code for code, split in zip([etl.SPLIT_TRAIN, etl.SPLIT_VALID, etl.SPLIT_TEST], splits)
+            for row_id in split["id"]}
+
+def test_split_fractions():
+    hashes = np.random.default_rng(0).integers(0, 2 ** 64, 200_000, dtype=np.uint64)
+    codes = etl.split_codes(hashes)
+
+    fractions = np.bincount(codes, minlength=4)[1:] / len(codes)
+    expected = [etl.TRAIN_FRACTION, etl.VALID_FRACTION, 1 - etl.TRAIN_FRACTION - etl.VALID_FRACTION]
+    np.testing.assert_allclose(fractions, expected, atol=0.005)
+
+def test_split_of_a_row_ignores_the_other_rows():
+    df = records(5000, seed=1)
+    whole = etl.split_codes(etl.row_hashes(df))
+
+    # Chunks, partitions and another order all give each row the same split
+    chunked = np.concatenate([etl.split_codes(etl.row_hashes(df.iloc[start:start + 700]))
+                              for start in range(0, len(df), 700)])
+    np.testing.assert_array_equal(chunked, whole)
+    shuffled = df.sample(frac=1, random_state=2)
+    np.testing.assert_array_equal(etl.split_codes(etl.row_hashes(shuffled)), whole[shuffled.index])
+
+def test_integer_and_float_chunks_hash_alike():
+    df = records(100, seed=3)
+    with_missing = pd.concat([df, pd.DataFrame({"id": [100], "age": [np.nan]})], ignore_index=True)
+
+    assert str(with_missing["age"].dtype) == "float64"
+    np.testing.assert_array_equal(etl.row_hashes(with_missing.iloc[:100]), etl.row_hashes(df))
+
+@pytest.mark.parametrize("split_key", [None, ["id"]])
+def test_new_rows_never_move_existing_rows(split_key):
+    pipeline = etl.GlueETLPipeline(split_key=split_key)
+    df = records(5000, seed=4)
+    before = assignments(pipeline, df)
+
+    new = records(3000, seed=5, first_id=len(df))
+    grown = pd.concat([new.iloc[:1500], df, new.iloc[1500:]], ignore_index=True)
+    after = assignments(etl.GlueETLPipeline(split_key=split_key), grown)
+
+    assert {row_id: after[row_id] for row_id in before} == before
+
+def test_split_key_keeps_versions_of_a_record_together():
+    pipeline = etl.GlueETLPipeline(split_key=["id"])
+    df = records(2000, seed=6)
+    # A later export of the same records with updated charges
+    updated = df.assign(charges=df["charges"] * 1.1)
+
+    assert assignments(pipeline, updated) == assignments(etl.GlueETLPipeline(split_key=["id"]), df)
@@ -152,6 +152,14 @@ resource "aws_iam_role_policy" "lambda_policy" {
         ],
         Resource = var.secret_arn
       },
+      # Re-invoke itself to continue files paused by the time budget mode
+      {
+        Effect = "Allow",
+        Action = [
+          "lambda:InvokeFunction"
+        ],
+        Resource = "arn:aws:lambda:*:*:function:${var.project_prefix}-validation-transformation"
+      },
       # Lambda logging
       {
         Effect = "Allow",
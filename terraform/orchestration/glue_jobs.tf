@@ -14,6 +14,11 @@ resource "aws_glue_job" "etl_pipeline" {
     "--TempDir"               = "s3://${var.s3_bucket_name}/temp/"
     "--job-bookmark-option"   = "job-bookmark-enable"
     "--enable-continuous-log-filter" = "true"
+    # "chunked" for inputs that do not fit in memory, "spark" to use every worker; in spark mode each output
+    # (processed/train.csv, ...) is a prefix of part files, which the training channel reads as a whole
+    "--execution_mode"        = "in_memory"
+    "--chunk_rows"            = "100000"
+    "--output_format"         = "csv" # "parquet" keeps column types and is several times smaller
   }
 
   glue_version = "4.0"
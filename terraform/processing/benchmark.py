@@ -0,0 +1,400 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Benchmark defaults
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000, 10_000_000]
+DEFAULT_FORMATS = ["csv", "json", "parquet"]
+DEFAULT_DIRTY_RATIOS = [0.0, 0.1]
+DEFAULT_SEED = 42
+RAW_BUCKET = "benchmark-raw"
+FILE_EXTENSIONS = {"csv": "csv", "json": "json", "jsonl": "jsonl", "parquet": "parquet"}
+DEFAULT_COMPRESSIONS = ["none"]
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+MEMORY_HEADROOM = 1.5  # Suggested Lambda memory is the measured peak RSS times this
+DEFAULT_STARTUP_RUNS = 5
+
+# Synthetic insurance records
+SEXES = np.array(["male", "female"], dtype=object)
+SMOKER = np.array(["yes", "no"], dtype=object)
+REGIONS = np.array(["northeast", "northwest", "southeast", "southwest"], dtype=object)
+
+# (field, bad values) pairs a dirty row draws one corruption from
+CORRUPTIONS = [
+    ("age", ["abc", "", "forty"]),
+    ("age", [5, 12, 130]),
+    ("bmi", [3.5, 95.0, "n/a"]),
+    ("children", [-1, 15]),
+    ("sex", ["unknown", "M", "Male"]),
+    ("smoker", ["maybe", "Y"]),
+    ("region", ["central", "NorthEast"]),
+    ("bmi", [""])
+]
+
+def generate_records(rows: int, dirty_ratio: float = 0.0, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """Seeded synthetic insurance records, with dirty_ratio of the rows carrying one invalid field"""
+    rng = np.random.default_rng(seed)
+    age = rng.integers(18, 65, rows)
+    bmi = np.round(rng.normal(30.5, 6.0, rows).clip(15.0, 53.0), 2)
+    children = rng.choice(6, rows, p=[0.43, 0.24, 0.18, 0.11, 0.03, 0.01])
+    smoker = rng.random(rows) < 0.2
+    charges = np.round(2000 + age * 250 + (bmi - 30).clip(0) * 400 + smoker * 23000 + rng.gamma(2.0, 1500, rows), 2)
+
+    df = pd.DataFrame({
+        "age": age,
+        "sex": SEXES[rng.integers(0, 2, rows)],
+        "bmi": bmi,
+        "children": children,
+        "smoker": SMOKER[np.where(smoker, 0, 1)],
+        "region": REGIONS[rng.integers(0, 4, rows)],
+        "charges": charges
+    })
+
+    dirty = rng.choice(rows, int(rows * dirty_ratio), replace=False) if dirty_ratio > 0 else np.array([], dtype=int)
+    kinds = rng.integers(0, len(CORRUPTIONS), len(dirty))
+    for kind, (field, bad_values) in enumerate(CORRUPTIONS):
+        positions = dirty[kinds == kind]
+        if len(positions) == 0:
+            continue
+        values = np.empty(len(bad_values), dtype=object)
+        values[:] = bad_values
+        column = np.array(df[field], dtype=object)
+        column[positions] = values[rng.integers(0, len(values), len(positions))]
+        df[field] = column
+
+    return df
+
+def serialize_records(df: pd.DataFrame, file_format: str) -> bytes:
+    """Encode records the way a producer would upload them"""
+    if file_format == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    if file_format == "json":
+        return df.to_json(orient="records").encode("utf-8")
+    if file_format == "jsonl":
+        return df.to_json(orient="records", lines=True).encode("utf-8")
+    if file_format == "parquet":
+        # Columns holding dirty values mix types, which a Parquet producer would store as text
+        mixed = {c: "string" for c in df.columns if df[c].dtype == object}
+        buffer = io.BytesIO()
+        df.astype(mixed).to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Unsupported format: {file_format}")
+
+def compress_payload(payload: bytes, compression: str) -> bytes:
+    """Compress an uploaded file the way a producer would for the given codec"""
+    if compression == "none":
+        return payload
+    if compression == "gzip":
+        return gzip.compress(payload, compresslevel=6)
+    if compression == "zstd":
+        import pyarrow as pa
+        return pa.compress(payload, "zstd", asbytes=True)
+    raise ValueError(f"Unsupported compression: {compression}")
+
+def _client_error(code: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+class LocalS3:
+    """In-memory stand-in for the S3 client calls made by the validator"""
+
+    def __init__(self):
+        self.objects = {}  # (bucket, key) -> bytes
+        self.uploads = {}  # upload id -> {part number: bytes}
+        self._lock = threading.Lock()
+
+    def _get(self, bucket: str, key: str, operation: str) -> bytes:
+        try:
+            return self.objects[(bucket, key)]
+        except KeyError:
+            raise _client_error("NoSuchKey", operation)
+
+    def _etag(self, body: bytes) -> str:
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, **kwargs) -> Dict:
+        body = self._get(Bucket, Key, "GetObject")
+        if Range:
+            start, _, end = Range[len("bytes="):].partition("-")
+            body = body[int(start):int(end) + 1 if end else None]
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), "ETag": self._etag(body)}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        body = self._get(Bucket, Key, "HeadObject")
+        return {"ContentLength": len(body), "ETag": self._etag(body)}
+
+    def put_object(self, Bucket: str, Key: str, Body=b"", **kwargs) -> Dict:
+        body = Body.read() if hasattr(Body, "read") else bytes(Body)
+        with self._lock:
+            self.objects[(Bucket, Key)] = body
+        return {"ETag": self._etag(body)}
+
+    def copy_object(self, CopySource: Dict, Bucket: str, Key: str, **kwargs) -> Dict:
+        return self.put_object(Bucket, Key, self._get(CopySource["Bucket"], CopySource["Key"], "CopyObject"))
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body, **kwargs) -> Dict:
+        body = bytes(Body)
+        with self._lock:
+            self.uploads[UploadId][PartNumber] = body
+        return {"ETag": self._etag(body)}
+
+    def upload_part_copy(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, CopySource: Dict,
+                         CopySourceRange: str, **kwargs) -> Dict:
+        part = self.get_object(CopySource["Bucket"], CopySource["Key"], Range=CopySourceRange)["Body"].read()
+        return {"CopyPartResult": self.upload_part(Bucket, Key, UploadId, PartNumber, part)}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict, **kwargs) -> Dict:
+        with self._lock:
+            parts = self.uploads.pop(UploadId)
+        body = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+        return self.put_object(Bucket, Key, body)
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kwargs) -> Dict:
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket: str, Delete: Dict, **kwargs) -> Dict:
+        for obj in Delete["Objects"]:
+            self.delete_object(Bucket, obj["Key"])
+        return {}
+
+    def get_paginator(self, operation: str):
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str = "", **kwargs):
+        contents = [
+            {"Key": key, "Size": len(body), "ETag": self._etag(body)}
+            for (bucket, key), body in sorted(self.objects.items())
+            if bucket == Bucket and key.startswith(Prefix)
+        ]
+        yield {"Contents": contents}
+
+    def bucket_bytes(self, bucket: str) -> int:
+        return sum(len(body) for (name, _), body in self.objects.items() if name == bucket)
+
+class LocalSecrets:
+    """Stand-in for Secrets Manager returning a fixed secret configuration"""
+
+    def __init__(self, secret_config: Dict):
+        self.secret_config = secret_config
+
+    def get_secret_value(self, SecretId: str = None, **kwargs) -> Dict:
+        return {"SecretString": json.dumps(self.secret_config)}
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far"""
+    # ru_maxrss survives fork and exec, so a child would inherit the parent's peak; VmHWM does not
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def run_case(input_path: str, key: str, secret_config: Dict) -> Dict:
+    """Run lambda_handler once over one input file against the local stand-ins.
+
+    Meant to run in a fresh process, so the peak RSS belongs to this case alone.
+    """
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("PROCESSED_S3_BUCKET", "benchmark-processed")
+    os.environ.setdefault("ERROR_BUCKET", "benchmark-errors")
+    os.environ.setdefault("SECRET_ARN", "benchmark-secret")
+    import data_validator
+
+    local_s3 = LocalS3()
+    data_validator.s3 = local_s3
+    data_validator.secrets = LocalSecrets({**secret_config, "profiling": True})
+    data_validator.config_cache.invalidate()
+
+    with open(input_path, "rb") as f:
+        local_s3.put_object(RAW_BUCKET, key, f.read())
+    event = {"Records": [{"s3": {"bucket": {"name": RAW_BUCKET}, "object": {"key": key}}}]}
+
+    baseline_rss = peak_rss_bytes()
+    started = time.perf_counter()
+    response = data_validator.lambda_handler(event, None)
+    wall_seconds = time.perf_counter() - started
+    peak_rss = peak_rss_bytes()
+
+    body = json.loads(response["body"])
+    statistics = body.get("statistics", {})
+    profile = statistics.get("profile", {})
+    return {
+        "status_code": response["statusCode"],
+        "error": body.get("error"),
+        "wall_seconds": round(wall_seconds, 6),
+        "stage_seconds": profile.get("phase_seconds", {}),
+        "processed_records": statistics.get("processed_records", 0),
+        "error_records": statistics.get("error_records", 0),
+        "failed_files": statistics.get("failed_files", []),
+        "output_bytes": local_s3.bucket_bytes(data_validator.PROCESSED_BUCKET) + local_s3.bucket_bytes(data_validator.ERROR_BUCKET),
+        "baseline_rss_mb": round(baseline_rss / 2 ** 20, 1),
+        "peak_rss_mb": round(peak_rss / 2 ** 20, 1)
+    }
+
+def run_benchmark(rows: List[int], formats: List[str], dirty_ratios: List[float], seed: int = DEFAULT_SEED,
+                  secret_config: Optional[Dict] = None, work_dir: Optional[str] = None,
+                  compressions: Optional[List[str]] = None) -> Dict:
+    """Benchmark every combination of size, format, codec and dirty ratio, each case in its own process"""
+    secret_config = secret_config or {}
+    compressions = compressions or DEFAULT_COMPRESSIONS
+    context = multiprocessing.get_context("spawn")
+    results = []
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+        for row_count in rows:
+            for dirty_ratio in dirty_ratios:
+                records = generate_records(row_count, dirty_ratio, seed)
+                for file_format in formats:
+                    payload = serialize_records(records, file_format)
+                    for compression in compressions:
+                        key = f"input/records.{FILE_EXTENSIONS[file_format]}{COMPRESSION_SUFFIXES[compression]}"
+                        input_path = os.path.join(temp_dir, os.path.basename(key))
+                        with open(input_path, "wb") as f:
+                            f.write(compress_payload(payload, compression))
+
+                        logger.info(f"Benchmarking {row_count} rows of {file_format} ({compression}) "
+                                    f"with {dirty_ratio:.0%} dirty rows")
+                        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+                            measured = pool.apply(run_case, (input_path, key, secret_config))
+
+                        wall_seconds = measured["wall_seconds"]
+                        input_bytes = os.path.getsize(input_path)
+                        results.append({
+                            "rows": row_count,
+                            "format": file_format,
+                            "compression": compression,
+                            "dirty_ratio": dirty_ratio,
+                            "input_bytes": input_bytes,
+                            "uncompressed_bytes": len(payload),
+                            "rows_per_second": round(row_count / wall_seconds, 1) if wall_seconds else None,
+                            **measured,
+                            # The input held by the local S3 stand-in is excluded; Lambda streams it from S3
+                            "suggested_memory_mb": int(np.ceil(
+                                max(measured["peak_rss_mb"] - input_bytes / 2 ** 20, 128) * MEMORY_HEADROOM
+                            ))
+                        })
+                        os.remove(input_path)
+                    del payload
+                del records
+
+    return {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__
+        },
+        "seed": seed,
+        "secret_config": secret_config,
+        "results": results
+    }
+
+def measure_startup(runs: int = DEFAULT_STARTUP_RUNS) -> Dict:
+    """Import data_validator in fresh interpreters and collect its startup profile (module init, imports, clients)"""
+    env = {
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "PROCESSED_S3_BUCKET": "benchmark-processed",
+        **os.environ
+    }
+    script = "import json, data_validator; print(json.dumps(data_validator.STARTUP_PROFILE))"
+    profiles = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        profiles.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        "runs": runs,
+        "init_seconds_median": round(statistics.median(p["init_seconds"] for p in profiles), 6),
+        "init_seconds_max": max(p["init_seconds"] for p in profiles),
+        "profile": profiles[-1]
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the validation Lambda on synthetic insurance records")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--formats", nargs="+", choices=sorted(FILE_EXTENSIONS), default=DEFAULT_FORMATS)
+    parser.add_argument("--compressions", nargs="+", choices=sorted(COMPRESSION_SUFFIXES), default=DEFAULT_COMPRESSIONS)
+    parser.add_argument("--dirty-ratios", type=float, nargs="+", default=DEFAULT_DIRTY_RATIOS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--config", default="{}", help="Secret configuration as JSON, e.g. '{\"streaming_mode\": true}'")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--startup-budget", type=float, help="Fail if the median module init time exceeds this many seconds")
+    parser.add_argument("--startup-only", action="store_true", help="Only measure module startup")
+    args = parser.parse_args(argv)
+
+    if args.startup_only:
+        report = {"generated_at": datetime.utcnow().isoformat() + "Z", "results": []}
+    else:
+        report = run_benchmark(args.rows, args.formats, args.dirty_ratios, args.seed, json.loads(args.config),
+                               compressions=args.compressions)
+
+    if args.startup_only or args.startup_budget is not None:
+        report["startup"] = measure_startup()
+        report["startup"]["budget_seconds"] = args.startup_budget
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for result in report["results"]:
+        print(f"{result['rows']:>10} {result['format']:>8} {result['compression']:>5} dirty={result['dirty_ratio']:<5} "
+              f"{result['wall_seconds']:>9.3f}s {result['rows_per_second']:>12} rows/s "
+              f"peak {result['peak_rss_mb']:>8} MB")
+    print(f"Results written to {args.output}")
+
+    if "startup" in report:
+        startup = report["startup"]
+        print(f"Module init {startup['init_seconds_median']:.3f}s (median of {startup['runs']}), "
+              f"imports {startup['profile']['imports']}, clients {startup['profile']['clients']}")
+        if args.startup_budget is not None and startup["init_seconds_median"] > args.startup_budget:
+            print(f"Module init exceeds the budget of {args.startup_budget:.3f}s")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
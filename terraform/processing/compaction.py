@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import posixpath
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_validator import (
+    ERROR_BUCKET,
+    LAYOUT_DATE,
+    LAYOUT_HIVE,
+    PROCESSED_BUCKET,
+    ParquetSettings,
+    S3MultipartWriter,
+    S3ObjectReader,
+    get_secret,
+    partition_date_path,
+    s3,
+    write_summary
+)
+from partition_summary import PartitionSummary, list_summaries, summary_path
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Compaction settings
+DEFAULT_TARGET_FILE_BYTES = int(os.environ.get("COMPACTION_TARGET_FILE_BYTES", 128 * 1024 * 1024))
+SMALL_FILE_FRACTION = 0.5  # Files below this fraction of the target size get merged
+COMPACTED_PREFIX = "compacted_"
+
+# Data files of a partition: the validator's name_<ts>[_errors][_partNNNN].parquet and earlier compacted files
+DATA_FILE_PATTERN = re.compile(
+    r"^(?:.+_\d{8}_\d{6}(?:_errors)?(?:_part\d{4})?|" + COMPACTED_PREFIX + r"\d{8}_\d{6}_\d{4})\.parquet$"
+)
+# Row samples of compact error reports sit next to the error files but are read on their own
+ERRORS_SAMPLE_MARKER = "_errors_sample"
+
+def is_data_file(key: str) -> bool:
+    """Whether an object is a processed or error file that compaction may merge"""
+    filename = posixpath.basename(key)
+    return ERRORS_SAMPLE_MARKER not in filename and DATA_FILE_PATTERN.match(filename) is not None
+
+def list_small_files(bucket: str, prefix: str, target_file_bytes: int) -> List[Dict]:
+    """List the data files of a partition that are small enough to be merged.
+
+    Sidecars, error summaries and error samples are skipped, whatever their size.
+    """
+    small_files = []
+    paginator = s3.get_paginator("list_objects_v2")
+
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        for obj in page.get("Contents", []):
+            if is_data_file(obj["Key"]) and obj["Size"] < target_file_bytes * SMALL_FILE_FRACTION:
+                small_files.append({"key": obj["Key"], "size": obj["Size"]})
+
+    return sorted(small_files, key=lambda f: f["key"])
+
+def list_partition_prefixes(bucket: str, prefix: str) -> List[str]:
+    """List the column=value/ sub-partitions directly under a Hive prefix"""
+    prefixes = []
+    paginator = s3.get_paginator("list_objects_v2")
+
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []) if "=" in p["Prefix"][len(prefix):])
+
+    return sorted(prefixes)
+
+def read_parquet_schema(bucket: str, key: str) -> pa.Schema:
+    """Read only the footer schema of a Parquet object"""
+    with S3ObjectReader(bucket, key) as reader:
+        return pq.read_schema(reader)
+
+def _align_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Reorder, fill in and cast a table's columns to match the unified partition schema"""
+    if table.schema.equals(schema):
+        return table
+
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in table.column_names
+        else pa.nulls(len(table), type=field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def compact_partition(bucket: str, prefix: str, target_file_bytes: int = DEFAULT_TARGET_FILE_BYTES,
+                      parquet: Optional[ParquetSettings] = None) -> Dict:
+    """Merge the small Parquet files under one partition prefix into files of about target_file_bytes.
+
+    Only the files listed when the run starts are touched, so objects that arrive while it runs are
+    left for the next run. The merged files are fully written before any original is deleted; if a
+    write fails the partially written output is aborted and the originals are kept.
+
+    The summary sidecars of the originals are merged into one sidecar per merged file and deleted
+    together with the files they describe, so the partition's statistics do not change. A merged
+    file only gets a sidecar if every file merged into it had one; otherwise its sidecar would
+    under-count its rows.
+    """
+    if not prefix.endswith("/"):
+        prefix += "/"
+
+    small_files = list_small_files(bucket, prefix, target_file_bytes)
+    report = {
+        "partition": f"s3://{bucket}/{prefix}",
+        "files_before": len(small_files),
+        "bytes_before": sum(f["size"] for f in small_files),
+        "files_after": len(small_files),
+        "bytes_after": sum(f["size"] for f in small_files),
+        "output_files": []
+    }
+
+    if len(small_files) < 2:
+        logger.info(f"Nothing to compact in s3://{bucket}/{prefix}")
+        return report
+
+    # Files written by different runs can differ slightly (e.g. a column that was all null)
+    schema = pa.unify_schemas(
+        [read_parquet_schema(bucket, f["key"]) for f in small_files],
+        promote_options="permissive"
+    )
+
+    # Sidecars of this partition only; sub-partitions are compacted on their own
+    sidecars = {key for key in list_summaries(s3, bucket, prefix) if "/" not in key[len(prefix):]}
+
+    parquet = parquet or ParquetSettings()
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    written = []
+    sink = None
+    writer = None
+    summary = None
+
+    def finish_output():
+        writer.close()
+        sink.close()
+        output = {"key": sink.key, "size": sink.bytes_written}
+        written.append(output)
+        if summary is not None:
+            summary.files = 1
+            output["summary"] = write_summary(summary, bucket, sink.key)
+
+    try:
+        for source in small_files:
+            if writer is None:
+                key = f"{prefix}{COMPACTED_PREFIX}{timestamp}_{len(written):04d}.parquet"
+                sink = S3MultipartWriter(bucket, key, content_type="application/parquet")
+                writer = pq.ParquetWriter(sink, schema, **parquet.writer_options(schema))
+                summary = PartitionSummary()
+
+            if summary is not None and summary_path(source["key"]) in sidecars:
+                body = s3.get_object(Bucket=bucket, Key=summary_path(source["key"]))["Body"].read()
+                summary.merge(PartitionSummary.from_dict(json.loads(body)))
+            elif summary is not None:
+                if sidecars:
+                    logger.warning(f"No sidecar for s3://{bucket}/{source['key']}, so {sink.key} gets none")
+                summary = None
+
+            # Small files are read in one GET rather than one ranged GET per column chunk
+            body = s3.get_object(Bucket=bucket, Key=source["key"])["Body"].read()
+            writer.write_table(
+                _align_table(pq.read_table(pa.BufferReader(body)), schema), row_group_size=parquet.row_group_size
+            )
+
+            if sink.bytes_written >= target_file_bytes:
+                finish_output()
+                writer = sink = None
+
+        if writer is not None:
+            finish_output()
+            writer = sink = None
+
+    except Exception:
+        if sink is not None:
+            sink.abort()
+        for output in written:
+            s3.delete_object(Bucket=bucket, Key=output["key"])
+            if "summary" in output:
+                s3.delete_object(Bucket=bucket, Key=output["summary"])
+        raise
+
+    # Only remove the originals once every merged file exists; a sidecar is deleted in the batch of its file
+    batch = []
+    for source in small_files:
+        keys = [source["key"]]
+        if summary_path(source["key"]) in sidecars:
+            keys.append(summary_path(source["key"]))
+        if len(batch) + len(keys) > 1000:
+            s3.delete_objects(Bucket=bucket, Delete={"Objects": batch, "Quiet": True})
+            batch = []
+        batch.extend({"Key": key} for key in keys)
+    if batch:
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": batch, "Quiet": True})
+
+    report["files_after"] = len(written)
+    report["bytes_after"] = sum(f["size"] for f in written)
+    report["output_files"] = [f"s3://{bucket}/{f['key']}" for f in written]
+    report["summary_files"] = [f"s3://{bucket}/{f['summary']}" for f in written if "summary" in f]
+    logger.info(f"Compacted {report['files_before']} files ({report['bytes_before']} bytes) in "
+                f"s3://{bucket}/{prefix} into {report['files_after']} files ({report['bytes_after']} bytes)")
+
+    return report
+
+def compact_date(date_path: str, target_file_bytes: int = DEFAULT_TARGET_FILE_BYTES,
+                 layout: str = LAYOUT_DATE, parquet: Optional[ParquetSettings] = None) -> List[Dict]:
+    """Compact the processed/ and errors/ partitions written by the validator for one YYYY/MM/DD date.
+
+    With the Hive layout the date prefixes are year=/month=/day=/ and processed data is further split
+    into region=/ partitions, each compacted on its own.
+    """
+    date_prefix = partition_date_path(datetime.strptime(date_path, "%Y/%m/%d"), layout)
+
+    partitions = [(PROCESSED_BUCKET, f"processed/{date_prefix}/")]
+    if layout == LAYOUT_HIVE:
+        partitions = [(PROCESSED_BUCKET, prefix) for prefix in list_partition_prefixes(*partitions[0])]
+    if ERROR_BUCKET:
+        partitions.append((ERROR_BUCKET, f"errors/{date_prefix}/"))
+
+    return [compact_partition(bucket, prefix, target_file_bytes, parquet) for bucket, prefix in partitions]
+
+def lambda_handler(event, context):
+    """AWS Lambda entry point, e.g. from a daily EventBridge schedule"""
+    try:
+        # Default to yesterday, whose partitions no longer receive new files
+        date_path = event.get("date") or (datetime.utcnow() - timedelta(days=1)).strftime("%Y/%m/%d")
+        target_file_bytes = int(event.get("target_file_bytes", DEFAULT_TARGET_FILE_BYTES))
+
+        # Same layout and Parquet settings as the validator that wrote the partitions
+        secret_config = get_secret() or {}
+        layout = event.get("layout") or secret_config.get("output_layout", LAYOUT_DATE)
+
+        reports = compact_date(date_path, target_file_bytes, layout, ParquetSettings(secret_config))
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "message": "Compaction completed",
+                "partitions": reports,
+                "timestamp": datetime.utcnow().isoformat() + "Z"
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"Compaction failed: {str(e)}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({
+                "error": str(e),
+                "timestamp": datetime.utcnow().isoformat() + "Z"
+            })
+        }
+
+# Optional: For local testing
+if __name__ == "__main__":
+    result = lambda_handler({"date": datetime.utcnow().strftime("%Y/%m/%d")}, None)
+    print(json.dumps(result, indent=2))
@@ -1,36 +1,347 @@
+from __future__ import annotations
+
+import time
+
+_init_started = time.perf_counter()
+
+import importlib
 import json
-import boto3
 import logging
-import pandas as pd
 import io
 import os
+import posixpath
+import queue
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
-import numpy as np
+from typing import Callable, Dict, Iterator, List, Tuple, Optional
+from urllib.parse import quote
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Startup profile, reported in the statistics of a container's first invocation
+STARTUP_PROFILE = {"init_seconds": None, "imports": {}, "lazy_imports": {}, "clients": {}}
+
+def _timed_import(name: str):
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    STARTUP_PROFILE["imports"][name] = round(time.perf_counter() - started, 6)
+    return module
+
+class _LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            started = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            STARTUP_PROFILE["lazy_imports"][self._name] = round(time.perf_counter() - started, 6)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+boto3 = _timed_import("boto3")
+np = _timed_import("numpy")
+_idempotency = _timed_import("idempotency")
+ProcessedManifest = _idempotency.ProcessedManifest
+object_identities = _idempotency.object_identities
+CLAIMED, IN_PROGRESS = _idempotency.CLAIMED, _idempotency.IN_PROGRESS
+DEFAULT_LEASE_SECONDS = _idempotency.DEFAULT_LEASE_SECONDS
+_partition_summary = _timed_import("partition_summary")
+PartitionSummary = _partition_summary.PartitionSummary
+summary_path = _partition_summary.summary_path
+
+# pandas and pyarrow are loaded by the first code path that uses them, so events that read no data (e.g. only
+# duplicates) never load them. Building any Arrow array makes pyarrow load pandas as well.
+pd = _LazyModule("pandas")
+pd_types = _LazyModule("pandas.api.types")
+pa = _LazyModule("pyarrow")
+pc = _LazyModule("pyarrow.compute")
+pa_csv = _LazyModule("pyarrow.csv")
+pa_json = _LazyModule("pyarrow.json")
+pq = _LazyModule("pyarrow.parquet")
+_LAZY_MODULES = {module._name: module for module in [pd, pd_types, pa, pc, pa_csv, pa_json, pq]}
+
+# Modules to import during init anyway, e.g. "pandas" when a pandas engine handles every event
+for _name in filter(None, os.environ.get("PRELOAD_MODULES", "").split(",")):
+    _LAZY_MODULES[_name.strip()].load()
+
+def _timed_client(service_name: str):
+    started = time.perf_counter()
+    client = boto3.client(service_name)
+    STARTUP_PROFILE["clients"][service_name] = round(time.perf_counter() - started, 6)
+    return client
+
 # Initialize AWS clients
-s3 = boto3.client("s3")
-secrets = boto3.client("secretsmanager")
+s3 = _timed_client("s3")
+secrets = _timed_client("secretsmanager")
+_clients = {}
+
+def _client(service_name: str):
+    """Client for a service only some invocations use, created on first use rather than at init"""
+    if service_name not in _clients:
+        _clients[service_name] = boto3.client(service_name)
+    return _clients[service_name]
 
 # Environment variables
 PROCESSED_BUCKET = os.environ.get("PROCESSED_S3_BUCKET")
 SECRET_ARN = os.environ.get("SECRET_ARN")
 ERROR_BUCKET = os.environ.get("ERROR_BUCKET", "")  # Optional error bucket
+SECRET_CACHE_TTL_SECONDS = float(os.environ.get("SECRET_CACHE_TTL_SECONDS", "300"))
+IDEMPOTENCY_MANIFEST = os.environ.get("IDEMPOTENCY_MANIFEST", "")  # Optional s3:// prefix or local directory
+CONTINUATION_QUEUE_URL = os.environ.get("CONTINUATION_QUEUE_URL", "")  # Optional SQS queue for continuations
 
 # Expected schema
 EXPECTED_FIELDS = ["age", "sex", "bmi", "children", "smoker", "region", "charges"]
 
+# Streaming mode defaults
+DEFAULT_CHUNK_ROWS = 50000
+READ_BUFFER_BYTES = 8 * 1024 * 1024
+ARCHIVE_QUEUE_CHUNKS = 2  # Chunks waiting for the background Parquet archive conversion
+
+# Time budget mode: stop between chunks this long before the invocation would time out, then continue
+DEFAULT_TIME_BUDGET_MARGIN_MS = 5000
+
+# Number of objects from one event processed at the same time; each holds its own file (or chunk) in memory
+DEFAULT_MAX_CONCURRENT_FILES = 1
+
+# Multipart upload settings; S3 rejects parts smaller than 5 MiB (except the last)
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_UPLOAD_CONCURRENCY = 4
+
+# Server-side copy settings; copy_object handles objects up to 5 GiB
+MAX_SINGLE_COPY_BYTES = 5 * 1024 ** 3
+COPY_PART_SIZE = 512 * 1024 ** 2
+
+# Compressed inputs, recognized by their leading bytes or else their extension; decompressed by pyarrow's codecs
+COMPRESSION_MAGIC = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+COMPRESSION_EXTENSIONS = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+SNIFF_BYTES = 64  # Leading bytes used to recognize the format of inputs without a known extension
+
+CONTENT_TYPES = {
+    "parquet": "application/parquet",
+    "json": "application/json",
+    "csv": "text/csv"
+}
+
+# Output layouts: "date" writes processed/YYYY/MM/DD/, "hive" writes processed/year=/month=/day=/region=/
+LAYOUT_DATE = "date"
+LAYOUT_HIVE = "hive"
+PARTITION_COLUMN = "region"
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Parquet writer defaults; only the low-cardinality columns are dictionary encoded
+DEFAULT_PARQUET_COMPRESSION = "snappy"
+DEFAULT_ROW_GROUP_ROWS = 128 * 1024
+CATEGORICAL_FIELDS = ["sex", "smoker", "region", "bmi_category"]
+
+# Columns of processed rows aggregated into the summary sidecars, next to CATEGORICAL_FIELDS
+SUMMARY_NUMERIC_FIELDS = ["age", "bmi", "children", "charges"]
+
+# Validation engines
+ENGINE_COLUMNAR = "columnar"
+ENGINE_ROW = "row"
+ENGINE_ARROW = "arrow"
+
+# Literals the Arrow engine casts in C++; anything else goes through int() / float() once per distinct value
+ARROW_INT_PATTERN = r"^[+-]?\d{1,18}$"
+ARROW_FLOAT_PATTERN = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+
+# Per-field validation outcomes; validate_field reports f"{field}_{kind}"
+ERROR_KINDS = ["", "invalid_type", "below_min", "above_max", "invalid_value"]
+
+# Error reports: "full" writes every rejected row with its _error string, "compact" a bounded summary.
+# In compact mode each possible error is one bit of the integer _error_code column.
+ERROR_REPORT_FULL = "full"
+ERROR_REPORT_COMPACT = "compact"
+ERROR_CODES = [f"{field}_{kind}" for field in EXPECTED_FIELDS for kind in ERROR_KINDS[1:]] + \
+              [f"missing_{field}" for field in EXPECTED_FIELDS]
+ERROR_CODE_FIELDS = [field for field in EXPECTED_FIELDS for _ in ERROR_KINDS[1:]] + EXPECTED_FIELDS
+DEFAULT_ERROR_SAMPLE_ROWS = 100
+
+# BMI category thresholds (lower bound, label), checked from the top down
+BMI_CATEGORIES = [(30, "obese"), (25, "overweight")]
+BMI_DEFAULT_CATEGORY = "normal"
+
+class ValidationProfile:
+    """Per-phase timings, per-rule row counts and byte counters collected while processing one event"""
+
+    def __init__(self):
+        self.phase_seconds = defaultdict(float)
+        self.rule_seconds = defaultdict(float)
+        self.rows_examined = defaultdict(int)
+        self.rows_rejected = defaultdict(int)
+        self.rejections = defaultdict(int)
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block of work under one of the phase names (parse, validate, transform, serialize)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phase_seconds[name] += elapsed
+
+    def record_rule(self, field_name: str, kinds: np.ndarray, seconds: float):
+        """Record the outcome of one field's rules over a column"""
+        counts = np.bincount(kinds, minlength=len(ERROR_KINDS))
+        with self._lock:
+            self.rule_seconds[field_name] += seconds
+            self.rows_examined[field_name] += len(kinds)
+            self.rows_rejected[field_name] += int(len(kinds) - counts[0])
+            for kind, count in enumerate(counts[1:], start=1):
+                if count:
+                    self.rejections[f"{field_name}_{ERROR_KINDS[kind]}"] += int(count)
+
+    def record_missing_fields(self, missing_fields: List[str], rows: int):
+        """Record a batch rejected outright because required columns are absent"""
+        with self._lock:
+            for field_name in missing_fields:
+                self.rows_examined[field_name] += rows
+                self.rows_rejected[field_name] += rows
+                self.rejections[f"{field_name}_missing"] += rows
+
+    def record_bytes(self, read: int = 0, written: int = 0):
+        with self._lock:
+            self.bytes_read += read
+            self.bytes_written += written
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "phase_seconds": {name: round(value, 6) for name, value in self.phase_seconds.items()},
+                "rules": {
+                    field: {
+                        "seconds": round(self.rule_seconds[field], 6),
+                        "rows_examined": self.rows_examined[field],
+                        "rows_rejected": self.rows_rejected[field]
+                    }
+                    for field in self.rows_examined
+                },
+                "rejections": dict(self.rejections),
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written
+            }
+
+class ErrorReport:
+    """Bounded summary of rejected rows for compact error reports.
+
+    Keeps the number of rows per error code and per column, and a uniform reservoir sample of at most
+    sample_rows example rows, so its size does not grow with the number of errors added.
+    """
+
+    def __init__(self, sample_rows: int = DEFAULT_ERROR_SAMPLE_ROWS):
+        self.sample_rows = sample_rows
+        self.rows = 0
+        self.code_counts = np.zeros(len(ERROR_CODES), dtype=np.int64)
+        self.sample = []
+        self._rng = np.random.default_rng()
+
+    def add(self, errors):
+        """Count a DataFrame or Arrow table of rejected rows with an _error_code column and sample from it"""
+        if isinstance(errors, pd.DataFrame):
+            codes = errors["_error_code"].to_numpy(dtype=np.int64)
+        else:
+            codes = errors.column("_error_code").to_numpy().astype(np.int64)
+        if not len(codes):
+            return
+
+        # Rows share few distinct codes, so bits are counted per distinct code
+        distinct, counts = np.unique(codes, return_counts=True)
+        bits = (distinct[:, None] >> np.arange(len(ERROR_CODES))) & 1
+        self.code_counts += counts @ bits
+
+        # Reservoir sampling (Algorithm R) with the random draws of the whole batch made at once
+        seen = self.rows + np.arange(len(codes))
+        slots = np.where(seen < self.sample_rows, seen, self._rng.integers(0, seen + 1))
+        keep = np.flatnonzero(slots < self.sample_rows)
+        if len(keep):
+            if isinstance(errors, pd.DataFrame):
+                records = errors.iloc[keep].to_dict("records")
+            else:
+                records = errors.take(pa.array(keep)).to_pylist()
+            for slot, record in zip(slots[keep], records):
+                if slot < len(self.sample):
+                    self.sample[slot] = record
+                else:
+                    self.sample.append(record)
+
+        self.rows += len(codes)
+
+    def code_count_dict(self) -> Dict[str, int]:
+        return {code: int(count) for code, count in zip(ERROR_CODES, self.code_counts) if count}
+
+    def to_dict(self) -> Dict:
+        # A row has at most one error per column, so the codes of a column add up to its rows in error
+        by_column = defaultdict(int)
+        for field, count in zip(ERROR_CODE_FIELDS, self.code_counts):
+            if count:
+                by_column[field] += int(count)
+
+        return {
+            "error_records": self.rows,
+            "by_code": self.code_count_dict(),
+            "by_column": dict(by_column),
+            "sampled_records": len(self.sample),
+            "error_code_bits": {code: bit for bit, code in enumerate(ERROR_CODES)}
+        }
+
+# Shared by every untimed block when profiling is off
+_NOT_PROFILED = nullcontext()
+
 class DataProcessor:
     """Main data processing class with validation and transformation logic"""
 
     def __init__(self, secret_config: Optional[Dict] = None):
         self.secret_config = secret_config or {}
+        # Totals of the current event; the processor is shared by the event's concurrent object workers
         self.processed_count = 0
         self.error_count = 0
+        self._count_lock = threading.Lock()
         self.validation_rules = self._load_validation_rules()
+        self.engine = self.secret_config.get("validation_engine", ENGINE_COLUMNAR)
+        self.profiling = bool(self.secret_config.get("profiling", False))
+        self.profile = ValidationProfile() if self.profiling else None
+        self.output_layout = self.secret_config.get("output_layout", LAYOUT_DATE)
+        self.compact_errors = self.secret_config.get("error_report", ERROR_REPORT_FULL) == ERROR_REPORT_COMPACT
+        self.error_sample_rows = int(self.secret_config.get("error_sample_rows", DEFAULT_ERROR_SAMPLE_ROWS))
+        self.error_full_dump = bool(self.secret_config.get("error_full_dump", False))
+        self.summary_sidecars = bool(self.secret_config.get("summary_sidecars", False))
+        self.parquet = ParquetSettings(self.secret_config)
+
+    def reset_profile(self):
+        """Start a fresh profile (if profiling is enabled) for the next event"""
+        self.profile = ValidationProfile() if self.profiling else None
+
+    def reset_counts(self):
+        """Start the processed and error totals of the next event"""
+        with self._count_lock:
+            self.processed_count = 0
+            self.error_count = 0
+
+    def _add_counts(self, processed: int, errors: int):
+        with self._count_lock:
+            self.processed_count += processed
+            self.error_count += errors
+
+    def timed(self, phase: str):
+        """Context manager timing a processing phase; a shared no-op when profiling is off"""
+        return self.profile.phase(phase) if self.profile is not None else _NOT_PROFILED
 
     def _load_validation_rules(self) -> Dict:
         """Load validation rules from config or defaults"""
@@ -128,6 +439,48 @@ class DataProcessor:
 
     def process_dataframe(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """Process an entire dataframe, separating valid and invalid records"""
+        if self.engine == ENGINE_ROW:
+            with self.timed("validate"):
+                return self._process_dataframe_rows(df)
+        if self.engine == ENGINE_ARROW:
+            return self._process_dataframe_arrow(df)
+        if self.engine != ENGINE_COLUMNAR:
+            raise ValueError(f"Unsupported validation engine: {self.engine}")
+
+        with self.timed("validate"):
+            if self.compact_errors:
+                codes = self.error_codes(df)
+                invalid = codes != 0
+            else:
+                errors = self.validate_dataframe(df)
+                invalid = errors.notna().to_numpy()
+
+        with self.timed("transform"):
+            if invalid.all():
+                valid_df = pd.DataFrame()
+            else:
+                valid_df = self.transform_dataframe(df[~invalid])
+
+        if invalid.any():
+            error_df = df[invalid].copy()
+            if _iterrows_upcasts(df):
+                # Rejected rows hold the values the row engine saw
+                error_df = error_df.astype("float64")
+            if self.compact_errors:
+                error_df["_error_code"] = codes[invalid]
+            else:
+                error_df["_error"] = errors[invalid].to_numpy()
+            error_df["_row"] = error_df.index.astype(int)
+            error_df = error_df.reset_index(drop=True)
+        else:
+            error_df = pd.DataFrame()
+
+        self._add_counts(len(valid_df), len(error_df))
+
+        return valid_df, error_df
+
+    def _process_dataframe_rows(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Row-at-a-time reference implementation of process_dataframe"""
         valid_records = []
         error_records = []
 
@@ -139,48 +492,636 @@ class DataProcessor:
                 valid_records.append(transformed)
             else:
                 error_record = record.copy()
-                error_record["_error"] = error
+                if self.compact_errors:
+                    error_record["_error_code"] = _message_error_code(error)
+                else:
+                    error_record["_error"] = error
                 error_record["_row"] = int(idx)
                 error_records.append(error_record)
 
         valid_df = pd.DataFrame(valid_records) if valid_records else pd.DataFrame()
         error_df = pd.DataFrame(error_records) if error_records else pd.DataFrame()
 
-        self.processed_count = len(valid_records)
-        self.error_count = len(error_records)
+        self._add_counts(len(valid_records), len(error_records))
 
         return valid_df, error_df
 
-def get_secret() -> Optional[Dict]:
-    """Fetch secrets from AWS Secrets Manager"""
+    def _process_dataframe_arrow(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """process_dataframe through the Arrow engine, for callers that hold pandas frames"""
+        valid_table, error_table = self.process_table(_table_from_pandas(df))
+
+        valid_df = valid_table.to_pandas() if valid_table.num_rows else pd.DataFrame()
+        error_df = pd.DataFrame()
+        if error_table.num_rows:
+            error_df = error_table.to_pandas()
+            error_df["_row"] = df.index.to_numpy()[error_df["_row"].to_numpy()].astype(int)
+
+        return valid_df, error_df
+
+    def process_table(self, table: pa.Table) -> Tuple[pa.Table, pa.Table]:
+        """Arrow-native process_dataframe: split a table into transformed valid rows and rejected rows.
+
+        Nulls are validated like the NaN pandas reads for an empty CSV field. Rejected rows keep
+        their input columns and types, plus _error (or _error_code in compact mode) and _row; like
+        the row engine's, their int columns become floats when every column is numeric.
+        """
+        with self.timed("validate"):
+            if self.compact_errors:
+                codes = self.table_error_codes(table)
+                invalid = codes != 0
+            else:
+                invalid, messages = self.validate_table(table)
+
+        with self.timed("transform"):
+            if invalid.all():
+                valid_table = pa.table({})
+            else:
+                valid_table = self.transform_table(table.filter(pa.array(~invalid)) if invalid.any() else table)
+
+        if invalid.any():
+            error_table = _iterrows_table(table).filter(pa.array(invalid))
+            if self.compact_errors:
+                error_table = error_table.append_column("_error_code", pa.array(codes[invalid], type=pa.int64()))
+            else:
+                error_table = error_table.append_column("_error", pa.array(messages, type=pa.string()))
+            error_table = error_table.append_column("_row", pa.array(np.flatnonzero(invalid), type=pa.int64()))
+        else:
+            error_table = pa.table({})
+
+        self._add_counts(valid_table.num_rows, error_table.num_rows)
+
+        return valid_table, error_table
+
+    def validate_table(self, table: pa.Table) -> Tuple[np.ndarray, np.ndarray]:
+        """Validate all rows of an Arrow table, returning the invalid mask and the error string of each invalid row"""
+        fields, kinds, missing_fields = self._table_error_kinds(table)
+        if missing_fields:
+            return (np.ones(table.num_rows, dtype=bool),
+                    np.full(table.num_rows, f"missing_fields:{','.join(missing_fields)}", dtype=object))
+
+        return _format_errors(fields, kinds, table.num_rows)
+
+    def table_error_codes(self, table: pa.Table) -> np.ndarray:
+        """validate_table for compact error reports: the ERROR_CODES bitmask of every row (0 if valid)"""
+        return _error_codes(*self._table_error_kinds(table), table.num_rows)
+
+    def _table_error_kinds(self, table: pa.Table) -> Tuple[List[str], List[np.ndarray], List[str]]:
+        """The validated fields and their per-row ERROR_KINDS, or the missing expected fields"""
+        missing_fields = [f for f in EXPECTED_FIELDS if f not in table.column_names]
+        if missing_fields:
+            if self.profile is not None:
+                self.profile.record_missing_fields(missing_fields, table.num_rows)
+            return [], [], missing_fields
+
+        # iterrows() upcasts int columns to float when every column is numeric
+        table = _iterrows_table(table)
+        fields = [f for f in EXPECTED_FIELDS if f in self.validation_rules]
+        kinds = []
+        for field in fields:
+            started = time.perf_counter() if self.profile is not None else 0.0
+            kinds.append(self.validate_arrow_column(field, table.column(field)))
+            if self.profile is not None:
+                self.profile.record_rule(field, kinds[-1], time.perf_counter() - started)
+
+        return fields, kinds, []
+
+    def validate_arrow_column(self, field_name: str, column: pa.ChunkedArray) -> np.ndarray:
+        """validate_column for an Arrow column: the ERROR_KINDS index of every element (0 if valid)"""
+        kinds = np.zeros(len(column), dtype=np.int8)
+        if field_name not in self.validation_rules:
+            return kinds
+
+        rules = self.validation_rules[field_name]
+        if rules.get("type") in ("int", "float"):
+            values, parsed = _arrow_numeric(column, rules["type"])
+            if "max" in rules:
+                kinds[parsed & (values > rules["max"])] = ERROR_KINDS.index("above_max")
+            if "min" in rules:
+                kinds[parsed & (values < rules["min"])] = ERROR_KINDS.index("below_min")
+            kinds[~parsed] = ERROR_KINDS.index("invalid_type")
+
+        elif "allowed" in rules:
+            lowered = pc.utf8_lower(_arrow_text(column))
+            allowed = pc.fill_null(pc.is_in(lowered, value_set=pa.array(rules["allowed"])), False)
+            kinds[~allowed.to_numpy(zero_copy_only=False)] = ERROR_KINDS.index("invalid_value")
+
+        return kinds
+
+    def transform_table(self, table: pa.Table) -> pa.Table:
+        """Arrow-native transform_dataframe for a table of already validated records"""
+        bmi = _arrow_require_numeric(table.column("bmi"), "bmi")
+
+        # Ensure correct data types
+        transformed = _set_column(table, "age", pa.array(_arrow_require_numeric(table.column("age"), "age").astype("int64")))
+        transformed = _set_column(transformed, "bmi", pa.array(_round_array(bmi, 2)))
+        transformed = _set_column(
+            transformed, "children", pa.array(_arrow_require_numeric(table.column("children"), "children").astype("int64"))
+        )
+        transformed = _set_column(
+            transformed, "charges", pa.array(_round_array(_arrow_require_numeric(table.column("charges"), "charges"), 2))
+        )
+
+        # Standardize string fields
+        for field in ["sex", "smoker", "region"]:
+            transformed = _set_column(transformed, field, pc.utf8_trim_whitespace(pc.utf8_lower(_arrow_text(table.column(field)))))
+
+        # Add derived features
+        labels = pa.array([label for _, label in BMI_CATEGORIES] + [BMI_DEFAULT_CATEGORY])
+        categories = np.select(
+            [bmi >= threshold for threshold, _ in BMI_CATEGORIES],
+            list(range(len(BMI_CATEGORIES))),
+            default=len(BMI_CATEGORIES)
+        )
+        transformed = _set_column(transformed, "bmi_category", labels.take(pa.array(categories)))
+
+        # Add metadata, shared by the whole batch
+        now = datetime.utcnow()
+        transformed = _set_column(transformed, "processed_at", pa.repeat(now.isoformat() + "Z", table.num_rows))
+        transformed = _set_column(transformed, "processing_id", pa.repeat(f"proc_{int(now.timestamp())}", table.num_rows))
+
+        return transformed
+
+    def validate_dataframe(self, df: pd.DataFrame) -> pd.Series:
+        """Validate all rows at once, returning the process_record error string per row (None if valid)"""
+        errors = pd.Series(None, index=df.index, dtype=object)
+        if df.empty:
+            return errors
+
+        fields, kinds, missing_fields = self._dataframe_error_kinds(df)
+        if missing_fields:
+            errors[:] = f"missing_fields:{','.join(missing_fields)}"
+            return errors
+
+        invalid, messages = _format_errors(fields, kinds, len(df))
+        if invalid.any():
+            errors[invalid] = messages
+
+        return errors
+
+    def error_codes(self, df: pd.DataFrame) -> np.ndarray:
+        """validate_dataframe for compact error reports: the ERROR_CODES bitmask of every row (0 if valid)"""
+        if df.empty:
+            return np.zeros(0, dtype=np.int64)
+        return _error_codes(*self._dataframe_error_kinds(df), len(df))
+
+    def _dataframe_error_kinds(self, df: pd.DataFrame) -> Tuple[List[str], List[np.ndarray], List[str]]:
+        """The validated fields and their per-row ERROR_KINDS, or the missing expected fields"""
+        missing_fields = [f for f in EXPECTED_FIELDS if f not in df.columns]
+        if missing_fields:
+            if self.profile is not None:
+                self.profile.record_missing_fields(missing_fields, len(df))
+            return [], [], missing_fields
+
+        # iterrows() upcasts int columns to float when every column is numeric
+        upcast = _iterrows_upcasts(df)
+
+        fields = [f for f in EXPECTED_FIELDS if f in self.validation_rules]
+        kinds = []
+        for field in fields:
+            started = time.perf_counter() if self.profile is not None else 0.0
+            kinds.append(self.validate_column(field, df[field], upcast=upcast))
+            if self.profile is not None:
+                self.profile.record_rule(field, kinds[-1], time.perf_counter() - started)
+
+        return fields, kinds, []
+
+    def validate_column(self, field_name: str, series: pd.Series, upcast: bool = False) -> np.ndarray:
+        """Vectorized validate_field: the ERROR_KINDS index of every element of a column (0 if valid)"""
+        kinds = np.zeros(len(series), dtype=np.int8)
+        if field_name not in self.validation_rules:
+            return kinds
+
+        # Low-cardinality columns: validate each distinct value once with the row-level rules
+        exact_types = ("string", "empty") if upcast or not pd_types.is_integer_dtype(series.dtype) else ("integer",)
+        if pd_types.infer_dtype(series, skipna=True) in exact_types:
+            codes, uniques = pd.factorize(series)
+            if len(uniques) * 8 <= len(series):
+                lookup = np.array(
+                    [self._error_kind(field_name, str(value)) for value in uniques], dtype=np.int8
+                )
+                kinds = lookup[codes]
+                nulls = np.flatnonzero(codes < 0)
+                if len(nulls):
+                    raw = series.to_numpy()
+                    kinds[nulls] = [
+                        0 if raw[i] is None else self._error_kind(field_name, str(raw[i])) for i in nulls
+                    ]
+                return kinds
+
+        rules = self.validation_rules[field_name]
+        checked = ~_none_mask(series)
+
+        if rules.get("type") in ("int", "float"):
+            values, parsed = _parse_numeric(series, rules["type"], upcast=upcast)
+            if "max" in rules:
+                kinds[checked & parsed & (values > rules["max"])] = ERROR_KINDS.index("above_max")
+            if "min" in rules:
+                kinds[checked & parsed & (values < rules["min"])] = ERROR_KINDS.index("below_min")
+            kinds[checked & ~parsed] = ERROR_KINDS.index("invalid_type")
+
+        elif "allowed" in rules:
+            allowed = _string_values(series).str.lower().isin(rules["allowed"]).to_numpy()
+            kinds[checked & ~allowed] = ERROR_KINDS.index("invalid_value")
+
+        return kinds
+
+    def _error_kind(self, field_name: str, value: str) -> int:
+        """ERROR_KINDS index of validate_field's result for a single value"""
+        is_valid, error = self.validate_field(field_name, value)
+        return 0 if is_valid else ERROR_KINDS.index(error[len(field_name) + 1:])
+
+    def transform_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Vectorized transform_record for a frame of already validated records"""
+        transformed = df.reset_index(drop=True)
+
+        # Ensure correct data types
+        bmi = _require_numeric(transformed["bmi"], "bmi")
+        transformed["age"] = _require_numeric(transformed["age"], "age").astype("int64")
+        transformed["bmi"] = _round(bmi, 2)
+        transformed["children"] = _require_numeric(transformed["children"], "children").astype("int64")
+        transformed["charges"] = _round(_require_numeric(transformed["charges"], "charges"), 2)
+
+        # Standardize string fields
+        for field in ["sex", "smoker", "region"]:
+            transformed[field] = transformed[field].str.lower().str.strip()
+
+        # Add derived features
+        transformed["bmi_category"] = np.select(
+            [bmi.to_numpy() >= threshold for threshold, _ in BMI_CATEGORIES],
+            [label for _, label in BMI_CATEGORIES],
+            default=BMI_DEFAULT_CATEGORY
+        )
+
+        # Add metadata, shared by the whole batch
+        now = datetime.utcnow()
+        transformed["processed_at"] = now.isoformat() + "Z"
+        transformed["processing_id"] = f"proc_{int(now.timestamp())}"
+
+        return transformed
+
+def _format_errors(fields: List[str], kinds: List[np.ndarray], rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Turn per-field error kinds into the invalid row mask and the process_record error string of each invalid row"""
+    # Pack every row's error kinds into one integer so each distinct combination is formatted once
+    combined = np.zeros(rows, dtype=np.int64)
+    for field_kinds in kinds:
+        combined = combined * len(ERROR_KINDS) + field_kinds
+    invalid = combined != 0
+    if not invalid.any():
+        return invalid, np.array([], dtype=object)
+
+    combos, inverse = np.unique(combined[invalid], return_inverse=True)
+    messages = []
+    for combo in combos:
+        codes = []
+        for field in reversed(fields):
+            combo, kind = divmod(int(combo), len(ERROR_KINDS))
+            if kind:
+                codes.append(f"{field}_{ERROR_KINDS[kind]}")
+        messages.append(f"validation_errors:{','.join(reversed(codes))}")
+
+    return invalid, np.array(messages, dtype=object)[inverse]
+
+def _error_codes(fields: List[str], kinds: List[np.ndarray], missing_fields: List[str], rows: int) -> np.ndarray:
+    """Combine per-field error kinds (or missing fields) into the ERROR_CODES bitmask of each row"""
+    if missing_fields:
+        code = sum(1 << ERROR_CODES.index(f"missing_{field}") for field in missing_fields)
+        return np.full(rows, code, dtype=np.int64)
+
+    codes = np.zeros(rows, dtype=np.int64)
+    for field, field_kinds in zip(fields, kinds):
+        failed = field_kinds != 0
+        # Bits of one field are consecutive, in ERROR_KINDS order
+        first_bit = ERROR_CODES.index(f"{field}_{ERROR_KINDS[1]}") - 1
+        codes[failed] |= np.left_shift(1, first_bit + field_kinds[failed].astype(np.int64))
+    return codes
+
+def _message_error_code(message: str) -> int:
+    """ERROR_CODES bitmask of a process_record error string"""
+    prefix, _, names = message.partition(":")
+    if prefix == "missing_fields":
+        names = ",".join(f"missing_{field}" for field in names.split(","))
+    return sum(1 << ERROR_CODES.index(name) for name in names.split(","))
+
+def describe_error_code(code: int) -> List[str]:
+    """Names of the errors set in an _error_code bitmask"""
+    return [name for bit, name in enumerate(ERROR_CODES) if code >> bit & 1]
+
+def _iterrows_upcasts(df: pd.DataFrame) -> bool:
+    """Whether iterrows() upcasts the frame's int columns to float: every column is numeric and one is a float"""
+    return all(
+        pd_types.is_numeric_dtype(dtype) and not pd_types.is_bool_dtype(dtype) for dtype in df.dtypes
+    ) and any(pd_types.is_float_dtype(dtype) for dtype in df.dtypes)
+
+def _iterrows_table(table: pa.Table) -> pa.Table:
+    """The table with the values iterrows() would give the row engine: all float64 when _iterrows_upcasts"""
+    types = table.schema.types
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types) and any(
+        pa.types.is_floating(t) for t in types
+    ):
+        return table.cast(pa.schema([pa.field(name, pa.float64()) for name in table.column_names]))
+    return table
+
+def _none_mask(series: pd.Series) -> np.ndarray:
+    """Elements that are literally None, which process_record skips"""
+    mask = np.zeros(len(series), dtype=bool)
+    if series.dtype == object:
+        nulls = series.isna().to_numpy()
+        if nulls.any():
+            mask[nulls] = [value is None for value in series.to_numpy()[nulls]]
+    return mask
+
+def _string_values(series: pd.Series) -> pd.Series:
+    """Vectorized str(value) for every element of a column"""
+    if pd_types.is_string_dtype(series) and pd_types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        result = series.astype(object)
+        nulls = series.isna().to_numpy()
+        if nulls.any():
+            result[nulls] = [str(value) for value in series.to_numpy()[nulls]]
+        return result
+    return series.map(str).astype(object)
+
+def _parse_numeric(series: pd.Series, kind: str, upcast: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized int(str(value)) / float(str(value)), returning (values, parsed mask)"""
+    n = len(series)
+    dtype = series.dtype
+
+    if pd_types.is_bool_dtype(dtype):
+        # str(True) is neither an int nor a float literal
+        return np.full(n, np.nan), np.zeros(n, dtype=bool)
+    if pd_types.is_integer_dtype(dtype) and not upcast:
+        return series.to_numpy(dtype="float64"), np.ones(n, dtype=bool)
+    if pd_types.is_numeric_dtype(dtype):
+        # str() of a float always carries a '.', exponent, 'nan' or 'inf'
+        if kind == "int":
+            return np.full(n, np.nan), np.zeros(n, dtype=bool)
+        return series.to_numpy(dtype="float64"), np.ones(n, dtype=bool)
+
+    strings = _string_values(series)
+    if kind == "int":
+        parsed = np.array(strings.str.fullmatch(r"\s*[+-]?\d+\s*"), dtype=bool)
+        values = np.full(n, np.nan)
+        values[parsed] = pd.to_numeric(strings[parsed].str.strip(), errors="coerce").to_numpy(dtype="float64")
+        parsed &= ~np.isnan(values)
+    else:
+        values = np.array(pd.to_numeric(strings, errors="coerce"), dtype="float64")
+        parsed = ~np.isnan(values)
+
+    # Fall back to Python's own parser for whatever the fast path rejected
+    cast = int if kind == "int" else float
+    for i in np.flatnonzero(~parsed):
+        try:
+            values[i] = cast(strings.iat[i])
+            parsed[i] = True
+        except (ValueError, TypeError):
+            pass
+
+    return values, parsed
+
+def _require_numeric(series: pd.Series, field_name: str) -> pd.Series:
+    """Cast a column to float like float(value), raising if any value cannot be converted"""
+    values = np.array(pd.to_numeric(series, errors="coerce"), dtype="float64")
+    raw = series.to_numpy()
+    for i in np.flatnonzero(np.isnan(values)):
+        if isinstance(raw[i], float):
+            continue
+        try:
+            values[i] = float(raw[i])
+        except (ValueError, TypeError):
+            raise ValueError(f"could not convert {field_name} value {raw[i]!r} to float")
+    return pd.Series(values, index=series.index)
+
+def _raw_columns_as_text(error_df: pd.DataFrame) -> pd.DataFrame:
+    """Rejected rows keep their raw input values, which can mix types within a column; store them as text"""
+    raw_columns = [c for c in error_df.columns if c not in ("_error", "_error_code", "_row", "_source_file")]
+    return error_df.astype({c: "str" for c in raw_columns})
+
+def _round(series: pd.Series, ndigits: int) -> pd.Series:
+    """Vectorized round() that agrees with Python's correctly rounded result"""
+    return pd.Series(_round_array(series.to_numpy(dtype="float64"), ndigits), index=series.index)
+
+def _round_array(values: np.ndarray, ndigits: int) -> np.ndarray:
+    rounded = np.round(values, ndigits)
+
+    # numpy scales before rounding, which can differ from round() on values close to a tie
+    scaled = values * 10 ** ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), ndigits)
+
+    return rounded
+
+def _table_from_pandas(df: pd.DataFrame) -> pa.Table:
+    """Convert a frame to Arrow, storing object columns that mix types as their str() text"""
+    columns = {}
+    for name in df.columns:
+        try:
+            columns[str(name)] = pa.array(df[name], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns[str(name)] = pa.array([None if v is None else str(v) for v in df[name]], type=pa.string())
+    return pa.table(columns)
+
+def _set_column(table: pa.Table, name: str, values) -> pa.Table:
+    """Replace a column in place, or append it if the table does not have it yet"""
+    index = table.schema.get_field_index(name)
+    if index >= 0:
+        return table.set_column(index, name, values)
+    return table.append_column(name, values)
+
+def _arrow_text(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Vectorized str(value) for an Arrow column; nulls stay null"""
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        return column
+    return pa.chunked_array([pa.array([None if v is None else str(v) for v in column.to_pylist()], type=pa.string())])
+
+def _arrow_numeric(column: pa.ChunkedArray, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    """int(str(value)) / float(str(value)) over an Arrow column, returning (values, parsed mask).
+
+    Nulls behave like NaN: they parse as a float but not as an int.
+    """
+    n = len(column)
+    nulls = column.is_null().to_numpy(zero_copy_only=False)
+
+    if pa.types.is_integer(column.type):
+        values = pc.fill_null(column.cast(pa.float64()), np.nan).to_numpy()
+        return values, np.ones(n, dtype=bool) if kind == "float" else ~nulls
+    if pa.types.is_floating(column.type):
+        # str() of a float always carries a '.', exponent, 'nan' or 'inf'
+        if kind == "int":
+            return np.full(n, np.nan), np.zeros(n, dtype=bool)
+        return pc.fill_null(column.cast(pa.float64()), np.nan).to_numpy(), np.ones(n, dtype=bool)
+
+    strings = _arrow_text(column)
+    pattern = ARROW_INT_PATTERN if kind == "int" else ARROW_FLOAT_PATTERN
+    matched = pc.fill_null(pc.match_substring_regex(strings, pattern), False)
+    values = pc.fill_null(pc.if_else(matched, strings, None).cast(pa.float64()), np.nan).to_numpy().copy()
+    parsed = np.array(matched, dtype=bool)
+    if kind == "float":
+        parsed = parsed | nulls
+
+    # Fall back to Python's own parser, once per distinct value the fast path rejected
+    rest = ~parsed & ~nulls
+    if rest.any():
+        rest_values = strings.filter(pa.array(rest))
+        uniques = pc.unique(rest_values)
+        cast = int if kind == "int" else float
+        unique_values = np.full(len(uniques), np.nan)
+        unique_parsed = np.zeros(len(uniques), dtype=bool)
+        for i, value in enumerate(uniques.to_pylist()):
+            try:
+                unique_values[i] = cast(value)
+                unique_parsed[i] = True
+            except (ValueError, TypeError):
+                pass
+        positions = pc.index_in(rest_values, value_set=uniques).to_numpy()
+        values[rest] = unique_values[positions]
+        parsed[rest] = unique_parsed[positions]
+
+    return values, parsed
+
+def _arrow_require_numeric(column: pa.ChunkedArray, field_name: str) -> np.ndarray:
+    """Cast an Arrow column to float like float(value), raising if any value cannot be converted"""
+    values, parsed = _arrow_numeric(column, "float")
+    if not parsed.all():
+        value = column[int(np.flatnonzero(~parsed)[0])].as_py()
+        raise ValueError(f"could not convert {field_name} value {value!r} to float")
+    return values
+
+def _fetch_secret() -> Optional[Dict]:
+    """Fetch secrets from AWS Secrets Manager, raising on failure"""
     if not SECRET_ARN:
         logger.info("No SECRET_ARN configured, using defaults")
         return None
 
+    response = secrets.get_secret_value(SecretId=SECRET_ARN)
+    secret_string = response.get("SecretString", "{}")
+    return json.loads(secret_string)
+
+def get_secret() -> Optional[Dict]:
+    """Fetch secrets from AWS Secrets Manager"""
     try:
-        response = secrets.get_secret_value(SecretId=SECRET_ARN)
-        secret_string = response.get("SecretString", "{}")
-        return json.loads(secret_string)
+        return _fetch_secret()
     except Exception as e:
         logger.error(f"Failed to fetch secret: {str(e)}")
         return None
 
-def read_file_from_s3(bucket: str, key: str) -> pd.DataFrame:
+class ConfigCache:
+    """Warm-container cache of the secret configuration and the DataProcessor built from it"""
+
+    def __init__(self, ttl_seconds: float = SECRET_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._processor = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get_processor(self, force_refresh: bool = False) -> DataProcessor:
+        """Return the cached processor, fetching the secret again once the TTL has expired"""
+        with self._lock:
+            if not force_refresh and self._processor is not None and \
+                    time.monotonic() - self._loaded_at < self.ttl_seconds:
+                self.hits += 1
+                return self._processor
+
+            self.misses += 1
+            try:
+                secret_config = _fetch_secret()
+            except Exception as e:
+                logger.error(f"Failed to fetch secret: {str(e)}")
+                if self._processor is not None:
+                    # Keep serving the last good configuration; the next call retries the fetch
+                    logger.warning("Using previously cached configuration")
+                    return self._processor
+                return DataProcessor(None)
+
+            self._processor = DataProcessor(secret_config)
+            self._loaded_at = time.monotonic()
+            return self._processor
+
+    def invalidate(self):
+        """Drop the cached configuration so the next call fetches it again"""
+        with self._lock:
+            self._processor = None
+            self._loaded_at = None
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and age of the cached configuration"""
+        age = None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 3)
+        return {"hits": self.hits, "misses": self.misses, "age_seconds": age}
+
+# Survive across invocations in a warm container
+config_cache = ConfigCache()
+processed_manifest = ProcessedManifest(IDEMPOTENCY_MANIFEST, s3) if IDEMPOTENCY_MANIFEST else None
+
+def refresh_config() -> DataProcessor:
+    """Force the secret configuration and validation rules to be reloaded"""
+    return config_cache.get_processor(force_refresh=True)
+
+def split_compression_extension(key: str) -> Tuple[str, Optional[str]]:
+    """Split a trailing compression extension (e.g. .gz) off an object key, returning (key, codec)"""
+    root, extension = os.path.splitext(key)
+    codec = COMPRESSION_EXTENSIONS.get(extension.lower())
+    return (root, codec) if codec else (key, None)
+
+def detect_compression(key: str, head: bytes = b"") -> Optional[str]:
+    """Determine the compression codec of an input from its leading bytes, or its key if they are not given"""
+    for magic, codec in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    if head:
+        # The bytes are authoritative, e.g. for a .gz key whose object was stored decompressed
+        return None
+    return split_compression_extension(key)[1]
+
+def detect_file_format(key: str, head: bytes = b"") -> str:
+    """Determine the input file format from the object key, or the leading (decompressed) bytes"""
+    lower_key = split_compression_extension(key)[0].lower()
+    if lower_key.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if lower_key.endswith('.json'):
+        return 'json'
+    if lower_key.endswith('.parquet'):
+        return 'parquet'
+    if lower_key.endswith(('.csv', '.txt')) or not head:
+        return 'csv'
+
+    # No known extension: sniff the content
+    if head.startswith(b"PAR1"):
+        return 'parquet'
+    first = head.lstrip()[:1]
+    if first == b'[':
+        return 'json'
+    if first == b'{':
+        return 'jsonl'
+    # Try CSV by default
+    return 'csv'
+
+def decompress_stream(raw, compression: Optional[str]) -> io.BufferedReader:
+    """Wrap a readable byte stream so that it yields the decompressed bytes, decompressing as it is read"""
+    if compression is None:
+        return raw if isinstance(raw, io.BufferedReader) else io.BufferedReader(raw, buffer_size=READ_BUFFER_BYTES)
+    if not pa.Codec.is_available(compression):
+        raise ValueError(f"Unsupported compression codec: {compression}")
+    return io.BufferedReader(pa.CompressedInputStream(raw, compression), buffer_size=READ_BUFFER_BYTES)
+
+def read_file_from_s3(bucket: str, key: str, profile: Optional[ValidationProfile] = None) -> pd.DataFrame:
     """Read different file formats from S3"""
     try:
         response = s3.get_object(Bucket=bucket, Key=key)
         file_content = response["Body"].read()
+        if profile is not None:
+            profile.record_bytes(read=len(file_content))
 
-        # Determine file type by extension
-        if key.lower().endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
-        elif key.lower().endswith('.json'):
-            df = pd.read_json(io.BytesIO(file_content))
-        elif key.lower().endswith('.parquet'):
-            df = pd.read_parquet(io.BytesIO(file_content))
+        # Determine the codec and file type by leading bytes and extension
+        compression = detect_compression(key, file_content[:4])
+        if compression is None:
+            df = _parse_dataframe(file_content, detect_file_format(key, file_content[:SNIFF_BYTES]))
         else:
-            # Try CSV by default
-            df = pd.read_csv(io.BytesIO(file_content))
+            # Only the compressed body is held; the parser pulls decompressed bytes as it goes
+            with decompress_stream(pa.BufferReader(file_content), compression) as stream:
+                df = _parse_dataframe(stream, detect_file_format(key, stream.peek(SNIFF_BYTES)[:SNIFF_BYTES]))
 
         logger.info(f"Successfully read {len(df)} records from {key}")
         return df
@@ -189,130 +1130,1390 @@ def read_file_from_s3(bucket: str, key: str) -> pd.DataFrame:
         logger.error(f"Failed to read file {key} from S3: {str(e)}")
         raise
 
-def write_to_s3(df: pd.DataFrame, bucket: str, key: str, file_format: str = 'parquet'):
-    """Write dataframe to S3 in specified format"""
+def _parse_dataframe(source, file_format: str) -> pd.DataFrame:
+    """Parse file content, given as bytes or a readable stream"""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if file_format == 'jsonl':
+        return pd.read_json(source, lines=True)
+    if file_format == 'json':
+        return pd.read_json(source)
+    if file_format == 'parquet':
+        # Parquet needs random access, so a compressed Parquet file is decompressed in full
+        return pd.read_parquet(source if source.seekable() else io.BytesIO(source.read()))
+    return pd.read_csv(source)
+
+def read_table_from_s3(bucket: str, key: str, profile: Optional[ValidationProfile] = None) -> pa.Table:
+    """Read an S3 object straight into an Arrow table, without going through pandas"""
     try:
-        buffer = io.BytesIO()
-
-        if file_format.lower() == 'parquet':
-            df.to_parquet(buffer, index=False)
-            content_type = 'application/parquet'
-        elif file_format.lower() == 'json':
-            df.to_json(buffer, orient='records', lines=True)
-            content_type = 'application/json'
-        elif file_format.lower() == 'csv':
-            df.to_csv(buffer, index=False)
-            content_type = 'text/csv'
+        response = s3.get_object(Bucket=bucket, Key=key)
+        file_content = response["Body"].read()
+        if profile is not None:
+            profile.record_bytes(read=len(file_content))
+
+        buffer = pa.py_buffer(file_content)
+        compression = detect_compression(key, file_content[:4])
+
+        def open_input():
+            # A fresh stream of the (decompressed) content; decompression runs in C++ as the reader pulls bytes
+            if compression is None:
+                return pa.BufferReader(buffer)
+            return pa.CompressedInputStream(pa.BufferReader(buffer), compression)
+
+        if compression is None:
+            file_format = detect_file_format(key, file_content[:SNIFF_BYTES])
         else:
-            raise ValueError(f"Unsupported file format: {file_format}")
+            with open_input() as stream:
+                file_format = detect_file_format(key, stream.read(SNIFF_BYTES))
 
-        buffer.seek(0)
-        s3.put_object(
-            Bucket=bucket,
-            Key=key,
-            Body=buffer,
-            ContentType=content_type
+        try:
+            if file_format == 'parquet':
+                table = pq.read_table(open_input() if compression is None else pa.BufferReader(open_input().read()))
+            elif file_format == 'jsonl':
+                table = pa_json.read_json(open_input())
+            elif file_format == 'csv':
+                # Empty fields become nulls, like the NaN pandas reads for them
+                convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+                table = pa_csv.read_csv(open_input(), convert_options=convert_options)
+            else:
+                # pyarrow only reads newline-delimited JSON
+                table = _table_from_pandas(_parse_dataframe(decompress_stream(open_input(), None), file_format))
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            # e.g. a column whose values change type after the rows Arrow inferred it from
+            logger.info(f"Arrow could not read {key} ({str(e)}), falling back to pandas")
+            table = _table_from_pandas(_parse_dataframe(decompress_stream(open_input(), None), file_format))
+
+        logger.info(f"Successfully read {table.num_rows} records from {key}")
+        return table
+
+    except Exception as e:
+        logger.error(f"Failed to read file {key} from S3: {str(e)}")
+        raise
+
+class S3ObjectReader(io.RawIOBase):
+    """Seekable, read-only file object over an S3 object, fetched with ranged GETs"""
+
+    def __init__(self, bucket: str, key: str):
+        super().__init__()
+        self.bucket = bucket
+        self.key = key
+        self.size = s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size or len(buffer) == 0:
+            return 0
+
+        end = min(self.position + len(buffer), self.size) - 1
+        response = s3.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-{end}")
+        data = response["Body"].read()
+
+        buffer[:len(data)] = data
+        self.position += len(data)
+        self.bytes_read += len(data)
+        return len(data)
+
+def iter_file_chunks(bucket: str, key: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                     profile: Optional[ValidationProfile] = None,
+                     position: Optional[Dict] = None) -> Iterator[Tuple[pd.DataFrame, Optional[Dict]]]:
+    """Read a file from S3 as (dataframe, position) pairs of at most chunk_rows records each.
+
+    position is where reading resumes after the chunk: the byte offset of the next record for text
+    formats, the row group and row for Parquet. Resuming from it fetches only the rest of the object
+    with ranged GETs. It is None for inputs that can only be read from the start (compressed objects
+    and JSON arrays).
+    """
+    source = S3ObjectReader(bucket, key)
+    if position:
+        source.seek(position.get("offset", 0))
+    raw = io.BufferedReader(source, buffer_size=READ_BUFFER_BYTES)
+    stream = raw
+
+    try:
+        if position:
+            compression, file_format = None, position["format"]
+        else:
+            # Compressed inputs are decompressed as the parser reads them, never as a whole
+            compression = detect_compression(key, raw.peek(4)[:4])
+            stream = decompress_stream(raw, compression)
+            file_format = detect_file_format(key, stream.peek(SNIFF_BYTES)[:SNIFF_BYTES])
+        yield from _iter_chunks(stream, key, file_format, chunk_rows, position or {}, resumable=compression is None)
+    finally:
+        stream.close()
+        raw.close()
+        if profile is not None:
+            profile.record_bytes(read=source.bytes_read)
+
+def _iter_chunks(raw: io.BufferedReader, key: str, file_format: str, chunk_rows: int, position: Dict,
+                 resumable: bool = True) -> Iterator[Tuple[pd.DataFrame, Optional[Dict]]]:
+    """Split an open file into dataframes of at most chunk_rows records, indexed by record number"""
+    rows = position.get("rows", 0)
+
+    if file_format == 'parquet':
+        if not raw.seekable():
+            # Parquet needs random access, so a compressed Parquet file is decompressed in full
+            logger.warning(f"{key} is a compressed Parquet file; decompressing it in one piece")
+            raw = io.BytesIO(raw.read())
+            resumable = False
+        parquet_file = pq.ParquetFile(raw)
+        skip = position.get("row", 0)
+        # Row groups are read one by one so that every chunk ends at a known (row group, row)
+        for group in range(position.get("row_group", 0), parquet_file.metadata.num_row_groups):
+            group_rows = parquet_file.metadata.row_group(group).num_rows
+            done = 0
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows, row_groups=[group]):
+                done += batch.num_rows
+                if skip >= batch.num_rows:
+                    skip -= batch.num_rows
+                    continue
+                df = batch.slice(skip).to_pandas()
+                skip = 0
+                df.index = pd.RangeIndex(rows, rows + len(df))
+                rows += len(df)
+                resume_at = {"format": file_format, "rows": rows, "row_group": group, "row": done}
+                if done == group_rows:
+                    resume_at.update(row_group=group + 1, row=0)
+                yield df, resume_at if resumable else None
+        return
+
+    # JSON arrays cannot be split, so only newline-delimited JSON is streamed
+    if file_format == 'json' and not position and raw.peek(1).lstrip()[:1] == b'[':
+        logger.warning(f"{key} is a JSON array; reading it in one piece")
+        yield pd.read_json(raw), None
+        return
+
+    lines = file_format in ('json', 'jsonl')
+    splitter = _RecordSplitter(raw, position.get("offset", 0), quoted=not lines)
+    header = b""
+    if not lines:
+        # The header is read once and put in front of every chunk; a resumed file carries it in its position
+        header = position["header"].encode("utf-8", "surrogateescape") if position else splitter.read(1) or b""
+
+    while True:
+        block = splitter.read(chunk_rows, prefix=header)
+        if block is None:
+            return
+        if len(block) == len(header) or block[len(header):].isspace():
+            continue
+
+        if lines:
+            df = pd.read_json(io.BytesIO(block), lines=True)
+        else:
+            df = pd.read_csv(io.BytesIO(block))
+        df.index = pd.RangeIndex(rows, rows + len(df))
+        rows += len(df)
+
+        resume_at = {"format": file_format, "rows": rows, "offset": splitter.offset}
+        if not lines:
+            resume_at["header"] = header.decode("utf-8", "surrogateescape")
+        yield df, resume_at if resumable else None
+
+class _RecordSplitter:
+    """Cuts a byte stream into whole records: at every newline for JSON lines, and at newlines outside
+    quoted fields for CSV, so quoted newlines stay inside their record. offset is the position in the
+    stream of the first byte not returned yet.
+    """
+
+    def __init__(self, raw, offset: int = 0, quoted: bool = True):
+        self.raw = raw
+        self.offset = offset
+        self.quoted = quoted
+        self._buffer = bytearray()
+        self._ends = np.array([], dtype=np.int64)  # Stream positions just past each complete buffered record
+        self._in_quotes = False
+        self._eof = False
+
+    def read(self, records: int, prefix: bytes = b"") -> Optional[bytes]:
+        """prefix and the next records (blank lines count), the rest of the stream at its end, or None once consumed"""
+        while len(self._ends) < records and not self._eof:
+            self._fill()
+        if not self._buffer:
+            return None
+
+        cut = int(self._ends[records - 1]) - self.offset if len(self._ends) >= records else len(self._buffer)
+        with memoryview(self._buffer) as view:
+            block = prefix + view[:cut]
+        del self._buffer[:cut]
+        self._ends = self._ends[records:]
+        self.offset += cut
+        return block
+
+    def _fill(self):
+        data = self.raw.read(READ_BUFFER_BYTES)
+        if not data:
+            self._eof = True
+            return
+
+        start = self.offset + len(self._buffer)
+        self._buffer += data
+        values = np.frombuffer(data, dtype=np.uint8)
+        ends = np.flatnonzero(values == ord("\n"))
+        if self.quoted:
+            # A newline ends a record when an even number of quotes precedes it; escaped quotes ("") come in pairs
+            quotes = np.flatnonzero(values == ord('"'))
+            if len(quotes):
+                ends = ends[(np.searchsorted(quotes, ends) + self._in_quotes) % 2 == 0]
+                self._in_quotes = bool((len(quotes) + self._in_quotes) % 2)
+            elif self._in_quotes:
+                ends = ends[:0]
+        self._ends = np.concatenate([self._ends, ends + start + 1])
+
+class S3MultipartWriter(io.RawIOBase):
+    """Writable file object that streams its bytes to S3 as concurrently uploaded multipart parts.
+
+    At most max_concurrency parts are buffered or in flight at once, so memory stays around
+    part_size * (max_concurrency + 1) however large the object is. Outputs smaller than one part
+    are sent with a single put_object. If anything fails the multipart upload is aborted.
+    """
+
+    def __init__(self, bucket: str, key: str, content_type: Optional[str] = None,
+                 part_size: int = DEFAULT_PART_SIZE, max_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY):
+        super().__init__()
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.part_size = part_size
+        self.bytes_written = 0
+        self.upload_id = None
+        self._buffer = bytearray()
+        self._parts = []
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _submit_part(self, data: bytes):
+        """Hand a part to the upload pool, waiting while max_concurrency parts are already in flight"""
+        for future in self._parts:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+        if self.upload_id is None:
+            extra_args = {"ContentType": self.content_type} if self.content_type else {}
+            response = s3.create_multipart_upload(Bucket=self.bucket, Key=self.key, **extra_args)
+            self.upload_id = response["UploadId"]
+
+        self._slots.acquire()
+        future = self._executor.submit(self._upload_part, len(self._parts) + 1, data)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._parts.append(future)
+
+    def _upload_part(self, part_number: int, data: bytes) -> Dict:
+        response = s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data
         )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def close(self):
+        """Upload whatever is still buffered and complete the object"""
+        if self.closed:
+            return
+
+        try:
+            if self.upload_id is None:
+                extra_args = {"ContentType": self.content_type} if self.content_type else {}
+                s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer), **extra_args)
+            else:
+                if self._buffer:
+                    self._submit_part(bytes(self._buffer))
+                parts = [future.result() for future in self._parts]
+                s3.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self.upload_id,
+                    MultipartUpload={"Parts": parts}
+                )
+        except Exception:
+            self.abort()
+            raise
+
+        self._buffer = bytearray()
+        self._executor.shutdown()
+        super().close()
+
+    def abort(self):
+        """Discard everything written so far, cleaning up any started multipart upload"""
+        if self.closed:
+            return
+
+        for future in self._parts:
+            future.cancel()
+        self._executor.shutdown()
+
+        if self.upload_id is not None:
+            try:
+                s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+                logger.info(f"Aborted multipart upload to s3://{self.bucket}/{self.key}")
+            except Exception as e:
+                logger.error(f"Failed to abort multipart upload {self.upload_id}: {str(e)}")
+
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class ParquetSettings:
+    """Parquet writer tuning read from the secret configuration.
+
+    parquet_compression (and parquet_compression_level) pick the codec, parquet_row_group_size the rows
+    per row group, and parquet_sort_by the columns processed rows are sorted by within each file, so
+    that the per row group min/max statistics let Athena skip row groups on those columns.
+    """
+
+    def __init__(self, secret_config: Optional[Dict] = None):
+        secret_config = secret_config or {}
+        self.compression = secret_config.get("parquet_compression", DEFAULT_PARQUET_COMPRESSION)
+        self.compression_level = secret_config.get("parquet_compression_level")
+        self.row_group_size = int(secret_config.get("parquet_row_group_size", DEFAULT_ROW_GROUP_ROWS))
+        sort_by = secret_config.get("parquet_sort_by", [])
+        self.sort_by = [sort_by] if isinstance(sort_by, str) else list(sort_by)
+
+    def writer_options(self, schema: pa.Schema) -> Dict:
+        """Keyword arguments for pq.ParquetWriter and pq.write_table"""
+        return {
+            "compression": self.compression,
+            "compression_level": self.compression_level,
+            "use_dictionary": [name for name in CATEGORICAL_FIELDS if name in schema.names],
+            "write_statistics": True
+        }
+
+    def sort(self, table: pa.Table) -> pa.Table:
+        """Sort a table by the configured columns it has"""
+        columns = [name for name in self.sort_by if name in table.column_names]
+        return table.sort_by([(name, "ascending") for name in columns]) if columns else table
+
+def _write_parquet(table: pa.Table, sink, parquet: Optional[ParquetSettings] = None):
+    parquet = parquet or ParquetSettings()
+    pq.write_table(table, sink, row_group_size=parquet.row_group_size, **parquet.writer_options(table.schema))
+
+def write_to_s3(df: pd.DataFrame, bucket: str, key: str, file_format: str = 'parquet',
+                profile: Optional[ValidationProfile] = None, parquet: Optional[ParquetSettings] = None):
+    """Write dataframe to S3 in specified format, streaming the serialized bytes as they are produced"""
+    try:
+        if file_format.lower() not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported file format: {file_format}")
+
+        with S3MultipartWriter(bucket, key, content_type=CONTENT_TYPES[file_format.lower()]) as writer:
+            if file_format.lower() == 'parquet':
+                _write_parquet(pa.Table.from_pandas(df, preserve_index=False), writer, parquet)
+            elif file_format.lower() == 'json':
+                df.to_json(writer, orient='records', lines=True)
+            else:
+                df.to_csv(writer, index=False)
+
+        if profile is not None:
+            profile.record_bytes(written=writer.bytes_written)
         logger.info(f"Successfully wrote {len(df)} records to s3://{bucket}/{key}")
 
     except Exception as e:
         logger.error(f"Failed to write to S3: {str(e)}")
         raise
 
-def generate_output_paths(input_key: str) -> Dict[str, str]:
+def write_table_to_s3(table: pa.Table, bucket: str, key: str, profile: Optional[ValidationProfile] = None,
+                      parquet: Optional[ParquetSettings] = None):
+    """Write an Arrow table to S3 as Parquet, streaming the serialized bytes as they are produced"""
+    try:
+        with S3MultipartWriter(bucket, key, content_type=CONTENT_TYPES["parquet"]) as writer:
+            _write_parquet(table, writer, parquet)
+
+        if profile is not None:
+            profile.record_bytes(written=writer.bytes_written)
+        logger.info(f"Successfully wrote {table.num_rows} records to s3://{bucket}/{key}")
+
+    except Exception as e:
+        logger.error(f"Failed to write to S3: {str(e)}")
+        raise
+
+class ChunkedS3Writer:
+    """Append-only dataframe writer that streams each chunk into a multipart upload as it is written"""
+
+    def __init__(self, bucket: str, key: str, file_format: str = 'parquet',
+                 parquet: Optional[ParquetSettings] = None):
+        if file_format.lower() not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported file format: {file_format}")
+
+        self.bucket = bucket
+        self.key = key
+        self.file_format = file_format.lower()
+        self.parquet = parquet or ParquetSettings()
+        self.rows_written = 0
+        self._sink = S3MultipartWriter(bucket, key, content_type=CONTENT_TYPES[self.file_format])
+        self._parquet_writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame):
+        """Append a chunk to the output"""
+        if df.empty:
+            return
+
+        if self.file_format == 'parquet':
+            self.write_table(pa.Table.from_pandas(df, preserve_index=False))
+            return
+
+        if self.file_format == 'json':
+            df.to_json(self._sink, orient='records', lines=True)
+        else:
+            self._sink.write(df.to_csv(index=False, header=self.rows_written == 0).encode('utf-8'))
+
+        self.rows_written += len(df)
+
+    def write_table(self, table: pa.Table):
+        """Append an Arrow chunk to a Parquet output; each chunk becomes at least one row group"""
+        if self.file_format != 'parquet':
+            raise ValueError(f"Arrow chunks can only be written as parquet, not {self.file_format}")
+        if not table.num_rows:
+            return
+
+        if self._parquet_writer is None:
+            self._schema = table.schema
+            self._parquet_writer = pq.ParquetWriter(
+                self._sink, self._schema, **self.parquet.writer_options(self._schema)
+            )
+        self._parquet_writer.write_table(
+            _conform_table(table, self._schema), row_group_size=self.parquet.row_group_size
+        )
+        self.rows_written += table.num_rows
+
+    def close(self):
+        """Finish the file and complete the upload"""
+        try:
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+            self._sink.close()
+            logger.info(f"Successfully wrote {self.rows_written} records to s3://{self.bucket}/{self.key}")
+        except Exception:
+            self._sink.abort()
+            raise
+
+    @property
+    def bytes_written(self) -> int:
+        return self._sink.bytes_written
+
+    def abort(self):
+        """Discard everything written so far without creating the object"""
+        try:
+            # Close the Parquet writer first so it does not flush its footer into an aborted sink later
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+        finally:
+            self._sink.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def copy_s3_object(source_bucket: str, source_key: str, bucket: str, key: str,
+                   part_size: int = COPY_PART_SIZE, max_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY):
+    """Copy an object inside S3 without downloading it, using multipart copy above MAX_SINGLE_COPY_BYTES"""
+    copy_source = {"Bucket": source_bucket, "Key": source_key}
+    size = s3.head_object(Bucket=source_bucket, Key=source_key)["ContentLength"]
+
+    if size <= MAX_SINGLE_COPY_BYTES:
+        s3.copy_object(CopySource=copy_source, Bucket=bucket, Key=key)
+        logger.info(f"Copied s3://{source_bucket}/{source_key} to s3://{bucket}/{key}")
+        return
+
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+
+    def copy_part(part_number: int) -> Dict:
+        start = (part_number - 1) * part_size
+        end = min(start + part_size, size) - 1
+        response = s3.upload_part_copy(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            CopySource=copy_source,
+            CopySourceRange=f"bytes={start}-{end}"
+        )
+        return {"PartNumber": part_number, "ETag": response["CopyPartResult"]["ETag"]}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            parts = list(executor.map(copy_part, range(1, -(-size // part_size) + 1)))
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts}
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+    logger.info(f"Copied s3://{source_bucket}/{source_key} to s3://{bucket}/{key} in {len(parts)} parts")
+
+def _conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Cast a chunk to the schema of the first chunk written to the same file"""
+    if table.schema.equals(schema):
+        return table
+    if table.schema.names != schema.names:
+        raise ValueError(f"Chunk columns {table.schema.names} do not match {schema.names}")
+    try:
+        return table.cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Chunk schema {table.schema} does not match {schema}: {str(e)}")
+
+def partition_date_path(date: datetime, layout: str = LAYOUT_DATE) -> str:
+    """Date part of the output prefixes: YYYY/MM/DD, or year=YYYY/month=MM/day=DD with the Hive layout"""
+    return date.strftime("year=%Y/month=%m/day=%d" if layout == LAYOUT_HIVE else "%Y/%m/%d")
+
+def partition_path(key: str, column: str, value) -> str:
+    """Move a file into the column=value/ sub-directory of its prefix"""
+    directory, filename = posixpath.split(key)
+    value = HIVE_DEFAULT_PARTITION if value is None else quote(str(value), safe="")
+    return f"{directory}/{column}={value}/{filename}"
+
+def partition_table(table: pa.Table, key: str, layout: str = LAYOUT_DATE) -> List[Tuple[str, Dict, pa.Table]]:
+    """Split processed rows into the files of their partitions, as (key, partition values, rows).
+
+    With the Hive layout every region gets its own region=<value>/ file and the partition column is
+    dropped from the data, since Athena and the Glue crawler take it from the path.
+    """
+    if layout != LAYOUT_HIVE or PARTITION_COLUMN not in table.column_names:
+        return [(key, {}, table)]
+
+    column = table.column(PARTITION_COLUMN)
+    rows = table.drop_columns([PARTITION_COLUMN])
+    return [
+        (partition_path(key, PARTITION_COLUMN, value), {PARTITION_COLUMN: value},
+         rows.filter(pc.is_null(column) if value is None else pc.equal(column, value)))
+        for value in pc.unique(column).to_pylist()
+    ]
+
+def summarize_table(table: pa.Table, partition: Optional[Dict] = None) -> PartitionSummary:
+    """Summary sidecar statistics of processed rows; partition values dropped from the rows count as columns"""
+    summary = PartitionSummary()
+    summary.rows = table.num_rows
+    summary.files = 1
+
+    for name in SUMMARY_NUMERIC_FIELDS:
+        if name in table.column_names:
+            summary.add_numeric(name, table.column(name).cast(pa.float64()).to_numpy(zero_copy_only=False))
+
+    for name in CATEGORICAL_FIELDS:
+        if name in table.column_names:
+            column = table.column(name)
+            counts = pc.value_counts(column)
+            summary.add_categories(name, {
+                value: count for value, count in zip(
+                    counts.field("values").to_pylist(), counts.field("counts").to_pylist()
+                ) if value is not None
+            }, column.null_count)
+        elif partition and name in partition:
+            if partition[name] is None:
+                summary.add_categories(name, {}, table.num_rows)
+            else:
+                summary.add_categories(name, {partition[name]: table.num_rows})
+
+    return summary
+
+def write_summary(summary: PartitionSummary, bucket: str, key: str,
+                  profile: Optional[ValidationProfile] = None) -> str:
+    """Store the summary of a processed file as its sidecar, returning the sidecar's key"""
+    sidecar_key = summary_path(key)
+    body = json.dumps(summary.to_dict()).encode("utf-8")
+    s3.put_object(Bucket=bucket, Key=sidecar_key, Body=body, ContentType=CONTENT_TYPES["json"])
+    if profile is not None:
+        profile.record_bytes(written=len(body))
+    return sidecar_key
+
+def write_dataset_to_s3(data, bucket: str, key: str, processor: DataProcessor,
+                        profile: Optional[ValidationProfile] = None) -> List[str]:
+    """Write processed rows (a DataFrame or Arrow table) in the processor's layout, returning the keys written.
+
+    With summary_sidecars, every file gets a sidecar with the mergeable statistics of its rows.
+    """
+    table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+    keys = []
+
+    for partition_key, partition, rows in partition_table(processor.parquet.sort(table), key, processor.output_layout):
+        write_table_to_s3(rows, bucket, partition_key, profile=profile, parquet=processor.parquet)
+        keys.append(partition_key)
+        if processor.summary_sidecars:
+            keys.append(write_summary(summarize_table(rows, partition), bucket, partition_key, profile))
+
+    return keys
+
+def generate_output_paths(input_key: str, layout: str = LAYOUT_DATE) -> Dict[str, str]:
     """Generate output paths based on input file and processing date"""
-    # Extract filename without extension
-    filename = os.path.basename(input_key)
-    name_without_ext = os.path.splitext(filename)[0]
+    # Extract filename without extension, including any compression extension (e.g. .csv.gz)
+    basename = os.path.basename(input_key)
+    filename = split_compression_extension(basename)[0]
+    name_without_ext, extension = os.path.splitext(filename)
+    extension += basename[len(filename):]
 
     # Current date for partitioning
     current_date = datetime.utcnow()
-    date_path = current_date.strftime("%Y/%m/%d")
+    date_path = partition_date_path(current_date, layout)
     timestamp = current_date.strftime("%Y%m%d_%H%M%S")
 
     # Generate paths
     paths = {
         "processed": f"processed/{date_path}/{name_without_ext}_{timestamp}.parquet",
         "errors": f"errors/{date_path}/{name_without_ext}_{timestamp}_errors.parquet",
-        "archive": f"archive/{date_path}/{name_without_ext}_{timestamp}.parquet"
+        "errors_summary": f"errors/{date_path}/{name_without_ext}_{timestamp}_errors_summary.json",
+        "errors_sample": f"errors/{date_path}/{name_without_ext}_{timestamp}_errors_sample.parquet",
+        "archive": f"archive/{date_path}/{name_without_ext}_{timestamp}{extension}",
+        "archive_parquet": f"archive/{date_path}/{name_without_ext}_{timestamp}.parquet"
     }
 
     return paths
 
-def process_s3_event(event: Dict, context) -> Dict:
-    """Main Lambda handler for S3 events"""
-    # Initialize counters
-    stats = {
-        "total_records": 0,
-        "processed_records": 0,
-        "error_records": 0,
-        "input_files": 0,
-        "output_files": []
-    }
-
-    # Get secret configuration
-    secret_config = get_secret()
-    processor = DataProcessor(secret_config)
-
-    # Process each S3 record in the event
-    for s3_record in event.get("Records", []):
-        try:
-            # Extract S3 bucket and key
-            bucket = s3_record["s3"]["bucket"]["name"]
-            key = s3_record["s3"]["object"]["key"]
-
-            logger.info(f"Processing file: s3://{bucket}/{key}")
-            stats["input_files"] += 1
+def write_errors(processor: DataProcessor, errors, paths: Dict[str, str], stats: Dict,
+                 profile: Optional[ValidationProfile] = None):
+    """Write the rejected rows of a file or batch (a DataFrame or Arrow table) to the error bucket.
+
+    Full reports write every row. Compact reports write the error report, and every row only
+    with error_full_dump.
+    """
+    if not processor.compact_errors or processor.error_full_dump:
+        if isinstance(errors, pd.DataFrame):
+            write_to_s3(_raw_columns_as_text(errors), ERROR_BUCKET, paths["errors"], "parquet",
+                        profile=profile, parquet=processor.parquet)
+        else:
+            write_table_to_s3(errors, ERROR_BUCKET, paths["errors"], profile=profile, parquet=processor.parquet)
+        stats["output_files"].append(f"s3://{ERROR_BUCKET}/{paths['errors']}")
+
+    if processor.compact_errors:
+        report = ErrorReport(processor.error_sample_rows)
+        report.add(errors)
+        write_error_report(processor, report, paths, stats, profile)
+
+def write_error_report(processor: DataProcessor, report: ErrorReport, paths: Dict[str, str], stats: Dict,
+                       profile: Optional[ValidationProfile] = None):
+    """Write a compact error report as a JSON summary and a Parquet file of the sampled rows"""
+    if report.sample:
+        sample = _raw_columns_as_text(pd.DataFrame(report.sample))
+        write_to_s3(sample, ERROR_BUCKET, paths["errors_sample"], "parquet", profile=profile, parquet=processor.parquet)
+        stats["output_files"].append(f"s3://{ERROR_BUCKET}/{paths['errors_sample']}")
+
+    body = json.dumps(report.to_dict(), indent=2).encode("utf-8")
+    s3.put_object(Bucket=ERROR_BUCKET, Key=paths["errors_summary"], Body=body, ContentType=CONTENT_TYPES["json"])
+    if profile is not None:
+        profile.record_bytes(written=len(body))
+    stats["output_files"].append(f"s3://{ERROR_BUCKET}/{paths['errors_summary']}")
+
+    error_codes = stats.setdefault("error_codes", {})
+    for code, count in report.code_count_dict().items():
+        error_codes[code] = error_codes.get(code, 0) + count
+
+def _archive_as_parquet(processor: DataProcessor, key: str) -> bool:
+    """Whether an optional Parquet copy of the original should be written next to the archived object"""
+    return processor.secret_config.get("archive_format") == "parquet" and detect_file_format(key) != 'parquet'
+
+def process_s3_object(processor: DataProcessor, bucket: str, key: str) -> Dict:
+    """Validate and transform a single S3 object in memory"""
+    stats = {"total_records": 0, "processed_records": 0, "error_records": 0, "output_files": []}
+    profile = processor.profile
+
+    # Generate output paths
+    paths = generate_output_paths(key, processor.output_layout)
+    archive = processor.secret_config.get("archive_original", False)
+
+    # Archiving runs next to the processing below and is joined before returning
+    with ThreadPoolExecutor(max_workers=2) as archive_executor:
+        archive_jobs = []
+
+        # Archive original file (optional), copied inside S3 without passing through the Lambda
+        if archive:
+            archive_jobs.append(archive_executor.submit(
+                copy_s3_object, bucket, key, PROCESSED_BUCKET, paths["archive"]
+            ))
+
+        # Read the input file
+        with processor.timed("parse"):
+            input_df = read_file_from_s3(bucket, key, profile=profile)
+        stats["total_records"] += len(input_df)
+
+        # Raw columns can mix types (e.g. JSON), so the Parquet copy keeps them as text like the streaming path
+        if archive and _archive_as_parquet(processor, key):
+            archive_jobs.append(archive_executor.submit(
+                write_to_s3, input_df.astype("str"), PROCESSED_BUCKET, paths["archive_parquet"], "parquet",
+                parquet=processor.parquet
+            ))
+
+        # Process the data
+        valid_df, error_df = processor.process_dataframe(input_df)
+
+        # Write processed data, one file per partition
+        if not valid_df.empty:
+            with processor.timed("serialize"):
+                keys = write_dataset_to_s3(valid_df, PROCESSED_BUCKET, paths["processed"], processor, profile=profile)
+            stats["processed_records"] += len(valid_df)
+            stats["output_files"].extend(f"s3://{PROCESSED_BUCKET}/{k}" for k in keys)
+
+        # Write error data (if any and error bucket configured)
+        if not error_df.empty and ERROR_BUCKET:
+            with processor.timed("serialize"):
+                write_errors(processor, error_df, paths, stats, profile=profile)
+            stats["error_records"] += len(error_df)
+
+        for job in archive_jobs:
+            job.result()
+
+    logger.info(f"Completed processing {key}: {len(valid_df)} valid, {len(error_df)} errors")
+    return stats
+
+def process_s3_object_arrow(processor: DataProcessor, bucket: str, key: str) -> Dict:
+    """process_s3_object for the Arrow engine: read, validate, transform and write without pandas"""
+    stats = {"total_records": 0, "processed_records": 0, "error_records": 0, "output_files": []}
+    profile = processor.profile
+
+    # Generate output paths
+    paths = generate_output_paths(key, processor.output_layout)
+    archive = processor.secret_config.get("archive_original", False)
+
+    with ThreadPoolExecutor(max_workers=2) as archive_executor:
+        archive_jobs = []
+
+        if archive:
+            archive_jobs.append(archive_executor.submit(
+                copy_s3_object, bucket, key, PROCESSED_BUCKET, paths["archive"]
+            ))
+
+        with processor.timed("parse"):
+            input_table = read_table_from_s3(bucket, key, profile=profile)
+        stats["total_records"] += input_table.num_rows
+
+        if archive and _archive_as_parquet(processor, key):
+            archive_jobs.append(archive_executor.submit(
+                write_table_to_s3, input_table, PROCESSED_BUCKET, paths["archive_parquet"],
+                parquet=processor.parquet
+            ))
+
+        valid_table, error_table = processor.process_table(input_table)
+
+        if valid_table.num_rows:
+            with processor.timed("serialize"):
+                keys = write_dataset_to_s3(valid_table, PROCESSED_BUCKET, paths["processed"], processor, profile=profile)
+            stats["processed_records"] += valid_table.num_rows
+            stats["output_files"].extend(f"s3://{PROCESSED_BUCKET}/{k}" for k in keys)
+
+        # Arrow columns have a single type each, so rejected rows keep their raw values as read
+        if error_table.num_rows and ERROR_BUCKET:
+            with processor.timed("serialize"):
+                write_errors(processor, error_table, paths, stats, profile=profile)
+            stats["error_records"] += error_table.num_rows
+
+        for job in archive_jobs:
+            job.result()
+
+    logger.info(f"Completed processing {key}: {valid_table.num_rows} valid, {error_table.num_rows} errors")
+    return stats
+
+def process_s3_object_streaming(processor: DataProcessor, bucket: str, key: str,
+                                chunk_rows: int = DEFAULT_CHUNK_ROWS, time_left: Optional[Callable[[], int]] = None,
+                                checkpoint: Optional[Dict] = None) -> Dict:
+    """Validate and transform a single S3 object chunk by chunk, keeping memory bounded by chunk_rows.
+
+    With time_left (milliseconds until the invocation times out), processing stops between chunks once
+    less than the configured margin plus the slowest chunk so far remains. The outputs written until then
+    are completed and stats["continuation"] holds the checkpoint to resume from: resuming with it reads the
+    rest of the file from where this segment stopped and writes it to the next segment's files. Inputs
+    that cannot be resumed part way (compressed objects, JSON arrays) are never paused.
+    """
+    checkpoint = checkpoint or {}
+    stats = {"total_records": 0, "processed_records": 0, "error_records": 0, "output_files": [], "chunks": 0}
+    stats.update(checkpoint.get("stats", {}))
+    stats["output_files"] = list(stats["output_files"])
+
+    # Every segment of a file shares the names (and timestamp) of the first one
+    segment = checkpoint.get("segment", 0)
+    base_paths = checkpoint.get("paths") or generate_output_paths(key, processor.output_layout)
+    paths = {name: _segment_path(path, segment) for name, path in base_paths.items()}
+    margin_ms = float(processor.secret_config.get("time_budget_margin_ms", DEFAULT_TIME_BUDGET_MARGIN_MS))
+    slowest_ms = 0.0
+    interrupted = False
+    resume_at = checkpoint.get("position")
+    resumable = True
+
+    writers = {}  # output key -> (output name, writer)
+    archive = processor.secret_config.get("archive_original", False)
+    convert_archive = archive and _archive_as_parquet(processor, key)
+    error_report = ErrorReport(processor.error_sample_rows) if processor.compact_errors and ERROR_BUCKET else None
+    summaries = {}  # processed output key -> summary of the rows written to it
+    dump_errors = ERROR_BUCKET and (not processor.compact_errors or processor.error_full_dump)
+
+    # The Parquet copy of the original is written chunk by chunk on the archive thread, in input order
+    archive_queue = queue.Queue(maxsize=ARCHIVE_QUEUE_CHUNKS) if convert_archive else None
+
+    def convert_archive_chunks() -> Optional[ChunkedS3Writer]:
+        archive_writer, error = None, None
+        # Keep draining after a failure so that the producer never blocks on a full queue
+        while True:
+            input_df = archive_queue.get()
+            if input_df is None:
+                break
+            if error is None:
+                try:
+                    if archive_writer is None:
+                        archive_writer = ChunkedS3Writer(
+                            PROCESSED_BUCKET, paths["archive_parquet"], parquet=processor.parquet
+                        )
+                    archive_writer.write(input_df.astype("str"))
+                except Exception as e:
+                    error = e
+        if error is not None:
+            if archive_writer is not None:
+                archive_writer.abort()
+            raise error
+        return archive_writer
+
+    def append(name: str, bucket: str, output_key: str, data):
+        with processor.timed("serialize"):
+            if output_key not in writers:
+                writers[output_key] = (name, ChunkedS3Writer(bucket, output_key, parquet=processor.parquet))
+            writer = writers[output_key][1]
+            if isinstance(data, pd.DataFrame):
+                writer.write(data)
+            else:
+                writer.write_table(data)
 
-            # Read the input file
-            input_df = read_file_from_s3(bucket, key)
+    chunks = iter_file_chunks(bucket, key, chunk_rows, profile=processor.profile, position=resume_at)
+    archive_executor = ThreadPoolExecutor(max_workers=2)
+    convert_job = archive_executor.submit(convert_archive_chunks) if convert_archive else None
+    try:
+        # Archive original file (optional), copied inside S3 while the chunks are processed
+        archive_job = archive_executor.submit(
+            copy_s3_object, bucket, key, PROCESSED_BUCKET, paths["archive"]
+        ) if archive and segment == 0 else None
+
+        while True:
+            # At least one chunk per invocation, so that every continuation makes progress
+            if time_left is not None and resumable and \
+                    stats["chunks"] > checkpoint.get("stats", {}).get("chunks", 0) and \
+                    time_left() < margin_ms + slowest_ms:
+                interrupted = True
+                break
+
+            started = time.perf_counter()
+            with processor.timed("parse"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            input_df, resume_at = chunk
+            if resume_at is None and resumable and time_left is not None:
+                logger.warning(f"{key} can only be read from the start; processing it without pausing")
+            resumable = resume_at is not None
+
+            stats["chunks"] += 1
             stats["total_records"] += len(input_df)
 
-            # Process the data
             valid_df, error_df = processor.process_dataframe(input_df)
 
-            # Generate output paths
-            paths = generate_output_paths(key)
-
-            # Write processed data
             if not valid_df.empty:
-                write_to_s3(
-                    valid_df,
-                    PROCESSED_BUCKET,
-                    paths["processed"],
-                    file_format="parquet"
-                )
+                # Sorted per chunk, so every row group of a partition file is ordered on its own
+                valid_table = processor.parquet.sort(pa.Table.from_pandas(valid_df, preserve_index=False))
+                for output_key, partition, rows in partition_table(
+                        valid_table, paths["processed"], processor.output_layout):
+                    append("processed", PROCESSED_BUCKET, output_key, rows)
+                    if processor.summary_sidecars:
+                        summary = summarize_table(rows, partition)
+                        if output_key in summaries:
+                            summaries[output_key].merge(summary)
+                        else:
+                            summaries[output_key] = summary
                 stats["processed_records"] += len(valid_df)
-                stats["output_files"].append(f"s3://{PROCESSED_BUCKET}/{paths['processed']}")
 
-            # Write error data (if any and error bucket configured)
             if not error_df.empty and ERROR_BUCKET:
-                write_to_s3(
-                    error_df,
-                    ERROR_BUCKET,
-                    paths["errors"],
-                    file_format="parquet"
-                )
+                # Raw input columns can also change dtype between chunks
+                if dump_errors:
+                    append("errors", ERROR_BUCKET, paths["errors"], _raw_columns_as_text(error_df))
+                if error_report is not None:
+                    error_report.add(error_df)
                 stats["error_records"] += len(error_df)
-                stats["output_files"].append(f"s3://{ERROR_BUCKET}/{paths['errors']}")
-
-            # Archive original file (optional)
-            if secret_config.get("archive_original", False):
-                write_to_s3(
-                    input_df,
-                    PROCESSED_BUCKET,
-                    paths["archive"],
-                    file_format="parquet"
-                )
 
-            logger.info(f"Completed processing {key}: {len(valid_df)} valid, {len(error_df)} errors")
+            if convert_job is not None:
+                archive_queue.put(input_df)
+
+            slowest_ms = max(slowest_ms, (time.perf_counter() - started) * 1000)
+
+        for name, writer in writers.values():
+            with processor.timed("serialize"):
+                writer.close()
+            if processor.profile is not None:
+                processor.profile.record_bytes(written=writer.bytes_written)
+            stats["output_files"].append(f"s3://{writer.bucket}/{writer.key}")
+
+        if convert_job is not None:
+            archive_queue.put(None)
+            archive_writer, convert_job = convert_job.result(), None
+            if archive_writer is not None:
+                with processor.timed("serialize"):
+                    archive_writer.close()
+                if processor.profile is not None:
+                    processor.profile.record_bytes(written=archive_writer.bytes_written)
+
+        for output_key, summary in summaries.items():
+            summary.files = 1
+            sidecar_key = write_summary(summary, PROCESSED_BUCKET, output_key, processor.profile)
+            stats["output_files"].append(f"s3://{PROCESSED_BUCKET}/{sidecar_key}")
+
+        # The report covers this segment; stats["error_codes"] adds up all segments of the file
+        if error_report is not None and error_report.rows:
+            with processor.timed("serialize"):
+                write_error_report(processor, error_report, paths, stats, processor.profile)
+
+        if archive_job is not None:
+            archive_job.result()
+
+    except Exception:
+        for _, writer in writers.values():
+            writer.abort()
+        if convert_job is not None:
+            archive_queue.put(None)
+            try:
+                archive_writer = convert_job.result()
+                if archive_writer is not None:
+                    archive_writer.abort()
+            except Exception as e:
+                logger.error(f"Parquet archive conversion of {key} failed: {str(e)}")
+        raise
+    finally:
+        chunks.close()
+        archive_executor.shutdown()
+
+    if interrupted:
+        stats["continuation"] = {
+            "bucket": bucket,
+            "key": key,
+            "position": resume_at,
+            "segment": segment + 1,
+            "paths": base_paths,
+            "stats": dict(stats)
+        }
+        logger.info(f"Pausing {key} after {stats['total_records']} records to stay within the time budget")
+        return stats
+
+    logger.info(f"Completed streaming {key} in {stats['chunks']} chunks: "
+                f"{stats['processed_records']} valid, {stats['error_records']} errors")
+    return stats
+
+def _segment_path(key: str, segment: int) -> str:
+    """Output key of a continuation segment: name_ts.parquet, then name_ts_part0001.parquet, ..."""
+    if not segment:
+        return key
+    root, extension = posixpath.splitext(key)
+    return f"{root}_part{segment:04d}{extension}"
+
+def process_s3_batch(processor: DataProcessor, objects: List[Tuple[str, str]],
+                     max_workers: int = DEFAULT_MAX_CONCURRENT_FILES) -> Tuple[Dict, List[Tuple[str, str]]]:
+    """Read many small objects concurrently, validate them as one combined batch and write one output.
+
+    Rows keep their origin: error rows carry _source_file and their _row within that file, and the
+    statistics break counts down per source file. Objects that cannot be read are returned
+    separately so the caller can report them without failing the rest of the batch.
+    """
+    stats = {"total_records": 0, "processed_records": 0, "error_records": 0, "output_files": [], "files": {}}
+    profile = processor.profile
+    failed = []
+    frames = []
+    sources = []
+
+    # One output per partition for the whole batch
+    paths = generate_output_paths(f"batch_{uuid.uuid4().hex[:12]}", processor.output_layout)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        archive_jobs = []
+
+        with processor.timed("parse"):
+            reads = [executor.submit(read_file_from_s3, bucket, key, profile=profile) for bucket, key in objects]
+            for (bucket, key), read in zip(objects, reads):
+                try:
+                    frames.append(read.result())
+                    sources.append(f"s3://{bucket}/{key}")
+                except Exception as e:
+                    logger.error(f"Failed to read s3://{bucket}/{key} for batch: {str(e)}")
+                    failed.append((bucket, key))
+                    continue
+
+                # Archive the original alongside validation
+                if processor.secret_config.get("archive_original", False):
+                    archive_jobs.append(executor.submit(
+                        copy_s3_object, bucket, key, PROCESSED_BUCKET,
+                        generate_output_paths(key, processor.output_layout)["archive"]
+                    ))
+
+        if frames:
+            valid_df, error_df = _process_batch_frames(processor, frames, sources, stats)
 
+            if not valid_df.empty:
+                with processor.timed("serialize"):
+                    keys = write_dataset_to_s3(valid_df, PROCESSED_BUCKET, paths["processed"], processor, profile=profile)
+                stats["processed_records"] += len(valid_df)
+                stats["output_files"].extend(f"s3://{PROCESSED_BUCKET}/{k}" for k in keys)
+
+            if not error_df.empty and ERROR_BUCKET:
+                with processor.timed("serialize"):
+                    write_errors(processor, error_df, paths, stats, profile=profile)
+                stats["error_records"] += len(error_df)
+
+        for job in archive_jobs:
+            job.result()
+
+    logger.info(f"Completed batch of {len(sources)} files: {stats['processed_records']} valid, "
+                f"{stats['error_records']} errors, {len(failed)} unreadable")
+    return stats, failed
+
+def _process_batch_frames(processor: DataProcessor, frames: List[pd.DataFrame], sources: List[str],
+                          stats: Dict) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Validate the frames of a batch together and attribute every result row to its source file"""
+    error_frames = []
+    combined_frames = []
+    combined_sources = []
+
+    for df, source in zip(frames, sources):
+        stats["total_records"] += len(df)
+        stats["files"][source] = {"total_records": len(df), "processed_records": len(df), "error_records": 0}
+
+        # Missing columns would turn into NaNs once concatenated, so such files are validated alone
+        if any(f not in df.columns for f in EXPECTED_FIELDS):
+            _, error_df = processor.process_dataframe(df)
+            if not error_df.empty:
+                error_df["_source_file"] = source
+                error_frames.append(error_df)
+            stats["files"][source].update(processed_records=0, error_records=len(df))
+        elif len(df):
+            combined_frames.append(df)
+            combined_sources.append(source)
+
+    valid_df = pd.DataFrame()
+    if combined_frames:
+        lengths = [len(df) for df in combined_frames]
+        source_ids = np.repeat(np.arange(len(combined_frames)), lengths)
+        local_rows = np.concatenate([df.index.to_numpy() for df in combined_frames])
+
+        valid_df, error_df = processor.process_dataframe(pd.concat(combined_frames, ignore_index=True))
+
+        if not error_df.empty:
+            positions = error_df["_row"].to_numpy()
+            error_df["_source_file"] = np.array(combined_sources, dtype=object)[source_ids[positions]]
+            error_df["_row"] = local_rows[positions].astype(int)
+            error_frames.append(error_df)
+
+            counts = np.bincount(source_ids[positions], minlength=len(combined_frames))
+            for source, count in zip(combined_sources, counts):
+                stats["files"][source]["error_records"] = int(count)
+                stats["files"][source]["processed_records"] -= int(count)
+
+    if not error_frames:
+        return valid_df, pd.DataFrame()
+
+    # Raw input columns can also differ in dtype between source files
+    return valid_df, _raw_columns_as_text(pd.concat(error_frames, ignore_index=True))
+
+def extract_s3_objects(event: Dict) -> Tuple[List[Dict], List[str]]:
+    """Collect the S3 objects named by an event.
+
+    Accepts S3 notifications, SQS messages wrapping S3 notifications, {"bucket": ..., "prefix": ...}
+    listing requests and {"continuation": ...} checkpoints, directly or as SQS messages. Returns the
+    objects (bucket, key, etag, the SQS messageId they came from and any checkpoint) and the ids of SQS
+    messages that could not be parsed.
+    """
+    objects = []
+    bad_messages = []
+
+    if "continuation" in event:
+        return [_continuation_object(event["continuation"], None)], bad_messages
+
+    if "bucket" in event and "prefix" in event:
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=event["bucket"], Prefix=event["prefix"]):
+            for obj in page.get("Contents", []):
+                if not obj["Key"].endswith("/"):
+                    objects.append({"bucket": event["bucket"], "key": obj["Key"], "etag": obj["ETag"], "message_id": None})
+        return objects, bad_messages
+
+    for record in event.get("Records", []):
+        try:
+            if record.get("eventSource") == "aws:sqs":
+                body = json.loads(record["body"])
+                if "continuation" in body:
+                    objects.append(_continuation_object(body["continuation"], record["messageId"]))
+                for s3_record in body.get("Records", []):
+                    objects.append(_s3_record_object(s3_record, record["messageId"]))
+            else:
+                objects.append(_s3_record_object(record, None))
         except Exception as e:
             logger.error(f"Failed to process S3 record: {str(e)}")
-            # Optionally, you could move the failed file to a quarantine location
+            if record.get("messageId"):
+                bad_messages.append(record["messageId"])
 
-    # Return processing statistics
+    return objects, bad_messages
+
+def _s3_record_object(s3_record: Dict, message_id: Optional[str]) -> Dict:
     return {
+        "bucket": s3_record["s3"]["bucket"]["name"],
+        "key": s3_record["s3"]["object"]["key"],
+        "etag": s3_record["s3"]["object"].get("eTag"),
+        "message_id": message_id
+    }
+
+def _continuation_object(checkpoint: Dict, message_id: Optional[str]) -> Dict:
+    return {
+        "bucket": checkpoint["bucket"],
+        "key": checkpoint["key"],
+        "etag": checkpoint.get("etag"),
+        "message_id": message_id,
+        "continuation": checkpoint
+    }
+
+def schedule_continuation(checkpoint: Dict, context):
+    """Hand the rest of a file to a new invocation: through CONTINUATION_QUEUE_URL if set, else an async self-invoke"""
+    payload = json.dumps({"continuation": checkpoint})
+
+    if CONTINUATION_QUEUE_URL:
+        _client("sqs").send_message(QueueUrl=CONTINUATION_QUEUE_URL, MessageBody=payload)
+    else:
+        _client("lambda").invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType="Event",
+            Payload=payload.encode("utf-8")
+        )
+
+    logger.info(f"Scheduled continuation of s3://{checkpoint['bucket']}/{checkpoint['key']} "
+                f"from record {checkpoint['position']['rows']} (segment {checkpoint['segment']})")
+
+def claim_new_objects(processor: DataProcessor, objects: List[Tuple[str, str]],
+                      etags: List[Optional[str]]) -> Tuple[List[Tuple[str, str]], Dict, List[str], List[Tuple[str, str]]]:
+    """Lease the event's objects in the processed manifest, dropping those that were seen before.
+
+    Returns the objects still to process, the identities claimed for each of them (to commit once
+    their outputs are written, or release if processing fails), the URIs of the skipped duplicates
+    and the objects another invocation is still processing. If the manifest is unavailable every
+    object is processed, since a duplicate is cheaper than a lost file.
+    """
+    include_content = processor.secret_config.get("idempotency_content_hash", False)
+
+    identities = []
+    for (bucket, key), etag in zip(objects, etags):
+        try:
+            checksum = None
+            if etag is None or include_content:
+                head = s3.head_object(Bucket=bucket, Key=key, ChecksumMode="ENABLED")
+                etag = etag or head["ETag"]
+                checksum = head.get("ChecksumSHA256")
+            identities.append(object_identities(bucket, key, etag, checksum, include_content=include_content))
+        except Exception as e:
+            # Without an identity the object cannot be deduplicated; processing reports the real error
+            logger.error(f"Failed to identify s3://{bucket}/{key}: {str(e)}")
+            identities.append([])
+
+    lease_seconds = float(processor.secret_config.get("idempotency_lease_seconds", DEFAULT_LEASE_SECONDS))
+    try:
+        outcomes = processed_manifest.claim(identities, lease_seconds)
+    except Exception as e:
+        logger.error(f"Idempotency check failed, processing all objects: {str(e)}")
+        return objects, {}, [], []
+
+    new_objects = [obj for obj, outcome in zip(objects, outcomes) if outcome == CLAIMED]
+    claims = {obj: ids for obj, ids, outcome in zip(objects, identities, outcomes) if outcome == CLAIMED}
+    busy = [obj for obj, outcome in zip(objects, outcomes) if outcome == IN_PROGRESS]
+    skipped = [
+        f"s3://{bucket}/{key}" for (bucket, key), outcome in zip(objects, outcomes)
+        if outcome not in (CLAIMED, IN_PROGRESS)
+    ]
+    for uri in skipped:
+        logger.info(f"Skipping already processed object {uri}")
+    for bucket, key in busy:
+        logger.info(f"Deferring s3://{bucket}/{key}, which another invocation is processing")
+
+    return new_objects, claims, skipped, busy
+
+_startup_reported = False
+
+def process_s3_event(event: Dict, context) -> Dict:
+    """Main Lambda handler for S3 events"""
+    # Initialize counters
+    stats = {
+        "total_records": 0,
+        "processed_records": 0,
+        "error_records": 0,
+        "input_files": 0,
+        "failed_files": [],
+        "skipped_files": [],
+        "deferred_files": [],
+        "continued_files": [],
+        "output_files": []
+    }
+
+    # Get secret configuration and validation rules, cached across warm invocations
+    processor = config_cache.get_processor(force_refresh=event.get("refresh_config", False))
+    processor.reset_profile()
+    processor.reset_counts()
+    streaming = processor.secret_config.get("streaming_mode", False)
+    chunk_rows = int(processor.secret_config.get("chunk_rows", DEFAULT_CHUNK_ROWS))
+    max_workers = int(processor.secret_config.get("max_concurrent_files", DEFAULT_MAX_CONCURRENT_FILES))
+
+    # Time budget mode streams every file and pauses it before the invocation times out
+    time_left = None
+    if processor.secret_config.get("time_budget", False) and hasattr(context, "get_remaining_time_in_millis"):
+        time_left = context.get_remaining_time_in_millis
+
+    def process(bucket: str, key: str) -> Dict:
+        logger.info(f"Processing file: s3://{bucket}/{key}")
+        checkpoint = continuations.get((bucket, key))
+        if streaming or time_left is not None or checkpoint is not None:
+            return process_s3_object_streaming(processor, bucket, key, chunk_rows, time_left, checkpoint)
+        if processor.engine == ENGINE_ARROW:
+            return process_s3_object_arrow(processor, bucket, key)
+        return process_s3_object(processor, bucket, key)
+
+    # Extract S3 bucket and key of each S3 record in the event
+    entries, failed_messages = extract_s3_objects(event)
+    objects = [(entry["bucket"], entry["key"]) for entry in entries]
+    message_ids = {(entry["bucket"], entry["key"]): entry["message_id"] for entry in entries}
+    etags = {(entry["bucket"], entry["key"]): entry["etag"] for entry in entries}
+    continuations = {
+        (entry["bucket"], entry["key"]): entry["continuation"] for entry in entries if entry.get("continuation")
+    }
+    stats["input_files"] = len(objects)
+
+    # Skip objects that were already processed, before downloading their bodies; continued files were
+    # claimed by the invocation that started them
+    claims = {
+        obj: checkpoint["claim"] for obj, checkpoint in continuations.items() if checkpoint.get("claim")
+    } if processed_manifest is not None else {}
+    lease_seconds = float(processor.secret_config.get("idempotency_lease_seconds", DEFAULT_LEASE_SECONDS))
+    if processed_manifest is not None and len(objects) > len(continuations):
+        new_objects = [obj for obj in objects if obj not in continuations]
+        new_objects, new_claims, stats["skipped_files"], busy = claim_new_objects(
+            processor, new_objects, [etags[obj] for obj in new_objects]
+        )
+        objects = [obj for obj in objects if obj in continuations] + new_objects
+        claims.update(new_claims)
+
+        # Redelivered later, by which time the other invocation has finished or its lease has expired
+        for bucket, key in busy:
+            stats["deferred_files"].append(f"s3://{bucket}/{key}")
+            if message_ids.get((bucket, key)):
+                failed_messages.append(message_ids[(bucket, key)])
+
+    def complete(bucket: str, key: str):
+        if (bucket, key) in claims:
+            processed_manifest.commit(claims[(bucket, key)])
+
+    def fail(bucket: str, key: str):
+        stats["failed_files"].append(f"s3://{bucket}/{key}")
+        if (bucket, key) in claims:
+            processed_manifest.release(claims[(bucket, key)])
+        if message_ids.get((bucket, key)):
+            failed_messages.append(message_ids[(bucket, key)])
+
+    def merge(file_stats: Dict):
+        for name in ["total_records", "processed_records", "error_records"]:
+            stats[name] += file_stats[name]
+        stats["output_files"].extend(file_stats["output_files"])
+        for code, count in file_stats.get("error_codes", {}).items():
+            stats.setdefault("error_codes", {})
+            stats["error_codes"][code] = stats["error_codes"].get(code, 0) + count
+
+    if processor.secret_config.get("batch_mode", False) and len(objects) > 1 and not continuations:
+        # Validate all objects together and write one output per partition
+        try:
+            batch_stats, unreadable = process_s3_batch(processor, objects, max(max_workers, 1))
+            merge(batch_stats)
+            stats["files"] = batch_stats["files"]
+        except Exception as e:
+            logger.error(f"Failed to process batch of {len(objects)} files: {str(e)}")
+            unreadable = objects
+        for bucket, key in objects:
+            if (bucket, key) in unreadable:
+                fail(bucket, key)
+            else:
+                complete(bucket, key)
+    else:
+        # Overlap the S3 reads and writes of different objects; each object succeeds or fails on its own
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(objects) or 1))) as executor:
+            futures = [executor.submit(process, bucket, key) for bucket, key in objects]
+
+            for (bucket, key), future in zip(objects, futures):
+                try:
+                    file_stats = future.result()
+                    checkpoint = file_stats.pop("continuation", None)
+                    if checkpoint is not None:
+                        checkpoint.update(etag=etags[(bucket, key)], claim=claims.get((bucket, key), []))
+                        schedule_continuation(checkpoint, context)
+                        stats["continued_files"].append(f"s3://{bucket}/{key}")
+                        # The claim stays pending, and alive, until the last segment is written
+                        if checkpoint["claim"]:
+                            processed_manifest.extend(checkpoint["claim"], lease_seconds)
+                    else:
+                        complete(bucket, key)
+                    merge(file_stats)
+                except Exception as e:
+                    logger.error(f"Failed to process S3 record s3://{bucket}/{key}: {str(e)}")
+                    fail(bucket, key)
+                    # Optionally, you could move the failed file to a quarantine location
+
+    stats["config_cache"] = config_cache.stats()
+
+    # The first invocation of a container also reports what its cold start spent time on
+    global _startup_reported
+    if not _startup_reported:
+        _startup_reported = True
+        stats["startup"] = STARTUP_PROFILE
+        logger.info(json.dumps({"event": "startup_profile", **STARTUP_PROFILE}))
+
+    if processor.profile is not None:
+        stats["profile"] = processor.profile.to_dict()
+        logger.info(json.dumps({"event": "validation_profile", **stats["profile"]}))
+
+    # Return processing statistics
+    result = {
         "statusCode": 200,
         "body": json.dumps({
             "message": "Processing completed",
@@ -321,6 +2522,12 @@ def process_s3_event(event: Dict, context) -> Dict:
         })
     }
 
+    # SQS partial batch response: only the failed messages are redelivered
+    if any(record.get("eventSource") == "aws:sqs" for record in event.get("Records", [])):
+        result["batchItemFailures"] = [{"itemIdentifier": message_id} for message_id in dict.fromkeys(failed_messages)]
+
+    return result
+
 def lambda_handler(event, context):
     """AWS Lambda entry point"""
     try:
@@ -343,6 +2550,8 @@ def lambda_handler(event, context):
             })
         }
 
+STARTUP_PROFILE["init_seconds"] = round(time.perf_counter() - _init_started, 6)
+
 # Optional: For local testing
 if __name__ == "__main__":
     # Simulate an S3 event for testing
@@ -43,4 +43,51 @@ resource "aws_glue_crawler" "data_lake_raw_crawler" {
     Automation = "Crawler"
     DataTier   = "Raw"
   }
-}
\ No newline at end of file
+}
+
+resource "aws_glue_crawler" "processed_zone_crawler" {
+  name          = "processed_zone_s3_crawler"
+  database_name = "example_data_lake_db"
+  role          = aws_iam_role.glue_crawler_role.arn
+
+  # Run after the daily compaction of yesterday's partitions
+  schedule = "cron(0 2 * * ? *)"
+
+  # The validator writes processed/year=YYYY/month=MM/day=DD/region=<region>/*.parquet when its
+  # secret sets "output_layout": "hive", so the crawler registers year, month, day and region as
+  # partition keys that Athena can prune on.
+  s3_target {
+    path = "s3://${aws_s3_bucket.processed.bucket}/processed/"
+
+    # Summary sidecars next to the data files are statistics, not rows of the table
+    exclusions = [
+      "**/_temporary/**",
+      "**.summary.json"
+    ]
+  }
+
+  # Only new partition folders are crawled on each run
+  recrawl_policy {
+    recrawl_behavior = "CRAWL_NEW_FOLDERS_ONLY"
+  }
+
+  schema_change_policy {
+    update_behavior = "LOG"
+    delete_behavior = "LOG"
+  }
+
+  configuration = jsonencode({
+    "Version" = 1.0
+    "Grouping" = {
+      "TableGroupingPolicy" = "CombineCompatibleSchemas"
+    }
+    "CrawlerOutput" = {
+      "Partitions" = { "AddOrUpdateBehavior" = "InheritFromTable" }
+    }
+  })
+
+  tags = {
+    Automation = "Crawler"
+    DataTier   = "Processed"
+  }
+}
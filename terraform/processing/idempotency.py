@@ -0,0 +1,344 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Manifest settings
+DEFAULT_LEASE_SECONDS = 1800  # Longer than an invocation (15 min at most) plus the continuation delay
+MAX_CLAIM_ATTEMPTS = 5
+CLAIM_BACKOFF_SECONDS = 0.05  # Base of the jittered exponential backoff between conflicting writes
+
+# Compact manifest of recently processed fingerprints, checked before any marker
+MANIFEST_NAME = "processed.manifest"
+MANIFEST_REFRESH_SECONDS = 60
+MAX_MANIFEST_ENTRIES = 100_000  # 800 KB; older duplicates are still caught by their markers
+BLOOM_ERROR_RATE = 0.01
+MIN_BLOOM_CAPACITY = 1024
+
+# Claim outcomes
+CLAIMED = "claimed"
+DUPLICATE = "duplicate"  # Already processed, or claimed twice in the same call
+IN_PROGRESS = "in_progress"  # Leased by another invocation that has not finished yet
+
+# Marker states
+STATE_PENDING = "pending"
+STATE_PROCESSED = "processed"
+
+def fingerprint(identity: str) -> int:
+    """64-bit fingerprint of an object identity such as bucket/key@etag"""
+    return int.from_bytes(hashlib.blake2b(identity.encode("utf-8"), digest_size=8).digest(), "little")
+
+def object_identities(bucket: str, key: str, etag: str, checksum_sha256: Optional[str] = None,
+                      include_content: bool = False) -> List[int]:
+    """Fingerprints under which an object counts as already processed.
+
+    The location identity (bucket/key@etag) catches repeated notifications and same-key re-uploads.
+    With include_content, a content identity is added so the same bytes uploaded under another key
+    are caught too: S3's SHA-256 checksum when the object has one, otherwise the ETag when it is a
+    plain MD5 (single-part uploads).
+    """
+    etag = etag.strip('"')
+    identities = [fingerprint(f"{bucket}/{key}@{etag}")]
+
+    if include_content:
+        if checksum_sha256:
+            identities.append(fingerprint(f"sha256:{checksum_sha256}"))
+        elif "-" not in etag:
+            identities.append(fingerprint(f"md5:{etag}"))
+
+    return identities
+
+class BloomFilter:
+    """Bloom filter over 64-bit fingerprints, answering "definitely not present" without a search"""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = capacity = max(capacity, MIN_BLOOM_CAPACITY)
+        self.num_bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, fingerprints: np.ndarray) -> np.ndarray:
+        # Double hashing: the two halves of the fingerprint generate all probe positions
+        low = fingerprints & np.uint64(0xFFFFFFFF)
+        high = (fingerprints >> np.uint64(32)) | np.uint64(1)
+        probes = np.arange(self.num_hashes, dtype=np.uint64)
+        return (low[:, None] + probes[None, :] * high[:, None]) % np.uint64(self.num_bits)
+
+    def add(self, fingerprints: np.ndarray):
+        positions = self._positions(fingerprints).ravel()
+        np.bitwise_or.at(self.bits, positions // np.uint64(8), (1 << (positions % np.uint64(8))).astype(np.uint8))
+
+    def might_contain(self, value: int) -> bool:
+        positions = self._positions(np.array([value], dtype=np.uint64))[0]
+        return bool(np.all(self.bits[positions // np.uint64(8)] & (1 << (positions % np.uint64(8))).astype(np.uint8)))
+
+class ProcessedManifest:
+    """Markers of claimed and processed objects, one per fingerprint under an S3 prefix or local directory.
+
+    A claim creates the fingerprint's marker with a conditional write (If-None-Match: *) as a pending
+    lease that expires after lease_seconds; commit marks it processed once the outputs are written.
+    A lease whose invocation crashed or timed out simply expires and the next delivery takes it over,
+    so no object is lost to a claim that was never released. Invocations only contend on the markers
+    of the same object, and nothing is read or rewritten as the markers grow; an S3 lifecycle rule
+    expiring old markers bounds both their number and how long duplicates are recognized.
+
+    In front of the markers sits a compact manifest (MANIFEST_NAME) of the most recently committed
+    fingerprints, kept in memory as a sorted array behind a Bloom filter and reloaded at most every
+    MANIFEST_REFRESH_SECONDS, so known duplicates are rejected without a request to S3. The markers
+    stay authoritative: a fingerprint missing from the manifest is always checked against them.
+    """
+
+    def __init__(self, location: str, s3_client=None, refresh_seconds: float = MANIFEST_REFRESH_SECONDS):
+        self.location = location if location.endswith("/") else location + "/"
+        self.s3 = s3_client
+        self.refresh_seconds = refresh_seconds
+
+        if location.startswith("s3://"):
+            self.bucket, _, self.prefix = self.location[len("s3://"):].partition("/")
+        else:
+            self.bucket = self.prefix = None
+            os.makedirs(self.location, exist_ok=True)
+
+        # Compact manifest as last read (commit order) and the in-memory lookup built from it
+        self.entries = np.array([], dtype=np.uint64)
+        self.version = None  # S3 ETag or local mtime of the loaded manifest
+        self.loaded_at = None
+        self.recent = deque(maxlen=MAX_MANIFEST_ENTRIES)  # Processed here or seen processed since then
+        self.known = np.array([], dtype=np.uint64)
+        self.bloom = BloomFilter(0)
+        self._lock = threading.Lock()
+
+    def claim(self, objects: Sequence[List[int]], lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[str]:
+        """Lease objects for processing, returning CLAIMED, DUPLICATE or IN_PROGRESS for each.
+
+        Each object is given as its list of identity fingerprints; it is only claimed if all of them
+        are free, or their leases expired. An object without identities cannot be deduplicated and
+        is always claimed.
+        """
+        self.refresh()
+        outcomes = []
+        claimed = set()
+        for identities in objects:
+            duplicate = any(value in claimed or self.contains(value) for value in identities)
+            outcome = DUPLICATE if duplicate else CLAIMED
+            acquired = []
+            for value in identities if outcome == CLAIMED else []:
+                outcome = self._acquire(value, lease_seconds)
+                if outcome == DUPLICATE:
+                    self.remember([value])
+                if outcome != CLAIMED:
+                    break
+                acquired.append(value)
+
+            if outcome == CLAIMED:
+                claimed.update(identities)
+            else:
+                # Another identity of the object is taken, so its free ones are not kept either
+                self.release(acquired)
+            outcomes.append(outcome)
+
+        return outcomes
+
+    def commit(self, identities: List[int]):
+        """Mark claimed objects as processed, once their outputs are written"""
+        marker = {"state": STATE_PROCESSED, "processed_at": time.time()}
+        self._write_all(identities, marker, "commit")
+        self.remember(identities)
+        self._append_manifest(identities)
+
+    def extend(self, identities: List[int], lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        """Renew the lease of objects whose processing continues in another invocation"""
+        marker = {"state": STATE_PENDING, "expires_at": time.time() + lease_seconds}
+        self._write_all(identities, marker, "extend")
+
+    def release(self, identities: List[int]):
+        """Drop the claims of objects whose processing failed so that a retry is not skipped"""
+        for value in identities:
+            try:
+                if self.bucket:
+                    self.s3.delete_object(Bucket=self.bucket, Key=self._key(value))
+                elif os.path.exists(self._key(value)):
+                    os.remove(self._key(value))
+            except Exception as e:
+                logger.error(f"Could not release {self._key(value)}: {str(e)}")
+
+    def contains(self, value: int) -> bool:
+        """Whether a fingerprint is known to be processed, without a request to S3"""
+        with self._lock:
+            if not self.bloom.might_contain(value):
+                return False
+            position = np.searchsorted(self.known, np.uint64(value))
+            return position < len(self.known) and int(self.known[position]) == value
+
+    def remember(self, identities: Iterable[int]):
+        """Add fingerprints known to be processed to the in-memory lookup"""
+        added = np.array(list(identities), dtype=np.uint64)
+        with self._lock:
+            self.recent.extend(int(value) for value in added)
+            self._index(np.union1d(self.known, added), added)
+
+    def refresh(self, force: bool = False):
+        """Reload the compact manifest if it is older than refresh_seconds and changed since it was read"""
+        if not force and self.loaded_at is not None and time.monotonic() - self.loaded_at < self.refresh_seconds:
+            return
+        try:
+            self._load_manifest()
+        except Exception as e:
+            # The markers still catch every duplicate, at the cost of a request per object
+            logger.warning(f"Could not load {self._manifest_key()}: {str(e)}")
+        self.loaded_at = time.monotonic()
+
+    def _index(self, known: np.ndarray, added: Optional[np.ndarray] = None):
+        """Install the sorted lookup array, extending the Bloom filter in place when only entries were added"""
+        if added is not None and len(known) <= self.bloom.capacity:
+            self.bloom.add(added)
+        else:
+            self.bloom = BloomFilter(len(known) * 2)
+            self.bloom.add(known)
+        self.known = known
+
+    def _load_manifest(self):
+        body, version = self._read_bytes(self._manifest_key(), self.version)
+        if body is None and version == self.version and self.loaded_at is not None:
+            return  # Unchanged
+        entries = np.frombuffer(body or b"", dtype="<u8").astype(np.uint64)
+        with self._lock:
+            self.entries, self.version = entries, version
+            self._index(np.union1d(entries, np.array(self.recent, dtype=np.uint64)))
+
+    def _append_manifest(self, identities: List[int]):
+        """Add committed fingerprints to the compact manifest, dropping its oldest entries past the cap"""
+        for attempt in range(MAX_CLAIM_ATTEMPTS):
+            try:
+                self._load_manifest()
+                entries = np.concatenate([self.entries, np.array(identities, dtype=np.uint64)])
+                entries = entries[-MAX_MANIFEST_ENTRIES:]
+                body = entries.astype("<u8").tobytes()
+                if self.version is None:
+                    written = self._create(self._manifest_key(), body)
+                else:
+                    written = self._replace(self._manifest_key(), body, self.version)
+            except Exception as e:
+                logger.warning(f"Could not update {self._manifest_key()}: {str(e)}")
+                return
+            if written:
+                return
+            # Another invocation updated it first; back off, then reload and add ours again
+            time.sleep(random.uniform(0, CLAIM_BACKOFF_SECONDS * 2 ** attempt))
+        logger.warning(f"Gave up updating {self._manifest_key()} after {MAX_CLAIM_ATTEMPTS} attempts")
+
+    def _acquire(self, value: int, lease_seconds: float) -> str:
+        """Create a fingerprint's pending marker, or take it over if its lease expired"""
+        key = self._key(value)
+        for attempt in range(MAX_CLAIM_ATTEMPTS):
+            lease = {"state": STATE_PENDING, "expires_at": time.time() + lease_seconds}
+            if self._create(key, json.dumps(lease).encode("utf-8")):
+                return CLAIMED
+
+            body, version = self._read_bytes(key)
+            if body is not None:
+                marker = json.loads(body)
+                if marker.get("state") == STATE_PROCESSED:
+                    return DUPLICATE
+                if marker.get("expires_at", 0) > time.time():
+                    return IN_PROGRESS
+                if self._replace(key, json.dumps(lease).encode("utf-8"), version):
+                    logger.info(f"Took over the expired lease {key}")
+                    return CLAIMED
+
+            # The marker changed between our writes and reads; back off before looking again
+            time.sleep(random.uniform(0, CLAIM_BACKOFF_SECONDS * 2 ** attempt))
+
+        raise RuntimeError(f"Could not claim {key} after {MAX_CLAIM_ATTEMPTS} attempts")
+
+    def _key(self, value: int) -> str:
+        # Leading hex digits spread the markers over S3's key space
+        return f"{self.prefix if self.bucket else self.location}{value:016x}"
+
+    def _manifest_key(self) -> str:
+        return f"{self.prefix if self.bucket else self.location}{MANIFEST_NAME}"
+
+    def _create(self, key: str, body: bytes) -> bool:
+        """Write an object only if it does not exist yet"""
+        if self.bucket:
+            return self._put(key, body, IfNoneMatch="*")
+        try:
+            with open(key, "xb") as f:
+                f.write(body)
+        except FileExistsError:
+            return False
+        return True
+
+    def _read_bytes(self, key: str, if_changed_from=None) -> Tuple[Optional[bytes], Optional[str]]:
+        """An object's body and version (ETag or mtime), (None, None) if it does not exist, or
+        (None, if_changed_from) if it is still that version"""
+        if self.bucket:
+            extra_args = {"IfNoneMatch": if_changed_from} if if_changed_from else {}
+            try:
+                response = self.s3.get_object(Bucket=self.bucket, Key=key, **extra_args)
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code")
+                if code in ("304", "NotModified"):
+                    return None, if_changed_from
+                if code in ("NoSuchKey", "404"):
+                    return None, None
+                raise
+            return response["Body"].read(), response["ETag"]
+
+        try:
+            with open(key, "rb") as f:
+                version = os.fstat(f.fileno()).st_mtime_ns
+                if if_changed_from is not None and version == if_changed_from:
+                    return None, version
+                return f.read(), version
+        except FileNotFoundError:
+            return None, None
+
+    def _replace(self, key: str, body: bytes, version) -> bool:
+        """Overwrite an object only if it is still the version that was read"""
+        if self.bucket:
+            return self._put(key, body, IfMatch=version)
+
+        if not os.path.exists(key) or os.stat(key).st_mtime_ns != version:
+            return False
+        temp_path = f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(body)
+        os.replace(temp_path, key)
+        return True
+
+    def _put(self, key: str, body: bytes, **conditions) -> bool:
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, **conditions)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return False
+            raise
+        return True
+
+    def _write_all(self, identities: List[int], marker: Dict, action: str):
+        """Unconditionally write the markers of objects this invocation holds"""
+        body = json.dumps(marker).encode("utf-8")
+        for value in identities:
+            try:
+                if self.bucket:
+                    self.s3.put_object(Bucket=self.bucket, Key=self._key(value), Body=body)
+                else:
+                    temp_path = f"{self._key(value)}.{os.getpid()}.tmp"
+                    with open(temp_path, "wb") as f:
+                        f.write(body)
+                    os.replace(temp_path, self._key(value))
+            except Exception as e:
+                logger.error(f"Could not {action} {self._key(value)}: {str(e)}")
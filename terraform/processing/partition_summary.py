@@ -0,0 +1,323 @@
+import argparse
+import json
+import logging
+import math
+import posixpath
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Sidecar settings
+SUMMARY_SUFFIX = ".summary.json"
+SUMMARY_VERSION = 1
+SKETCH_RELATIVE_ACCURACY = 0.01  # Quantiles are within 1% of the true value
+SKETCH_MIN_VALUE = 1e-9  # Smaller magnitudes count as zero
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative accuracy (DDSketch).
+
+    Values fall into logarithmic buckets whose bounds are a factor gamma apart, so any quantile is
+    answered within SKETCH_RELATIVE_ACCURACY of its true value and two sketches merge by adding
+    their bucket counts. A few hundred buckets cover the range of a typical column.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = defaultdict(int)
+        self.negative = defaultdict(int)
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.positive.values()) + sum(self.negative.values())
+
+    def add(self, values: np.ndarray):
+        """Add the non-NaN values of an array"""
+        values = values[~np.isnan(values)]
+        magnitudes = np.abs(values)
+        small = magnitudes < SKETCH_MIN_VALUE
+        self.zero_count += int(small.sum())
+
+        for store, selected in ((self.positive, values > 0), (self.negative, values < 0)):
+            selected &= ~small
+            if selected.any():
+                buckets = np.ceil(np.log(magnitudes[selected]) / self._log_gamma).astype(np.int64)
+                for bucket, count in zip(*np.unique(buckets, return_counts=True)):
+                    store[int(bucket)] += int(count)
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for bucket, count in other_store.items():
+                store[bucket] += count
+        self.zero_count += other.zero_count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q (0 to 1), or None if the sketch is empty"""
+        count = self.count
+        if not count:
+            return None
+
+        rank = q * (count - 1)
+        seen = 0
+        # From the most negative value up: negative buckets by decreasing magnitude, zeros, positive buckets
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self._bucket_value(bucket)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self._bucket_value(bucket)
+        return self._bucket_value(max(self.positive))
+
+    def _bucket_value(self, bucket: int) -> float:
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "positive": {str(bucket): count for bucket, count in sorted(self.positive.items())},
+            "negative": {str(bucket): count for bucket, count in sorted(self.negative.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuantileSketch":
+        sketch = cls(data["relative_accuracy"])
+        sketch.zero_count = data["zero_count"]
+        sketch.positive.update({int(bucket): count for bucket, count in data["positive"].items()})
+        sketch.negative.update({int(bucket): count for bucket, count in data["negative"].items()})
+        return sketch
+
+class NumericSummary:
+    """Count, null count, sum, sum of squares, min, max and a quantile sketch of a numeric column"""
+
+    def __init__(self):
+        self.count = 0
+        self.null_count = 0
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch()
+
+    def add(self, values: np.ndarray):
+        """Add a float array in which NaN marks a null"""
+        nulls = np.isnan(values)
+        present = values[~nulls]
+        self.null_count += int(nulls.sum())
+        if not len(present):
+            return
+
+        self.count += len(present)
+        self.sum += float(present.sum())
+        self.sum_squares += float(np.square(present).sum())
+        self.min = float(present.min()) if self.min is None else min(self.min, float(present.min()))
+        self.max = float(present.max()) if self.max is None else max(self.max, float(present.max()))
+        self.sketch.add(present)
+
+    def merge(self, other: "NumericSummary"):
+        self.count += other.count
+        self.null_count += other.null_count
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+        self.min = other.min if self.min is None else self.min if other.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else self.max if other.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def describe(self) -> Dict:
+        """Statistics as pandas reports them: sample standard deviation, median from the sketch"""
+        mean = self.sum / self.count if self.count else None
+        std = None
+        if self.count > 1:
+            variance = (self.sum_squares - self.count * mean ** 2) / (self.count - 1)
+            std = math.sqrt(max(variance, 0.0))
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "mean": mean,
+            "std": std,
+            "min": self.min,
+            "max": self.max,
+            "p25": self.sketch.quantile(0.25),
+            "median": self.sketch.quantile(0.5),
+            "p75": self.sketch.quantile(0.75)
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "sum": self.sum,
+            "sum_squares": self.sum_squares,
+            "min": self.min,
+            "max": self.max,
+            "sketch": self.sketch.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NumericSummary":
+        summary = cls()
+        for name in ("count", "null_count", "sum", "sum_squares", "min", "max"):
+            setattr(summary, name, data[name])
+        summary.sketch = QuantileSketch.from_dict(data["sketch"])
+        return summary
+
+class CategoricalSummary:
+    """Count, null count and value frequencies of a categorical column"""
+
+    def __init__(self):
+        self.count = 0
+        self.null_count = 0
+        self.frequencies = defaultdict(int)
+
+    def add(self, counts: Dict[str, int], null_count: int = 0):
+        for value, count in counts.items():
+            self.frequencies[value] += count
+            self.count += count
+        self.null_count += null_count
+
+    def merge(self, other: "CategoricalSummary"):
+        self.add(other.frequencies, other.null_count)
+
+    def describe(self) -> Dict:
+        # Ties resolve to the smallest value, like the first entry of pandas' mode()
+        mode = min(self.frequencies, key=lambda value: (-self.frequencies[value], value)) if self.frequencies else None
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "distinct": len(self.frequencies),
+            "mode": mode,
+            "frequencies": dict(sorted(self.frequencies.items()))
+        }
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "null_count": self.null_count, "frequencies": dict(sorted(self.frequencies.items()))}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CategoricalSummary":
+        summary = cls()
+        summary.add(data["frequencies"], data["null_count"])
+        return summary
+
+class PartitionSummary:
+    """Mergeable column statistics of the rows in one or more processed files.
+
+    The validator stores one as a sidecar next to every processed file; merging the sidecars of a
+    date range gives its counts, means, standard deviations, extremes, null counts, frequencies and
+    approximate quantiles without reading the data.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.numeric = defaultdict(NumericSummary)
+        self.categorical = defaultdict(CategoricalSummary)
+        self.files = 0
+
+    def add_numeric(self, name: str, values: np.ndarray):
+        self.numeric[name].add(np.asarray(values, dtype=np.float64))
+
+    def add_categories(self, name: str, counts: Dict[str, int], null_count: int = 0):
+        self.categorical[name].add(counts, null_count)
+
+    def merge(self, other: "PartitionSummary"):
+        self.rows += other.rows
+        self.files += other.files
+        for name, summary in other.numeric.items():
+            self.numeric[name].merge(summary)
+        for name, summary in other.categorical.items():
+            self.categorical[name].merge(summary)
+
+    def describe(self) -> Dict:
+        """Per-column statistics of everything merged so far"""
+        return {
+            "rows": self.rows,
+            "files": self.files,
+            "numeric": {name: summary.describe() for name, summary in sorted(self.numeric.items())},
+            "categorical": {name: summary.describe() for name, summary in sorted(self.categorical.items())}
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": SUMMARY_VERSION,
+            "rows": self.rows,
+            "files": self.files,
+            "numeric": {name: summary.to_dict() for name, summary in sorted(self.numeric.items())},
+            "categorical": {name: summary.to_dict() for name, summary in sorted(self.categorical.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PartitionSummary":
+        if data.get("version") != SUMMARY_VERSION:
+            raise ValueError(f"Unsupported summary version: {data.get('version')}")
+        summary = cls()
+        summary.rows = data["rows"]
+        summary.files = data["files"]
+        for name, column in data["numeric"].items():
+            summary.numeric[name] = NumericSummary.from_dict(column)
+        for name, column in data["categorical"].items():
+            summary.categorical[name] = CategoricalSummary.from_dict(column)
+        return summary
+
+def summary_path(key: str) -> str:
+    """Key of the sidecar of a processed file: name_ts.parquet -> name_ts.summary.json"""
+    return posixpath.splitext(key)[0] + SUMMARY_SUFFIX
+
+def list_summaries(s3_client, bucket: str, prefix: str) -> List[str]:
+    """Keys of every sidecar under a prefix, including its sub-partitions"""
+    keys = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []) if obj["Key"].endswith(SUMMARY_SUFFIX))
+    return keys
+
+def merge_summaries(s3_client, bucket: str, prefixes: Iterable[str]) -> PartitionSummary:
+    """Merge the sidecars under the given prefixes into one summary"""
+    merged = PartitionSummary()
+    for prefix in prefixes:
+        for key in list_summaries(s3_client, bucket, prefix):
+            body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+            merged.merge(PartitionSummary.from_dict(json.loads(body)))
+    return merged
+
+def main(argv: Optional[List[str]] = None):
+    # The validator defines the bucket, client and partition layout
+    from data_validator import LAYOUT_DATE, LAYOUT_HIVE, PROCESSED_BUCKET, partition_date_path, s3
+
+    parser = argparse.ArgumentParser(description="Merge the summary sidecars of the processed partitions of a date range")
+    parser.add_argument("--start", required=True, help="First date, YYYY/MM/DD")
+    parser.add_argument("--end", help="Last date, YYYY/MM/DD (default: --start)")
+    parser.add_argument("--bucket", default=PROCESSED_BUCKET)
+    parser.add_argument("--layout", choices=[LAYOUT_DATE, LAYOUT_HIVE], default=LAYOUT_DATE)
+    parser.add_argument("--output", help="Also write the statistics to this JSON file")
+    args = parser.parse_args(argv)
+
+    start = datetime.strptime(args.start, "%Y/%m/%d")
+    end = datetime.strptime(args.end or args.start, "%Y/%m/%d")
+    prefixes = [
+        f"processed/{partition_date_path(start + timedelta(days=day), args.layout)}/"
+        for day in range((end - start).days + 1)
+    ]
+
+    statistics = merge_summaries(s3, args.bucket, prefixes).describe()
+    json.dump(statistics, sys.stdout, indent=2)
+    print()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(statistics, f, indent=2)
+
+if __name__ == "__main__":
+    main()
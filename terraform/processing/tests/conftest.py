@@ -0,0 +1,18 @@
+import os
+import sys
+
+# The validator reads its buckets from the environment when it is imported
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("PROCESSED_S3_BUCKET", "test-processed")
+os.environ.setdefault("ERROR_BUCKET", "test-errors")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# moto hooks into clients created after it is imported, and test modules may import the validator (and so
+# build its clients) before any moto fixture runs
+try:
+    import moto  # noqa: F401
+except ImportError:
+    pass
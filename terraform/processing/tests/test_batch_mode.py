@@ -0,0 +1,95 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+moto = pytest.importorskip("moto")
+
+RAW_BUCKET = "test-raw"
+
+GOOD_CSV = """age,sex,bmi,children,smoker,region,charges
+19,female,27.9,0,yes,southwest,16884.92
+18,male,33.77,1,no,southeast,1725.55
+"""
+# Rows 1 and 2 are rejected
+MIXED_CSV = """age,sex,bmi,children,smoker,region,charges
+28,male,33.0,3,no,southeast,4449.46
+12,female,25.74,0,no,northwest,3866.86
+46,female,33.44,1,maybe,southeast,8240.59
+33,male,22.7,0,no,northwest,21984.47
+"""
+MISSING_COLUMN_CSV = """age,sex,bmi,children,smoker,charges
+31,female,25.74,0,no,3756.62
+"""
+
+@pytest.fixture
+def validator(monkeypatch):
+    with moto.mock_aws():
+        import data_validator
+
+        for bucket in (RAW_BUCKET, data_validator.PROCESSED_BUCKET, data_validator.ERROR_BUCKET):
+            data_validator.s3.create_bucket(Bucket=bucket)
+        monkeypatch.setattr(data_validator, "_fetch_secret", lambda: {"batch_mode": True})
+        monkeypatch.setattr(data_validator, "config_cache", data_validator.ConfigCache())
+        yield data_validator
+
+def sqs_event(keys):
+    """One SQS message per S3 notification, as delivered from the ingestion queue"""
+    return {"Records": [
+        {"eventSource": "aws:sqs", "messageId": f"message-{key}", "body": json.dumps(
+            {"Records": [{"s3": {"bucket": {"name": RAW_BUCKET}, "object": {"key": key}}}]}
+        )}
+        for key in keys
+    ]}
+
+def read_parquet(validator, uri):
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    return pd.read_parquet(io.BytesIO(validator.s3.get_object(Bucket=bucket, Key=key)["Body"].read()))
+
+def test_batch_writes_one_output_and_attributes_errors(validator):
+    for key, body in [("good.csv", GOOD_CSV), ("mixed.csv", MIXED_CSV), ("missing.csv", MISSING_COLUMN_CSV)]:
+        validator.s3.put_object(Bucket=RAW_BUCKET, Key=key, Body=body.encode("utf-8"))
+
+    result = validator.process_s3_event(sqs_event(["good.csv", "mixed.csv", "missing.csv", "gone.csv"]), None)
+    statistics = json.loads(result["body"])["statistics"]
+
+    # The unreadable object fails alone and only its message is redelivered
+    assert statistics["failed_files"] == [f"s3://{RAW_BUCKET}/gone.csv"]
+    assert result["batchItemFailures"] == [{"itemIdentifier": "message-gone.csv"}]
+
+    assert statistics["total_records"] == 7
+    assert statistics["processed_records"] == 4
+    assert statistics["error_records"] == 3
+    assert statistics["files"] == {
+        f"s3://{RAW_BUCKET}/good.csv": {"total_records": 2, "processed_records": 2, "error_records": 0},
+        f"s3://{RAW_BUCKET}/mixed.csv": {"total_records": 4, "processed_records": 2, "error_records": 2},
+        f"s3://{RAW_BUCKET}/missing.csv": {"total_records": 1, "processed_records": 0, "error_records": 1}
+    }
+
+    processed = [uri for uri in statistics["output_files"] if "/processed/" in uri]
+    assert len(processed) == 1
+    assert len(read_parquet(validator, processed[0])) == 4
+
+    errors_uri, = [uri for uri in statistics["output_files"] if uri.endswith("_errors.parquet")]
+    errors = read_parquet(validator, errors_uri)
+    origins = sorted(zip(errors["_source_file"], errors["_row"]))
+    assert origins == [(f"s3://{RAW_BUCKET}/missing.csv", 0),
+                       (f"s3://{RAW_BUCKET}/mixed.csv", 1), (f"s3://{RAW_BUCKET}/mixed.csv", 2)]
+
+def test_batch_matches_files_processed_alone(validator):
+    validator.s3.put_object(Bucket=RAW_BUCKET, Key="good.csv", Body=GOOD_CSV.encode("utf-8"))
+    validator.s3.put_object(Bucket=RAW_BUCKET, Key="mixed.csv", Body=MIXED_CSV.encode("utf-8"))
+    processor = validator.DataProcessor({})
+
+    expected = pd.concat([
+        read_parquet(validator, uri)
+        for key in ["good.csv", "mixed.csv"]
+        for uri in validator.process_s3_object(processor, RAW_BUCKET, key)["output_files"] if "/processed/" in uri
+    ], ignore_index=True)
+    stats, failed = validator.process_s3_batch(processor, [(RAW_BUCKET, "good.csv"), (RAW_BUCKET, "mixed.csv")])
+    processed, = [uri for uri in stats["output_files"] if "/processed/" in uri]
+
+    assert failed == []
+    columns = [column for column in expected.columns if column not in ("processed_at", "processing_id")]
+    pd.testing.assert_frame_equal(read_parquet(validator, processed)[columns], expected[columns])
@@ -0,0 +1,68 @@
+import io
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+moto = pytest.importorskip("moto")
+
+PREFIX = "processed/2026/10/16/"
+
+@pytest.fixture
+def validator():
+    with moto.mock_aws():
+        import data_validator
+
+        data_validator.s3.create_bucket(Bucket=data_validator.PROCESSED_BUCKET)
+        yield data_validator
+
+def write_files(validator, count: int, with_sidecar) -> int:
+    """Small processed files of 100 rows each, with a sidecar where with_sidecar(index) holds; returns the rows"""
+    rng = np.random.default_rng(3)
+    for index in range(count):
+        table = pa.table({
+            "age": rng.integers(18, 65, 100),
+            "bmi": rng.uniform(15, 45, 100),
+            "smoker": rng.choice(["yes", "no"], 100).tolist()
+        })
+        key = f"{PREFIX}insurance_20261016_0000{index:02d}.parquet"
+        sink = io.BytesIO()
+        pq.write_table(table, sink)
+        validator.s3.put_object(Bucket=validator.PROCESSED_BUCKET, Key=key, Body=sink.getvalue())
+        if with_sidecar(index):
+            validator.write_summary(validator.summarize_table(table), validator.PROCESSED_BUCKET, key)
+    return count * 100
+
+def list_keys(validator) -> list:
+    listing = validator.s3.list_objects_v2(Bucket=validator.PROCESSED_BUCKET, Prefix=PREFIX)
+    return sorted(obj["Key"][len(PREFIX):] for obj in listing.get("Contents", []))
+
+def test_merged_sidecar_covers_every_source(validator):
+    import compaction
+
+    rows = write_files(validator, 4, lambda index: True)
+    report = compaction.compact_partition(validator.PROCESSED_BUCKET, PREFIX)
+
+    assert report["files_after"] == 1
+    assert len(report["summary_files"]) == 1
+    key = report["summary_files"][0][len(f"s3://{validator.PROCESSED_BUCKET}/"):]
+    body = validator.s3.get_object(Bucket=validator.PROCESSED_BUCKET, Key=key)
+    summary = json.loads(body["Body"].read())
+    assert summary["rows"] == rows
+    assert summary["files"] == 1
+    assert summary["numeric"]["age"]["count"] == rows
+
+def test_no_merged_sidecar_when_a_source_has_none(validator):
+    import compaction
+
+    # The third file was written before sidecars were switched on
+    write_files(validator, 4, lambda index: index != 2)
+    report = compaction.compact_partition(validator.PROCESSED_BUCKET, PREFIX)
+
+    assert report["files_after"] == 1
+    assert report["summary_files"] == []
+    # The merged file replaces the originals and their sidecars
+    keys = list_keys(validator)
+    assert len(keys) == 1 and keys[0].startswith(compaction.COMPACTED_PREFIX)
@@ -0,0 +1,65 @@
+import json
+import time
+
+import pytest
+
+import data_validator
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Secret fetches made from now on; each returns a new configuration"""
+    calls = []
+
+    def fetch_secret():
+        calls.append(time.monotonic())
+        return {"error_sample_rows": len(calls)}
+
+    monkeypatch.setattr(data_validator, "_fetch_secret", fetch_secret)
+    return calls
+
+def test_warm_calls_reuse_the_processor(fetches):
+    cache = data_validator.ConfigCache(ttl_seconds=60)
+    processor = cache.get_processor()
+
+    assert cache.get_processor() is processor
+    assert cache.get_processor() is processor
+    assert len(fetches) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_expired_or_forced_refresh_fetches_again(fetches):
+    cache = data_validator.ConfigCache(ttl_seconds=0.1)
+    first = cache.get_processor()
+
+    time.sleep(0.15)
+    second = cache.get_processor()
+    assert second is not first
+    assert second.error_sample_rows == 2
+
+    assert cache.get_processor(force_refresh=True).error_sample_rows == 3
+    cache.invalidate()
+    assert cache.get_processor().error_sample_rows == 4
+    assert cache.stats() == {"hits": 0, "misses": 4, "age_seconds": pytest.approx(0, abs=0.1)}
+
+def test_failed_refresh_keeps_the_last_configuration(fetches, monkeypatch):
+    cache = data_validator.ConfigCache(ttl_seconds=60)
+    processor = cache.get_processor()
+
+    def unavailable():
+        raise ConnectionError("Secrets Manager unavailable")
+
+    monkeypatch.setattr(data_validator, "_fetch_secret", unavailable)
+    assert cache.get_processor(force_refresh=True) is processor
+
+def test_warm_invocations_skip_the_secret_fetch(fetches, monkeypatch):
+    monkeypatch.setattr(data_validator, "config_cache", data_validator.ConfigCache(ttl_seconds=60))
+
+    for _ in range(3):
+        result = data_validator.process_s3_event({"Records": []}, None)
+    statistics = json.loads(result["body"])["statistics"]
+
+    assert len(fetches) == 1
+    assert statistics["config_cache"]["hits"] == 2
+    assert statistics["config_cache"]["misses"] == 1
+
+    data_validator.process_s3_event({"Records": [], "refresh_config": True}, None)
+    assert len(fetches) == 2
@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_validator
+from benchmark import generate_records
+
+# One row per kind of failure, next to valid ones
+MIXED_CSV = """age,sex,bmi,children,smoker,region,charges
+19,female,27.9,0,yes,southwest,16884.92
+,male,33.77,1,no,southeast,1725.55
+abc,male,33.0,3,no,southeast,4449.46
+33,male,,0,no,northwest,21984.47
+12,female,25.74,0,no,northwest,3866.86
+64,male,95.0,2,yes,northeast,30166.62
+46,Female,33.44,1,no,southeast,8240.59
+37,unknown,27.74,3,no,northwest,7281.51
+28,male,33.0,-1,maybe,central,6406.41
+60,female,25.84,0,no,northwest,28923.14
+"""
+
+def read(frame: pd.DataFrame) -> pd.DataFrame:
+    """A frame as the validator reads it from CSV"""
+    return pd.read_csv(io.StringIO(frame.to_csv(index=False)))
+
+def frames():
+    yield "mixed", pd.read_csv(io.StringIO(MIXED_CSV))
+    dirty = generate_records(2000, dirty_ratio=0.3, seed=5)
+    dirty.loc[::17, "bmi"] = np.nan
+    dirty.loc[::23, "sex"] = np.nan
+    yield "generated", read(dirty)
+    clean = generate_records(200, seed=6)
+    yield "missing_column", read(clean.drop(columns=["region"]))
+    # Every column numeric, so iterrows() hands the row engine floats
+    yield "all_numeric", read(clean.assign(sex=np.nan, smoker=np.nan, region=np.nan))
+    yield "all_numeric_ints", clean[["age", "children"]].assign(bmi=clean["bmi"].round())
+
+FRAMES = dict(frames())
+
+def process(engine: str, df: pd.DataFrame, error_report: str):
+    processor = data_validator.DataProcessor({"validation_engine": engine, "error_report": error_report})
+    valid_df, error_df = processor.process_dataframe(df.copy())
+    # Metadata is stamped per record by the row engine and per batch by the others
+    return valid_df.drop(columns=["processed_at", "processing_id"], errors="ignore"), error_df
+
+@pytest.mark.parametrize("error_report", ["full", "compact"])
+@pytest.mark.parametrize("engine", ["columnar", "arrow"])
+@pytest.mark.parametrize("name", list(FRAMES))
+def test_engine_matches_row_engine(name, engine, error_report):
+    df = FRAMES[name]
+    expected_valid, expected_errors = process("row", df, error_report)
+    valid_df, error_df = process(engine, df, error_report)
+
+    pd.testing.assert_frame_equal(valid_df, expected_valid)
+    pd.testing.assert_frame_equal(error_df, expected_errors)
+
+def test_mixed_frame_covers_every_failure():
+    _, error_df = process("row", FRAMES["mixed"], "full")
+    messages = ",".join(error_df["_error"])
+    for error in ["age_invalid_type", "age_below_min", "bmi_above_max", "sex_invalid_value",
+                  "children_below_min", "smoker_invalid_value", "region_invalid_value"]:
+        assert error in messages
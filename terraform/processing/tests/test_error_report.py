@@ -0,0 +1,77 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_validator
+from benchmark import generate_records
+
+RAW_BUCKET = "test-raw"
+
+def dirty_frame(rows: int, seed: int) -> pd.DataFrame:
+    df = generate_records(rows, dirty_ratio=0.5, seed=seed)
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)))
+
+def test_report_stays_bounded_and_counts_every_error():
+    processor = data_validator.DataProcessor({"error_report": "compact"})
+    report = data_validator.ErrorReport(sample_rows=50)
+    codes = []
+    for batch in range(20):
+        _, error_df = processor.process_dataframe(dirty_frame(500, seed=batch).assign(batch=batch))
+        report.add(error_df)
+        codes.append(error_df["_error_code"].to_numpy())
+    codes = np.concatenate(codes)
+
+    assert report.rows == len(codes)
+    assert len(report.sample) == 50
+    # A uniform sample reaches past the first batches
+    assert max(record["batch"] for record in report.sample) >= 10
+
+    expected = {}
+    for code in codes:
+        for name in data_validator.describe_error_code(int(code)):
+            expected[name] = expected.get(name, 0) + 1
+    summary = report.to_dict()
+    assert summary["by_code"] == expected
+    assert sum(summary["by_column"].values()) == sum(expected.values())
+    assert summary["error_code_bits"]["age_invalid_type"] == data_validator.ERROR_CODES.index("age_invalid_type")
+
+def test_compact_codes_name_the_full_errors():
+    df = dirty_frame(2000, seed=1)
+    _, full = data_validator.DataProcessor({}).process_dataframe(df.copy())
+    _, compact = data_validator.DataProcessor({"error_report": "compact"}).process_dataframe(df.copy())
+
+    assert compact["_error_code"].dtype == np.int64
+    assert [",".join(data_validator.describe_error_code(int(code))) for code in compact["_error_code"]] == \
+        [message.partition("validation_errors:")[2] for message in full["_error"]]
+
+@pytest.fixture
+def validator():
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        for bucket in (RAW_BUCKET, data_validator.PROCESSED_BUCKET, data_validator.ERROR_BUCKET):
+            data_validator.s3.create_bucket(Bucket=bucket)
+        yield data_validator
+
+def error_outputs(stats):
+    return sorted(uri.rsplit("_", 1)[-1] for uri in stats["output_files"] if "/errors/" in uri)
+
+@pytest.mark.parametrize("full_dump", [False, True])
+def test_compact_report_replaces_the_row_dump(validator, full_dump):
+    df = dirty_frame(3000, seed=2)
+    validator.s3.put_object(Bucket=RAW_BUCKET, Key="input.csv", Body=df.to_csv(index=False).encode("utf-8"))
+    processor = validator.DataProcessor({"error_report": "compact", "error_sample_rows": 25,
+                                         "error_full_dump": full_dump})
+
+    stats = validator.process_s3_object(processor, RAW_BUCKET, "input.csv")
+
+    expected = ["errors.parquet", "sample.parquet", "summary.json"] if full_dump else ["sample.parquet", "summary.json"]
+    assert error_outputs(stats) == expected
+    summary_uri, = [uri for uri in stats["output_files"] if uri.endswith("_errors_summary.json")]
+    key = summary_uri[len(f"s3://{validator.ERROR_BUCKET}/"):]
+    summary = json.loads(validator.s3.get_object(Bucket=validator.ERROR_BUCKET, Key=key)["Body"].read())
+    assert summary["error_records"] == stats["error_records"] > 25
+    assert summary["sampled_records"] == 25
+    assert summary["by_code"] == stats["error_codes"]
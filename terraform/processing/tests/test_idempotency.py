@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+import boto3
+
+from idempotency import CLAIMED, DUPLICATE, IN_PROGRESS, ProcessedManifest, object_identities
+
+MANIFEST_BUCKET = "test-manifest"
+LOCATION = f"s3://{MANIFEST_BUCKET}/idempotency/"
+
+@pytest.fixture
+def s3():
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=MANIFEST_BUCKET)
+        yield client
+
+def count_requests(client) -> list:
+    """Names of the S3 operations a client calls from now on"""
+    calls = []
+    client.meta.events.register("before-call.s3", lambda model, **kwargs: calls.append(model.name))
+    return calls
+
+def test_lease_expires_and_is_taken_over(s3):
+    identities = object_identities("raw", "input.csv", "etag-1")
+    first, second = ProcessedManifest(LOCATION, s3), ProcessedManifest(LOCATION, s3)
+
+    assert first.claim([identities], lease_seconds=0.2) == [CLAIMED]
+    assert second.claim([identities], lease_seconds=60) == [IN_PROGRESS]
+
+    # The first invocation dies without committing; once its lease expires the redelivery takes it over
+    time.sleep(0.3)
+    assert second.claim([identities], lease_seconds=60) == [CLAIMED]
+    assert first.claim([identities], lease_seconds=60) == [IN_PROGRESS]
+    second.commit(identities)
+    assert ProcessedManifest(LOCATION, s3).claim([identities]) == [DUPLICATE]
+
+def test_concurrent_claims_lease_an_object_once(s3):
+    identities = object_identities("raw", "input.csv", "etag-1")
+    manifests = [ProcessedManifest(LOCATION, s3) for _ in range(8)]
+    start = threading.Barrier(len(manifests))
+    outcomes = []
+
+    def claim(manifest):
+        start.wait()
+        outcomes.extend(manifest.claim([identities]))
+
+    threads = [threading.Thread(target=claim, args=(manifest,)) for manifest in manifests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == sorted([CLAIMED] + [IN_PROGRESS] * (len(manifests) - 1))
+
+def test_concurrent_commits_all_reach_the_compact_manifest(s3):
+    objects = [object_identities("raw", f"input-{i}.csv", f"etag-{i}") for i in range(8)]
+    manifests = [ProcessedManifest(LOCATION, s3) for _ in objects]
+    for manifest, identities in zip(manifests, objects):
+        assert manifest.claim([identities]) == [CLAIMED]
+
+    threads = [threading.Thread(target=manifest.commit, args=(identities,))
+               for manifest, identities in zip(manifests, objects)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    fresh = ProcessedManifest(LOCATION, s3)
+    fresh.refresh()
+    assert all(fresh.contains(value) for identities in objects for value in identities)
+
+def test_known_duplicates_are_rejected_without_requests(s3):
+    processed = object_identities("raw", "input.csv", "etag-1")
+    first = ProcessedManifest(LOCATION, s3)
+    first.claim([processed])
+    first.commit(processed)
+
+    manifest = ProcessedManifest(LOCATION, s3)
+    manifest.refresh()
+    calls = count_requests(s3)
+    assert manifest.claim([processed, processed]) == [DUPLICATE, DUPLICATE]
+    assert calls == []
+
+    # A new object still goes through its marker
+    assert manifest.claim([object_identities("raw", "other.csv", "etag-2")]) == [CLAIMED]
+    assert calls == ["PutObject"]
+
+def test_claimed_objects_are_not_rejected_by_the_filter(tmp_path):
+    objects = [object_identities("raw", f"input-{i}.csv", f"etag-{i}") for i in range(2000)]
+    manifest = ProcessedManifest(str(tmp_path))
+    manifest.remember(value for identities in objects[:1000] for value in identities)
+
+    outcomes = manifest.claim(objects)
+    assert outcomes == [DUPLICATE] * 1000 + [CLAIMED] * 1000
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+PART_SIZE = 5 * 1024 * 1024
+KEY = "processed/output.csv"
+
+@pytest.fixture
+def validator():
+    with moto.mock_aws():
+        import data_validator
+
+        data_validator.s3.create_bucket(Bucket=data_validator.PROCESSED_BUCKET)
+        yield data_validator
+
+def record_operations(validator) -> list:
+    """Names of the S3 operations the validator's client calls from now on"""
+    operations = []
+    validator.s3.meta.events.register("before-call.s3", lambda model, **kwargs: operations.append(model.name))
+    return operations
+
+def read_object(validator) -> bytes:
+    return validator.s3.get_object(Bucket=validator.PROCESSED_BUCKET, Key=KEY)["Body"].read()
+
+def test_small_output_is_a_single_put(validator):
+    operations = record_operations(validator)
+    data = os.urandom(1024)
+
+    with validator.S3MultipartWriter(validator.PROCESSED_BUCKET, KEY, "text/csv", part_size=PART_SIZE) as writer:
+        writer.write(data[:100])
+        writer.write(data[100:])
+
+    assert operations == ["PutObject"]
+    assert read_object(validator) == data
+    head = validator.s3.head_object(Bucket=validator.PROCESSED_BUCKET, Key=KEY)
+    assert head["ContentType"] == "text/csv"
+
+def test_multipart_output_round_trips_in_part_order(validator):
+    operations = record_operations(validator)
+    data = os.urandom(3 * PART_SIZE + 12345)
+
+    with validator.S3MultipartWriter(validator.PROCESSED_BUCKET, KEY, part_size=PART_SIZE, max_concurrency=3) as writer:
+        # Writes that straddle part boundaries
+        for start in range(0, len(data), 1_000_003):
+            writer.write(data[start:start + 1_000_003])
+        assert writer.tell() == len(data)
+
+    assert operations.count("CreateMultipartUpload") == 1
+    assert operations.count("UploadPart") == 4
+    assert operations[-1] == "CompleteMultipartUpload"
+    assert read_object(validator) == data
+
+def test_failed_part_aborts_the_upload(validator, monkeypatch):
+    upload_part = validator.s3.upload_part
+
+    def failing_upload_part(**kwargs):
+        if kwargs["PartNumber"] == 2:
+            raise RuntimeError("connection reset")
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(validator.s3, "upload_part", failing_upload_part)
+    writer = validator.S3MultipartWriter(validator.PROCESSED_BUCKET, KEY, part_size=PART_SIZE, max_concurrency=2)
+    with pytest.raises(RuntimeError, match="connection reset"):
+        with writer:
+            for _ in range(3):
+                writer.write(os.urandom(PART_SIZE))
+
+    assert writer.closed
+    uploads = validator.s3.list_multipart_uploads(Bucket=validator.PROCESSED_BUCKET)
+    assert not uploads.get("Uploads")
+    assert "Contents" not in validator.s3.list_objects_v2(Bucket=validator.PROCESSED_BUCKET)
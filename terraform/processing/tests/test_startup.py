@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+PROCESSING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module init budget of the validation Lambda, generous enough for a loaded CI machine
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", "1.0"))
+
+def import_in_fresh_interpreter() -> dict:
+    """Import data_validator in a new interpreter and report its startup profile and loaded modules"""
+    script = (
+        "import json, sys, data_validator; "
+        "print(json.dumps({'profile': data_validator.STARTUP_PROFILE, "
+        "'pandas': 'pandas' in sys.modules, 'pyarrow': 'pyarrow' in sys.modules}))"
+    )
+    env = {
+        **os.environ,
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "PROCESSED_S3_BUCKET": "startup-test-processed"
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=PROCESSING_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_module_init_within_budget():
+    result = import_in_fresh_interpreter()
+    assert result["profile"]["init_seconds"] < STARTUP_BUDGET_SECONDS, result["profile"]
+
+def test_data_libraries_not_imported_at_startup():
+    result = import_in_fresh_interpreter()
+    assert not result["pandas"]
+    assert not result["pyarrow"]
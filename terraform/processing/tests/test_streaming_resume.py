@@ -0,0 +1,77 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+moto = pytest.importorskip("moto")
+
+RAW_BUCKET = "test-raw"
+
+@pytest.fixture
+def validator():
+    with moto.mock_aws():
+        import data_validator
+
+        for bucket in (RAW_BUCKET, data_validator.PROCESSED_BUCKET, data_validator.ERROR_BUCKET):
+            data_validator.s3.create_bucket(Bucket=bucket)
+        yield data_validator
+
+def awkward_csv(rows: int, line_terminator: str) -> bytes:
+    """Insurance records with blank lines between them and quoted newlines inside some fields"""
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        "age": rng.integers(10, 80, rows),
+        "sex": rng.choice(["male", "female", "fe\nmale"], rows),
+        "bmi": rng.uniform(15, 45, rows).round(2),
+        "children": rng.integers(0, 6, rows),
+        "smoker": rng.choice(["yes", "no"], rows),
+        "region": rng.choice(["northeast", "northwest", "south\neast", "southwest"], rows),
+        "charges": rng.uniform(1000, 50000, rows).round(2)
+    })
+    lines = df.to_csv(index=False, lineterminator=line_terminator).split(line_terminator)
+    # Blank lines (runs of them, too) between records, which the parser skips but a line count would not
+    body = [lines[0]]
+    for index, line in enumerate(lines[1:]):
+        body.append(line)
+        body.extend([""] * (index % 7 == 3) + [""] * 2 * (index % 31 == 0))
+    return line_terminator.join(body).encode("utf-8")
+
+def read_outputs(validator, stats):
+    frames = {"processed": [], "errors": []}
+    for uri in stats["output_files"]:
+        bucket, _, key = uri[len("s3://"):].partition("/")
+        body = validator.s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        frame = pd.read_parquet(io.BytesIO(body)).drop(columns=["processed_at", "processing_id"], errors="ignore")
+        frames["errors" if key.startswith("errors/") else "processed"].append(frame)
+    return {name: pd.concat(parts, ignore_index=True) for name, parts in frames.items()}
+
+@pytest.mark.parametrize("line_terminator", ["\n", "\r\n"])
+def test_resumed_segments_match_single_shot(validator, line_terminator):
+    body = awkward_csv(997, line_terminator)
+    validator.s3.put_object(Bucket=RAW_BUCKET, Key="raw/single.csv", Body=body)
+    validator.s3.put_object(Bucket=RAW_BUCKET, Key="raw/segmented.csv", Body=body)
+    processor = validator.DataProcessor({})
+
+    expected = validator.process_s3_object(processor, RAW_BUCKET, "raw/single.csv")
+
+    # No time left: every invocation processes one chunk and pauses
+    checkpoint, segments, totals = None, 0, []
+    while True:
+        stats = validator.process_s3_object_streaming(
+            processor, RAW_BUCKET, "raw/segmented.csv", chunk_rows=40, time_left=lambda: 0, checkpoint=checkpoint
+        )
+        segments += 1
+        checkpoint = stats.pop("continuation", None)
+        if checkpoint is None:
+            break
+        assert checkpoint["position"]["offset"] <= len(body)
+
+    assert segments > 20
+    for name in ("total_records", "processed_records", "error_records"):
+        assert stats[name] == expected[name]
+
+    expected_outputs = read_outputs(validator, expected)
+    outputs = read_outputs(validator, stats)
+    for name in ("processed", "errors"):
+        pd.testing.assert_frame_equal(outputs[name], expected_outputs[name], check_dtype=False)